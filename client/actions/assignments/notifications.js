@@ -222,6 +222,13 @@ const onAssignmentLocked = (_e, data) => (
  */
 const onAssignmentUnlocked = (_e, data) => (
     (dispatch, getState) => {
+        if (get(data, 'items')) {
+            // All the items locked in a session are unlocked together when the session ends
+            return Promise.all(data.items.map(
+                (item) => dispatch(self.onAssignmentUnlocked(_e, {...data, ...item, items: null}))
+            ));
+        }
+
         if (get(data, 'item')) {
             return dispatch(assignments.api.fetchAssignmentById(data.item, false))
                 .then((assignmentInStore) => {
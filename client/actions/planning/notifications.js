@@ -135,6 +135,13 @@ const onPlanningLocked = (e, data) => (
  */
 const onPlanningUnlocked = (_e, data) => (
     (dispatch, getState) => {
+        if (get(data, 'items')) {
+            // All the items locked in a session are unlocked together when the session ends
+            return Promise.all(data.items.map(
+                (item) => dispatch(self.onPlanningUnlocked(_e, {...data, ...item, items: null}))
+            ));
+        }
+
         if (get(data, 'item')) {
             let planningItem = selectors.planning.storedPlannings(getState())[data.item];
 
@@ -0,0 +1,156 @@
+# -*- coding: utf-8; -*-
+#
+# This file is part of Superdesk.
+#
+# Copyright 2013, 2014, 2015, 2016, 2017, 2018 Sourcefabric z.u. and contributors.
+#
+# For the full copyright and license information, please see the
+# AUTHORS and LICENSE files distributed with this source code, or
+# at https://www.sourcefabric.org/superdesk/license
+
+"""Benchmark the combined Events and Planning search by page number
+
+Compares the previous two-pass search (over-fetching ids, then searching by ``_id``) against the
+single collapsed search (``PLANNING_COMBINED_SEARCH_COLLAPSE``). Requires Mongo and Elastic,
+the test databases are used and reset by this script.
+
+Example (from the server directory):
+::
+
+    $ python -m benchmarks.combined_search
+    $ python -m benchmarks.combined_search --events 5000 --pages 1 50 100 200 --page-size 50
+
+"""
+
+import argparse
+import statistics
+import time
+from datetime import timedelta
+
+from superdesk import get_resource_service
+from superdesk.factory.app import get_app
+from superdesk.tests import setup, update_config
+from superdesk.utc import utcnow
+
+from planning.common import COMBINED_ID_FIELD
+
+
+class BenchmarkContext:
+    pass
+
+
+def get_benchmark_app():
+    config = {'INSTALLED_APPS': ['planning']}
+    update_config(config)
+    context = BenchmarkContext()
+    setup(context, config, app_factory=get_app, reset=True)
+    return context.app
+
+
+def seed(app, num_events, plans_per_event, num_plans):
+    """Creates the Events, their linked Planning items, and Planning items without an Event"""
+    start = utcnow() + timedelta(days=1)
+    events = []
+    plans = []
+
+    for i in range(num_events):
+        event_start = start + timedelta(minutes=i)
+        event_id = 'event-{}'.format(i)
+        events.append({
+            '_id': event_id,
+            'guid': event_id,
+            'type': 'event',
+            'name': 'Event {}'.format(i),
+            'slugline': 'event-{}'.format(i),
+            'state': 'draft',
+            'dates': {'start': event_start, 'end': event_start + timedelta(hours=1)},
+            '_planning_schedule': [{'scheduled': event_start}],
+            COMBINED_ID_FIELD: event_id,
+        })
+
+        for j in range(plans_per_event):
+            plan_id = 'plan-{}-{}'.format(i, j)
+            plans.append({
+                '_id': plan_id,
+                'guid': plan_id,
+                'type': 'planning',
+                'slugline': 'plan-{}-{}'.format(i, j),
+                'state': 'draft',
+                'event_item': event_id,
+                'planning_date': event_start,
+                '_planning_schedule': [{'scheduled': event_start}],
+                COMBINED_ID_FIELD: event_id,
+            })
+
+    for i in range(num_plans):
+        plan_start = start + timedelta(minutes=i, seconds=30)
+        plan_id = 'plan-{}'.format(i)
+        plans.append({
+            '_id': plan_id,
+            'guid': plan_id,
+            'type': 'planning',
+            'slugline': 'plan-{}'.format(i),
+            'state': 'draft',
+            'planning_date': plan_start,
+            '_planning_schedule': [{'scheduled': plan_start}],
+            COMBINED_ID_FIELD: plan_id,
+        })
+
+    app.data.insert('events', events)
+    app.data.insert('planning', plans)
+    app.data.elastic.es.indices.refresh()
+
+
+def search_page(page, page_size):
+    docs = get_resource_service('events_planning_search').search_repos(
+        'combined',
+        {},
+        page=page,
+        page_size=page_size
+    )
+    return len(list(docs)), docs.count()
+
+
+def run(num_events, plans_per_event, num_plans, pages, page_size, repeat):
+    app = get_benchmark_app()
+
+    with app.app_context():
+        seed(app, num_events, plans_per_event, num_plans)
+
+        print('{} Events with {} Planning items each, {} Planning items without an Event'.format(
+            num_events,
+            plans_per_event,
+            num_plans
+        ))
+
+        for collapse in [False, True]:
+            app.config['PLANNING_COMBINED_SEARCH_COLLAPSE'] = collapse
+            print('{}:'.format('collapsed' if collapse else 'two-pass'))
+
+            for page in pages:
+                timings = []
+                with app.test_request_context():
+                    for _ in range(repeat):
+                        start = time.perf_counter()
+                        items, total = search_page(page, page_size)
+                        timings.append(time.perf_counter() - start)
+
+                print('    page {:>5}: {:8.1f}ms, {:>4} items, total {}'.format(
+                    page,
+                    statistics.median(timings) * 1000,
+                    items,
+                    total
+                ))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--events', type=int, default=2000)
+    parser.add_argument('--plans-per-event', type=int, default=2)
+    parser.add_argument('--plans', type=int, default=1000)
+    parser.add_argument('--pages', nargs='+', type=int, default=[1, 10, 40, 80, 120])
+    parser.add_argument('--page-size', type=int, default=25)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    run(args.events, args.plans_per_event, args.plans, args.pages, args.page_size, args.repeat)
@@ -0,0 +1,149 @@
+# -*- coding: utf-8; -*-
+#
+# This file is part of Superdesk.
+#
+# Copyright 2013, 2014, 2015, 2016, 2017, 2018 Sourcefabric z.u. and contributors.
+#
+# For the full copyright and license information, please see the
+# AUTHORS and LICENSE files distributed with this source code, or
+# at https://www.sourcefabric.org/superdesk/license
+
+"""Benchmark the date formatting of planning_search responses
+
+Compares ``PlanningSearchService._format_docs`` against the previous implementation, which
+resolved the schema date fields and parsed every date using ``parse_date`` for each response.
+Both the full response and a projected response (list view columns) are measured.
+
+Example (from the server directory):
+::
+
+    $ python -m benchmarks.format_docs
+    $ python -m benchmarks.format_docs --hits 500 --repeat 50
+
+"""
+
+import argparse
+import copy
+import timeit
+from datetime import timedelta
+
+from eve_elastic.elastic import parse_date, get_dates
+from flask import current_app as app
+from superdesk import get_resource_service
+from superdesk.utc import utcnow
+
+from benchmarks.combined_search import get_benchmark_app
+
+
+def legacy_format_docs(service, docs):
+    """Previous implementation, walking the schema and using ``parse_date`` for every response"""
+    date_fields = {}
+
+    for doc in docs:
+        resource = 'events' if doc['type'] == 'event' else doc['type']
+
+        if not date_fields.get(resource):
+            datasource = service.elastic.get_datasource(resource)
+            schema = {}
+            schema.update(app.config['DOMAIN'][datasource[0]].get('schema', {}))
+            schema.update(app.config['DOMAIN'][resource].get('schema', {}))
+            date_fields[resource] = get_dates(schema)
+
+        for field in date_fields[resource]:
+            if isinstance(doc.get(field), str):
+                doc[field] = parse_date(doc[field])
+
+        if resource == 'events' and doc.get('dates'):
+            if doc['dates'].get('start'):
+                doc['dates']['start'] = parse_date(doc['dates']['start'])
+            if doc['dates'].get('end'):
+                doc['dates']['end'] = parse_date(doc['dates']['end'])
+            if (doc['dates'].get('recurring_rule') or {}).get('until'):
+                doc['dates']['recurring_rule']['until'] = parse_date(doc['dates']['recurring_rule']['until'])
+
+
+def get_hits(num_hits, fields=None):
+    """Generate Elastic hits, with dates formatted as they are indexed"""
+    start = utcnow().replace(microsecond=0)
+    date_format = '%Y-%m-%dT%H:%M:%S+0000'
+    docs = []
+
+    for i in range(num_hits):
+        date = (start + timedelta(hours=i)).strftime(date_format)
+        if i % 2:
+            doc = {
+                '_id': 'event{}'.format(i),
+                'type': 'event',
+                'name': 'Event {}'.format(i),
+                'firstcreated': date,
+                'versioncreated': date,
+                '_created': date,
+                '_updated': date,
+                'expiry': date,
+                'dates': {
+                    'start': date,
+                    'end': date,
+                    'recurring_rule': {'frequency': 'DAILY', 'until': date},
+                },
+            }
+        else:
+            doc = {
+                '_id': 'plan{}'.format(i),
+                'type': 'planning',
+                'slugline': 'Plan {}'.format(i),
+                'firstcreated': date,
+                'versioncreated': date,
+                '_created': date,
+                '_updated': date,
+                'expiry': date,
+                'planning_date': date,
+            }
+
+        if fields:
+            doc = {key: value for key, value in doc.items() if key in fields}
+
+        docs.append(doc)
+
+    return docs
+
+
+def run(num_hits, repeat):
+    app = get_benchmark_app()
+
+    with app.app_context():
+        service = get_resource_service('planning_search')
+        projections = {
+            'full': None,
+            'projected': '_id,type,name,slugline,dates,planning_date',
+        }
+
+        print('{} hits:'.format(num_hits))
+        for name, fields in projections.items():
+            hits = get_hits(num_hits, fields.split(',') if fields else None)
+
+            legacy = min(timeit.repeat(
+                lambda: legacy_format_docs(service, copy.deepcopy(hits)),
+                number=1,
+                repeat=repeat
+            ))
+            current = min(timeit.repeat(
+                lambda: service._format_docs(copy.deepcopy(hits), fields),
+                number=1,
+                repeat=repeat
+            ))
+            copy_time = min(timeit.repeat(lambda: copy.deepcopy(hits), number=1, repeat=repeat))
+
+            print('    {:<10} legacy {:8.2f}ms, current {:8.2f}ms'.format(
+                name,
+                (legacy - copy_time) * 1000,
+                (current - copy_time) * 1000
+            ))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--hits', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    run(args.hits, args.repeat)
@@ -0,0 +1,149 @@
+# -*- coding: utf-8; -*-
+#
+# This file is part of Superdesk.
+#
+# Copyright 2013, 2014, 2015, 2016, 2017, 2018 Sourcefabric z.u. and contributors.
+#
+# For the full copyright and license information, please see the
+# AUTHORS and LICENSE files distributed with this source code, or
+# at https://www.sourcefabric.org/superdesk/license
+
+"""Benchmark the generation of recurring Events
+
+Compares the recurrence expansion of ``generate_recurring_events`` against the previous
+implementation, which deep-copied the Event and localised the dates one at a time.
+
+Example (from the server directory):
+::
+
+    $ python -m benchmarks.recurring_events
+    $ python -m benchmarks.recurring_events --sizes 500 5000 --repeat 5
+
+"""
+
+import argparse
+import copy
+import itertools
+import timeit
+from datetime import datetime, timedelta
+
+import pytz
+from flask import Flask
+from superdesk.metadata.item import GUID_NEWSML
+from superdesk.metadata.utils import generate_guid
+
+from planning.events.events import generate_recurring_events, generate_recurring_dates, setRecurringMode, \
+    overwrite_event_expiry_date, set_planning_schedule
+
+
+def legacy_generate_recurring_dates(start, frequency, tz=None, until=None, **kwargs):
+    """Previous implementation, localising each date through pytz"""
+    if not tz:
+        return generate_recurring_dates(start, frequency, until=until, **kwargs)
+
+    # Run the rule in local time, then localise each date individually
+    try:
+        start = pytz.UTC.localize(start)
+    except ValueError:
+        pass
+    start = start.astimezone(tz).replace(tzinfo=None)
+    if until:
+        until = until.astimezone(tz).replace(tzinfo=None)
+
+    return (
+        tz.localize(dt).astimezone(pytz.UTC).replace(tzinfo=None)
+        for dt in generate_recurring_dates(start, frequency, until=until, **kwargs)
+    )
+
+
+def legacy_generate_recurring_events(event, max_events):
+    """Previous implementation, deep-copying the entire Event for every occurrence"""
+    generated_events = []
+    setRecurringMode(event)
+    recurrence_id = event.get('recurrence_id', generate_guid(type=GUID_NEWSML))
+    time_delta = event['dates']['end'] - event['dates']['start']
+
+    for date in itertools.islice(legacy_generate_recurring_dates(
+            start=event['dates']['start'],
+            tz=event['dates'].get('tz') and pytz.timezone(event['dates']['tz']),
+            **event['dates']['recurring_rule']
+    ), 0, max_events):
+        new_event = copy.deepcopy(event)
+        for key in list(new_event.keys()):
+            if key.startswith('_') or key.startswith('lock_'):
+                new_event.pop(key)
+        new_event.pop('pubstatus', None)
+        new_event.pop('reschedule_from', None)
+
+        new_event['dates']['start'] = date
+        new_event['dates']['end'] = date + time_delta
+        new_event['guid'] = generate_guid(type=GUID_NEWSML)
+        new_event['_id'] = new_event['guid']
+        new_event['recurrence_id'] = recurrence_id
+        overwrite_event_expiry_date(new_event)
+        set_planning_schedule(new_event)
+        generated_events.append(new_event)
+
+    return generated_events
+
+
+def get_event(count):
+    start = datetime(2021, 1, 1, 9, 0)
+    return {
+        'name': 'Daily briefing',
+        'slugline': 'briefing',
+        'definition_long': 'A daily briefing ' * 50,
+        'calendars': [{'qcode': 'sport', 'name': 'Sport'}],
+        'location': [{'name': 'Parliament', 'address': {'line': ['1 Main St'], 'country': 'Australia'}}],
+        'subject': [{'qcode': '0{}'.format(i), 'name': 'Subject {}'.format(i)} for i in range(20)],
+        'links': ['http://example.com/{}'.format(i) for i in range(10)],
+        'dates': {
+            'start': start,
+            'end': start + timedelta(hours=1),
+            'tz': 'Australia/Sydney',
+            'recurring_rule': {
+                'frequency': 'DAILY',
+                'interval': 1,
+                'endRepeatMode': 'count',
+                'count': count,
+            },
+        },
+    }
+
+
+def run(sizes, repeat):
+    app = Flask(__name__)
+
+    for size in sizes:
+        app.config['MAX_RECURRENT_EVENTS'] = size
+        with app.app_context():
+            legacy = legacy_generate_recurring_events(get_event(size), size)
+            current = generate_recurring_events(get_event(size))
+            assert [e['dates'] for e in legacy] == [e['dates'] for e in current], 'Generated dates differ'
+
+            legacy_time = min(timeit.repeat(
+                lambda: legacy_generate_recurring_events(get_event(size), size),
+                number=1,
+                repeat=repeat
+            ))
+            current_time = min(timeit.repeat(
+                lambda: generate_recurring_events(get_event(size)),
+                number=1,
+                repeat=repeat
+            ))
+
+        print('{:>6} occurrences: legacy {:8.1f}ms, current {:8.1f}ms, speedup {:.1f}x'.format(
+            size,
+            legacy_time * 1000,
+            current_time * 1000,
+            legacy_time / current_time
+        ))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sizes', nargs='+', type=int, default=[500, 5000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    run(args.sizes, args.repeat)
@@ -31,13 +31,16 @@ from .common import (
     get_planning_auto_close_popup_editor)
 from apps.common.components.utils import register_component
 from .item_lock import LockService
+from .lock_registry import init_app as init_lock_registry_app
 from .planning_notifications import PlanningNotifications
+from .notification_digest import init_app as init_notification_digest_app, get_notification_digest_window
 from planning.events import init_app as init_events_app
 from planning.planning import init_app as init_planning_app
 from planning.assignments import init_app as init_assignments_app
 from planning.search import init_app as init_search_app
 from planning.validate import init_app as init_validator_app
 from planning.locations import init_app as init_locations_app
+from planning.reference_data import init_app as init_reference_data_app
 from superdesk.celery_app import celery
 from .published_planning import PublishedPlanningResource, PublishedPlanningService
 from superdesk.default_settings import celery_queue, CELERY_TASK_ROUTES as CTR, \
@@ -75,13 +78,16 @@ def init_app(app):
                                     app=app,
                                     service=export_template_service)
 
+    init_lock_registry_app(app)
     register_component(LockService(app))
+    init_notification_digest_app(app)
 
     init_locations_app(app)
     init_events_app(app)
     init_planning_app(app)
     init_assignments_app(app)
     init_search_app(app)
+    init_reference_data_app(app)
     init_validator_app(app)
     init_planning_download_app(app)
 
@@ -254,6 +260,13 @@ def init_app(app):
             'schedule': timedelta(seconds=60)  # Runs once every minute
         }
 
+    if get_notification_digest_window(app) and \
+            not app.config['CELERY_BEAT_SCHEDULE'].get('planning:send_orphaned_notification_digests'):
+        app.config['CELERY_BEAT_SCHEDULE']['planning:send_orphaned_notification_digests'] = {
+            'task': 'planning.send_orphaned_notification_digests',
+            'schedule': timedelta(seconds=60)  # Runs once every minute
+        }
+
     init_scheduled_exports_task(app)
 
     # Create 'type' required for planning module if not already preset
@@ -327,3 +340,8 @@ def delete_assignments():
 @celery.task(soft_time_limit=600)
 def export_scheduled_filters():
     ExportScheduledFilters().run()
+
+
+@celery.task(soft_time_limit=600)
+def send_orphaned_notification_digests():
+    PlanningNotifications().send_orphaned_digests()
@@ -80,6 +80,7 @@ def init_app(app):
     app.on_item_locked += assignments_publish_service.sync_assignment_lock
     app.on_item_unlocked += assignments_publish_service.sync_assignment_unlock
     app.on_updated_events += assignments_publish_service.on_events_updated
+    app.on_updated_events_series += assignments_publish_service.on_events_series_updated
 
     # Track updates for an assignment if it's news story was updated
     if app.config.get('PLANNING_LINK_UPDATES_TO_COVERAGES', True):
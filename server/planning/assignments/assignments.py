@@ -18,7 +18,7 @@ from superdesk.errors import SuperdeskApiError
 from superdesk.metadata.utils import item_url
 from superdesk.metadata.item import metadata_schema, ITEM_STATE, CONTENT_STATE, ITEM_TYPE
 from superdesk.resource import not_analyzed
-from superdesk.notification import push_notification
+from planning.signals import push_notification
 from apps.archive.common import get_user, get_auth
 from apps.duplication.archive_move import ITEM_MOVE
 from apps.publish.enqueue import ITEM_PUBLISH
@@ -36,6 +36,7 @@ from planning.common import ASSIGNMENT_WORKFLOW_STATE, assignment_workflow_state
     TO_BE_CONFIRMED_FIELD, TO_BE_CONFIRMED_FIELD_SCHEMA, update_assignment_on_link_unlink
 from flask import request, json, current_app as app
 from planning.planning_notifications import PlanningNotifications
+from planning.reference_data import get_reference_item
 from apps.content import push_content_notification
 from .assignments_history import ASSIGNMENT_HISTORY_ACTIONS
 
@@ -288,7 +289,7 @@ class AssignmentsService(superdesk.Service):
         user = get_user()
 
         # Determine the name of the desk that the assigment has been allocated to
-        assigned_to_desk = get_resource_service('desks').find_one(req=None, _id=assigned_to.get('desk'))
+        assigned_to_desk = get_reference_item('desks', assigned_to.get('desk'))
         desk_name = assigned_to_desk.get('name') if assigned_to_desk else 'Unknown'
 
         # Determine the display name of the assignee
@@ -306,10 +307,7 @@ class AssignmentsService(superdesk.Service):
                 )
 
         if assignee is None and assigned_to.get('user'):
-            assigned_to_user = get_resource_service('users').find_one(
-                req=None,
-                _id=assigned_to.get('user')
-            )
+            assigned_to_user = get_reference_item('users', assigned_to.get('user'))
             if assigned_to_user and assigned_to_user.get('slack_username'):
                 assignee = '@' + assigned_to_user.get('slack_username')
             else:
@@ -375,13 +373,10 @@ class AssignmentsService(superdesk.Service):
                     if original.get('assigned_to') and original.get('assigned_to').get('desk') != updates.get(
                             'assigned_to').get('desk'):
                         # Determine the name of the desk that the assigment was allocated to
-                        assigned_from_desk = get_resource_service('desks').find_one(req=None,
-                                                                                    _id=original.get('assigned_to').get(
-                                                                                        'desk'))
+                        assigned_from_desk = get_reference_item('desks', original.get('assigned_to').get('desk'))
                         desk_from_name = assigned_from_desk.get('name') if assigned_from_desk else 'Unknown'
                         assigned_from = original.get('assigned_to')
-                        assigned_from_user = get_resource_service('users').find_one(req=None,
-                                                                                    _id=assigned_from.get('user'))
+                        assigned_from_user = get_reference_item('users', assigned_from.get('user'))
                         old_assignee = assigned_from_user.get('display_name') if assigned_from_user else ''
                         PlanningNotifications().notify_assignment(target_desk=assigned_to.get('desk'),
                                                                   target_desk2=original.get('assigned_to').get('desk'),
@@ -423,8 +418,7 @@ class AssignmentsService(superdesk.Service):
                                                                   contact_id=original.get('assigned_to').get('contact'))
                         # notify the assignee
                         assigned_from = original.get('assigned_to')
-                        assigned_from_user = get_resource_service('users').find_one(req=None,
-                                                                                    _id=assigned_from.get('user'))
+                        assigned_from_user = get_reference_item('users', assigned_from.get('user'))
                         old_assignee = assigned_from_user.get('display_name') if assigned_from_user else None
                         PlanningNotifications().notify_assignment(target_user=assigned_to.get('user'),
                                                                   message='assignment_reassigned_4_msg',
@@ -466,8 +460,7 @@ class AssignmentsService(superdesk.Service):
             if original.get('assigned_to') and original.get('assigned_to').get('desk') != updates.get(
                     'assigned_to', {}).get('desk'):
                 # Determine the name of the desk that the assigment was allocated to
-                assigned_from_desk = get_resource_service('desks').find_one(req=None,
-                                                                            _id=original.get('assigned_to').get('desk'))
+                assigned_from_desk = get_reference_item('desks', original.get('assigned_to').get('desk'))
                 desk_from_name = assigned_from_desk.get('name') if assigned_from_desk else 'Unknown'
                 if original.get('assigned_to', {}).get('user', '') == str(user.get(config.ID_FIELD, None)):
                     PlanningNotifications().notify_assignment(target_desk=assigned_to.get('desk'),
@@ -537,7 +530,7 @@ class AssignmentsService(superdesk.Service):
         slugline = assignment.get('planning').get('slugline', '')
         coverage_type = assignment.get('planning').get('g2_content_type', '')
 
-        desk = get_resource_service('desks').find_one(req=None, _id=assigned_to.get('desk'))
+        desk = get_reference_item('desks', assigned_to.get('desk'))
         if event_cancellation:
             PlanningNotifications().notify_assignment(target_user=assigned_to.get('user'),
                                                       target_desk=assigned_to.get('desk') if not assigned_to.get(
@@ -580,7 +573,7 @@ class AssignmentsService(superdesk.Service):
         assignee_name = ''
         user_id = assigned_to.get('user')
         if user_id:
-            assigned_to_user = get_resource_service('users').find_one(req=None, _id=assigned_to.get('user'))
+            assigned_to_user = get_reference_item('users', assigned_to.get('user'))
             assignee_name = assigned_to_user.get('display_name')
         else:
             contact = superdesk.get_resource_service('contacts').find_one(req=None,
@@ -721,8 +714,7 @@ class AssignmentsService(superdesk.Service):
                     # publish planning
                     self.publish_planning(assignment.get('planning_item'))
 
-                    assigned_to_user = get_resource_service('users').find_one(req=None,
-                                                                              _id=get_user().get(config.ID_FIELD, ''))
+                    assigned_to_user = get_reference_item('users', get_user().get(config.ID_FIELD, ''))
                     assignee = assigned_to_user.get('display_name') if assigned_to_user else 'Unknown'
                     target_user = assignment.get('assigned_to', {}).get('assignor_desk')
 
@@ -742,24 +734,36 @@ class AssignmentsService(superdesk.Service):
 
     def on_events_updated(self, updates, original):
         """Send assignment notifications if any relevant Event metadata has changed"""
+        self.on_events_series_updated([updates], [original])
 
-        event = deepcopy(original)
-        event.update(updates)
-        plannings = list(get_resource_service('events').get_plannings_for_event(event))
+    def on_events_series_updated(self, updates, originals):
+        """Send assignment notifications for Events with relevant metadata changes
 
-        if not plannings:
-            # If this Event has no associated Planning items
-            # then there is no need to send notifications
-            return
+        The Planning items and Assignments for all the Events are retrieved with a single query each
+        """
+        events = {}
+        for event_updates, original in zip(updates, originals):
+            if not any(
+                (event_updates.get(field) or []) != (original.get(field) or [])
+                for field in ['location', 'event_contact_info', 'files', 'links']
+            ):
+                # If no relevant Event fields have changed
+                # then there is no need to send notifications
+                continue
+
+            event = deepcopy(original)
+            event.update(event_updates)
+            events[event[config.ID_FIELD]] = event
 
-        changed_fields = []
+        if not events:
+            return
 
-        for field in ['location', 'event_contact_info', 'files', 'links']:
-            if (updates.get(field) or []) != (original.get(field) or []):
-                changed_fields.append(field)
+        plannings = list(get_resource_service('planning').find(where={
+            'event_item': {'$in': list(events.keys())}
+        }))
 
-        if not changed_fields:
-            # If no relevant Event fields have changed
+        if not plannings:
+            # If these Events have no associated Planning items
             # then there is no need to send notifications
             return
 
@@ -767,6 +771,10 @@ class AssignmentsService(superdesk.Service):
         get_resource_service('planning').generate_related_assignments(plannings)
 
         for planning in plannings:
+            event = events.get(planning.get('event_item'))
+            if not event:
+                continue
+
             for coverage in planning.get('coverages') or []:
                 assigned_to = coverage.get('assigned_to') or {}
 
@@ -1049,7 +1057,7 @@ class AssignmentsService(superdesk.Service):
             return True
 
         text_assignment = False
-        content_types = get_resource_service('vocabularies').find_one(req=None, _id='g2_content_type')
+        content_types = get_reference_item('vocabularies', 'g2_content_type')
         if content_types:
             content_type = [t for t in (content_types.get('items') or [])
                             if t.get('qcode') == assignment.get('planning', {}).get('g2_content_type')]
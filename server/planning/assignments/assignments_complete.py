@@ -10,7 +10,7 @@
 
 from superdesk import get_resource_service
 from superdesk.services import BaseService
-from superdesk.notification import push_notification
+from planning.signals import push_notification
 from superdesk.errors import SuperdeskApiError
 from apps.archive.common import get_user, get_auth
 from eve.utils import config
@@ -19,6 +19,7 @@ from .assignments import AssignmentsResource, assignments_schema, AssignmentsSer
 from planning.common import ASSIGNMENT_WORKFLOW_STATE, remove_lock_information, get_coverage_type_name,\
     get_next_assignment_status, get_coverage_for_assignment
 from planning.planning_notifications import PlanningNotifications
+from planning.reference_data import get_reference_item
 
 
 assignments_complete_schema = deepcopy(assignments_schema)
@@ -127,7 +128,7 @@ class AssignmentsCompleteService(BaseService):
 
         # Send notification that the work has been completed
         # Determine the display name of the assignee
-        assigned_to_user = get_resource_service('users').find_one(req=None, _id=user)
+        assigned_to_user = get_reference_item('users', user)
         assignee = assigned_to_user.get('display_name') if assigned_to_user else 'Unknown'
         target_user = original.get('assigned_to', {}).get('assignor_user')
         if target_user is None:
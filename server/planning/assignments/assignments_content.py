@@ -26,6 +26,7 @@ from planning.planning_article_export import get_desk_template
 from planning.common import ASSIGNMENT_WORKFLOW_STATE, get_coverage_type_name, get_next_assignment_status,\
     get_coverage_for_assignment, get_archive_items_for_assignment
 from planning.planning_notifications import PlanningNotifications
+from planning.reference_data import get_reference_item
 from planning.archive import create_item_from_template
 
 
@@ -53,7 +54,7 @@ def get_item_from_assignment(assignment, template=None):
         return item
 
     desk_id = assignment.get('assigned_to').get('desk')
-    desk = get_resource_service('desks').find_one(req=None, _id=desk_id)
+    desk = get_reference_item('desks', desk_id)
     if template is not None:
         template = get_resource_service('content_templates').find_one(req=None, template_name=template)
     else:
@@ -200,8 +201,7 @@ class AssignmentsContentService(Service):
 
             if str(assignor) != str(item.get('task').get('user')):
                 # Determine the display name of the assignee
-                assigned_to_user = get_resource_service('users').find_one(req=None,
-                                                                          _id=str(item.get('task').get('user')))
+                assigned_to_user = get_reference_item('users', str(item.get('task').get('user')))
                 assignee = assigned_to_user.get('display_name') if assigned_to_user else 'Unknown'
                 PlanningNotifications().notify_assignment(target_desk=None,
                                                           target_user=assignor,
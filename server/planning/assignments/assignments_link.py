@@ -17,7 +17,7 @@ from planning.common import ASSIGNMENT_WORKFLOW_STATE, get_related_items, get_co
     is_content_link_to_coverage_allowed
 from apps.archive.common import get_user, is_assigned_to_a_desk
 from apps.content import push_content_notification
-from superdesk.notification import push_notification
+from planning.signals import push_notification
 import logging
 
 logger = logging.getLogger(__name__)
@@ -15,7 +15,7 @@ from apps.content import push_content_notification
 from planning.item_lock import LOCK_USER, LOCK_SESSION
 from apps.archive.common import get_user, get_auth
 from planning.planning_notifications import PlanningNotifications
-from superdesk.notification import push_notification
+from planning.signals import push_notification
 from .assignments_history import ASSIGNMENT_HISTORY_ACTIONS
 
 
@@ -16,7 +16,7 @@ from superdesk.celery_task_utils import get_lock_id
 from superdesk.lock import lock, unlock, remove_locks
 from eve.utils import config, ParsedRequest
 from flask import json
-from superdesk.notification import push_notification
+from planning.signals import push_notification
 
 
 class DeleteMarkedAssignments(Command):
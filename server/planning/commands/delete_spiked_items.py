@@ -9,30 +9,43 @@
 # at https://www.sourcefabric.org/superdesk/license
 
 from flask import current_app as app
-from superdesk import Command, command, get_resource_service
+from superdesk import Command, command, get_resource_service, Option
 from superdesk.logging import logger
 from superdesk.utc import utcnow
 from superdesk.celery_task_utils import get_lock_id
 from superdesk.lock import lock, unlock, remove_locks
 from datetime import timedelta
 from eve.utils import config
-from planning.common import WORKFLOW_STATE
+from bson.objectid import ObjectId
+from planning.common import WORKFLOW_STATE, get_mongo_collection
+from .utils import CommandCheckpoint, run_in_batches
 
 
 class DeleteSpikedItems(Command):
     """
     Delete expired spiked `Events` and `Planning` items.
 
+    workers: No. of worker threads used to delete the items. Default is 1.
+    checkpoint: Path to a file used to resume an interrupted run.
     Example:
     ::
 
         $ python manage.py planning:delete_spiked
+        $ python manage.py planning:delete_spiked --workers=4 --checkpoint=/tmp/delete_spiked.json
 
     """
 
+    option_list = (
+        Option('--workers', '-w', dest='workers', required=False),
+        Option('--checkpoint', '-c', dest='checkpoint', required=False),
+    )
+
     log_msg = ''
+    workers = 1
+    batch_size = 500
+    checkpoint = None
 
-    def run(self):
+    def run(self, workers=None, checkpoint=None):
         now = utcnow()
         self.log_msg = 'Delete Spiked Items Time: {}.'.format(now)
         logger.info('{} Starting to delete spiked items at.'.format(self.log_msg))
@@ -47,18 +60,30 @@ class DeleteSpikedItems(Command):
             logger.info('{} Delete spiked items task is already running'.format(self.log_msg))
             return
 
+        self.workers = int(workers or app.config.get('PLANNING_DELETE_SPIKED_WORKERS', 1))
+        self.batch_size = int(app.config.get('PLANNING_DELETE_SPIKED_BATCH_SIZE', 500))
+        self.checkpoint = CommandCheckpoint(checkpoint or app.config.get('PLANNING_DELETE_SPIKED_CHECKPOINT_FILE'))
+        if self.checkpoint.load():
+            logger.info('{} Resuming from checkpoint {}'.format(self.log_msg, self.checkpoint.path))
+
         expiry_datetime = now - timedelta(minutes=expire_interval)
+        completed = True
 
         try:
             self._delete_spiked_events(expiry_datetime)
         except Exception as e:
+            completed = False
             logger.exception(e)
 
         try:
             self._delete_spiked_planning(expiry_datetime)
         except Exception as e:
+            completed = False
             logger.exception(e)
 
+        if completed:
+            self.checkpoint.clear()
+
         unlock(lock_name)
 
         logger.info('{} Completed deleting spiked items.'.format(self.log_msg))
@@ -68,84 +93,163 @@ class DeleteSpikedItems(Command):
         logger.info('{} Starting to delete spiked events'.format(self.log_msg))
         events_service = get_resource_service('events')
 
+        if self.checkpoint.get('events') is None:
+            # Obtain the full list of Events that we're to process first
+            # As subsequent queries will change the list of returned items
+            events_to_delete = set()
+            recurrence_ids = set()
+            for items in events_service.get_expired_items(expiry_datetime, spiked_events_only=True):
+                for item in items:
+                    if item.get('recurrence_id'):
+                        recurrence_ids.add(item['recurrence_id'])
+                    else:
+                        events_to_delete.add(item[config.ID_FIELD])
+
+            self.checkpoint.data['series'] = list(self.get_expired_and_spiked_series(recurrence_ids, expiry_datetime))
+            self.checkpoint.set('events', list(events_to_delete))
+
         events_deleted = set()
-        series_to_delete = dict()
-
-        # Obtain the full list of Events that we're to process first
-        # As subsequent queries will change the list of returned items
-        events = dict()
-        for items in events_service.get_expired_items(expiry_datetime, spiked_events_only=True):
-            events.update({item[config.ID_FIELD]: item for item in items})
-
-        for event_id, event in events.items():
-            if event.get('recurrence_id') and event['recurrence_id'] not in series_to_delete:
-                spiked, events = self.is_series_expired_and_spiked(event, expiry_datetime)
-                if spiked:
-                    series_to_delete[event['recurrence_id']] = events
-            else:
-                events_service.delete_action(lookup={'_id': event_id})
-                events_deleted.add(event_id)
-
-        # Delete recurring series
-        for recurrence_id, events in series_to_delete.items():
-            events_service.delete_action(lookup={'recurrence_id': recurrence_id})
-            events_deleted.add(events)
+        series_deleted = set()
+
+        def delete_events(event_ids):
+            events_service.delete_action(lookup={
+                config.ID_FIELD: {'$in': event_ids},
+                'state': WORKFLOW_STATE.SPIKED
+            })
+
+        def on_events_deleted(event_ids):
+            events_deleted.update(event_ids)
+            self._remove_from_checkpoint('events', event_ids)
+
+        run_in_batches(
+            delete_events,
+            self.checkpoint.get('events'),
+            self.batch_size,
+            self.workers,
+            on_events_deleted
+        )
+
+        # Series from a previous run may have changed since, so make sure they are still expired
+        series_to_delete = self.get_expired_and_spiked_series(self.checkpoint.get('series') or [], expiry_datetime)
+
+        def delete_series(series_ids):
+            events_service.delete_action(lookup={'recurrence_id': {'$in': series_ids}})
+
+        def on_series_deleted(series_ids):
+            series_deleted.update(series_ids)
+            self._remove_from_checkpoint('series', series_ids)
+
+        run_in_batches(
+            delete_series,
+            list(series_to_delete),
+            self.batch_size,
+            self.workers,
+            on_series_deleted
+        )
+        self.checkpoint.remove('series')
+        self.checkpoint.remove('events')
 
         logger.info('{} {} Events deleted: {}'.format(self.log_msg, len(events_deleted), list(events_deleted)))
+        logger.info('{} {} Event series deleted: {}'.format(self.log_msg, len(series_deleted), list(series_deleted)))
 
-    def is_series_expired_and_spiked(self, event, expiry_datetime):
-        historic, past, future = get_resource_service('events').get_recurring_timeline(event, spiked=True)
+    @staticmethod
+    def get_expired_and_spiked_series(recurrence_ids, expiry_datetime):
+        """Returns the recurrence_ids of the series where every Event is spiked and expired
 
-        # There are future events, so the entire series is not expired.
-        if len(future) > 0:
-            return False
+        Each series is evaluated once, using a single query for all provided series.
+        Rescheduled, Cancelled and Postponed Events are ignored, as these are no longer part of the active series.
 
-        def check_series_expired_and_spiked(series):
-            for event in series:
-                if event.get('state') != WORKFLOW_STATE.SPIKED or event['dates']['end'] > expiry_datetime:
-                    return False
+        :param list recurrence_ids: List of recurrence_ids to evaluate
+        :param datetime expiry_datetime: Events ending after this are not expired
+        :return set: The recurrence_ids of the series that can be deleted
+        """
+        expired_series = set(recurrence_ids)
+        if not expired_series:
+            return expired_series
 
-            return True
+        events = get_mongo_collection('events').find(
+            {
+                'recurrence_id': {'$in': list(expired_series)},
+                'state': {'$nin': [WORKFLOW_STATE.RESCHEDULED, WORKFLOW_STATE.CANCELLED, WORKFLOW_STATE.POSTPONED]}
+            },
+            {'recurrence_id': 1, 'state': 1, 'dates.end': 1}
+        )
 
-        if check_series_expired_and_spiked(historic) and check_series_expired_and_spiked(past):
-            return True, [historic + past]
+        for event in events:
+            if event.get('state') != WORKFLOW_STATE.SPIKED or event['dates']['end'] > expiry_datetime:
+                expired_series.discard(event['recurrence_id'])
 
-        return False
+        return expired_series
 
     def _delete_spiked_planning(self, expiry_datetime):
         logger.info('{} Starting to delete spiked planning items'.format(self.log_msg))
         planning_service = get_resource_service('planning')
+        assignment_service = get_resource_service('assignments')
 
-        # Obtain the full list of Planning items that we're to process first
-        # As subsequent queries will change the list of returnd items
-        plans = dict()
-        for items in planning_service.get_expired_items(expiry_datetime, spiked_planning_only=True):
-            plans.update({item[config.ID_FIELD]: item for item in items})
+        if self.checkpoint.get('planning') is None:
+            # Obtain the full list of Planning items that we're to process first
+            # As subsequent queries will change the list of returnd items
+            plans_to_delete = set()
+            assignments_to_delete = set()
+            for items in planning_service.get_expired_items(expiry_datetime, spiked_planning_only=True):
+                for plan in items:
+                    plans_to_delete.add(plan[config.ID_FIELD])
+                    for coverage in plan.get('coverages') or []:
+                        assignment_id = (coverage.get('assigned_to') or {}).get('assignment_id')
+                        if assignment_id:
+                            assignments_to_delete.add(str(assignment_id))
+
+            # Store the Assignments first, so they're not left behind if the run is interrupted
+            # after the Planning items have been deleted
+            self.checkpoint.data['assignments'] = list(assignments_to_delete)
+            self.checkpoint.set('planning', list(plans_to_delete))
 
         plans_deleted = set()
         assignments_deleted = set()
-        assignments_to_delete = []
 
-        for plan_id, plan in plans.items():
-            for coverage in plan.get('coverages') or []:
-                assignment_id = (coverage.get('assigned_to') or {}).get('assignment_id')
-                if assignment_id:
-                    assignments_to_delete.append(assignment_id)
-
-            # Now, delete the planning item
-            planning_service.delete_action(lookup={'_id': plan_id})
-            plans_deleted.add(plan_id)
-
-        # Delete assignments
-        assignment_service = get_resource_service('assignments')
-        for assign_id in assignments_to_delete:
-            assignment_service.delete(lookup={'_id': assign_id})
-            assignments_deleted.add(assign_id)
+        def delete_plans(plan_ids):
+            planning_service.delete_action(lookup={
+                config.ID_FIELD: {'$in': plan_ids},
+                'state': WORKFLOW_STATE.SPIKED
+            })
+
+        def on_plans_deleted(plan_ids):
+            plans_deleted.update(plan_ids)
+            self._remove_from_checkpoint('planning', plan_ids)
+
+        run_in_batches(
+            delete_plans,
+            self.checkpoint.get('planning'),
+            self.batch_size,
+            self.workers,
+            on_plans_deleted
+        )
+
+        def delete_assignments(assignment_ids):
+            assignment_service.delete(lookup={config.ID_FIELD: {'$in': [ObjectId(_id) for _id in assignment_ids]}})
+
+        def on_assignments_deleted(assignment_ids):
+            assignments_deleted.update(assignment_ids)
+            self._remove_from_checkpoint('assignments', assignment_ids)
+
+        run_in_batches(
+            delete_assignments,
+            self.checkpoint.get('assignments') or [],
+            self.batch_size,
+            self.workers,
+            on_assignments_deleted
+        )
+        self.checkpoint.remove('assignments')
+        self.checkpoint.remove('planning')
 
         logger.info('{} {} Assignments deleted: {}'.format(self.log_msg,
                                                            len(assignments_deleted),
                                                            list(assignments_deleted)))
         logger.info('{} {} Planning items deleted: {}'.format(self.log_msg, len(plans_deleted), list(plans_deleted)))
 
+    def _remove_from_checkpoint(self, key, ids):
+        remaining = set(self.checkpoint.get(key) or []) - set(ids)
+        self.checkpoint.set(key, list(remaining))
+
 
 command('planning:delete_spiked', DeleteSpikedItems())
@@ -8,6 +8,9 @@
 # AUTHORS and LICENSE files distributed with this source code, or
 # at https://www.sourcefabric.org/superdesk/license
 
+import json
+import os
+import tempfile
 from .delete_spiked_items import DeleteSpikedItems
 from planning.tests import TestCase
 from superdesk import get_resource_service
@@ -197,6 +200,23 @@ class DeleteSpikedItemsTest(TestCase):
             DeleteSpikedItems().run()
             self.assertDeleteOperation('events', ['e1', 'e2'])
 
+    def test_event_series_with_postponed_event_successful_delete(self):
+        with self.app.app_context():
+            self.insert('events', [
+                {'guid': 'e1', **expired['event'], 'recurrence_id': 'r123'},
+                {
+                    'guid': 'e2',
+                    'recurrence_id': 'r123',
+                    'dates': {
+                        'start': now + timedelta(hours=1),
+                        'end': now + timedelta(hours=2)
+                    },
+                    'state': WORKFLOW_STATE.POSTPONED
+                }
+            ])
+            DeleteSpikedItems().run()
+            self.assertDeleteOperation('events', ['e1', 'e2'])
+
     def test_planning(self):
         with self.app.app_context():
             self.insert('planning', [
@@ -245,3 +265,34 @@ class DeleteSpikedItemsTest(TestCase):
             self.assertAssignmentDeleted([assignments['p4']])
 
             self.assertEqual(self.get_assignments_count(), 3)
+
+    def test_resume_from_checkpoint(self):
+        with self.app.app_context():
+            self.insert('events', [
+                {'guid': 'e1', **expired['event']},
+                {'guid': 'e2', **expired['event']},
+                {'guid': 'e3', **expired['event'], 'recurrence_id': 'r123'},
+                {'guid': 'e4', **active['event']},
+            ])
+            self.insert('planning', [
+                {'guid': 'p1', **expired['plan'], 'coverages': []},
+                {'guid': 'p2', **expired['plan'], 'coverages': []},
+            ])
+
+            checkpoint_path = os.path.join(tempfile.mkdtemp(), 'delete_spiked.json')
+
+            # A previous run was interrupted after deleting 'e2'
+            # Expired items not in the checkpoint are only collected by the next run
+            with open(checkpoint_path, 'w') as f:
+                json.dump({'events': ['e1'], 'series': ['r123']}, f)
+
+            DeleteSpikedItems().run(workers=2, checkpoint=checkpoint_path)
+
+            self.assertDeleteOperation('events', ['e1', 'e3'])
+            self.assertDeleteOperation('events', ['e2', 'e4'], not_deleted=True)
+            self.assertDeleteOperation('planning', ['p1', 'p2'])
+            self.assertFalse(os.path.exists(checkpoint_path))
+
+            DeleteSpikedItems().run(checkpoint=checkpoint_path)
+            self.assertDeleteOperation('events', ['e2'])
+            self.assertDeleteOperation('events', ['e4'], not_deleted=True)
@@ -1,5 +1,7 @@
 import json
+import time
 
+from flask import current_app as app
 from eve.utils import config, ParsedRequest
 from superdesk import Command, command, get_resource_service, Option
 from superdesk.logging import logger
@@ -7,17 +9,55 @@ from superdesk.celery_task_utils import get_lock_id
 from superdesk.lock import lock, unlock
 from superdesk.utils import json_serialize_datetime_objectId
 from superdesk.publish.transmitters.http_push import HTTPPushService
-from planning.common import get_version_item_for_post
+from superdesk.errors import PublishHTTPPushError
+from planning.common import get_version_item_for_post, iter_search_after, get_search_after
 from planning.output_formatters import JsonPlanningFormatter, JsonEventFormatter
+from .utils import CommandCheckpoint, run_in_batches
 
 
 class NewsroomHTTPTransmitter(HTTPPushService):
+    #: Number of times a failed transmission is retried
+    retries = 0
+
+    #: Seconds to wait before the first retry, doubled for each subsequent retry
+    backoff = 1.0
+
     def transmit(self, queue_item):
-        try:
-            self._transmit(queue_item, None)
-            logger.info('Successfully transmitted item {}'.format(queue_item.get('item_id')))
-        except Exception:
-            logger.exception("Failed to transmit the item {}.".format(queue_item.get('item_id')))
+        """Transmit a single item, returns True if successful"""
+        return self._transmit_with_retries(
+            lambda: self._transmit(queue_item, None),
+            queue_item.get('item_id')
+        )
+
+    def transmit_batch(self, queue_items):
+        """Transmit the items in a single request, with the payload being a list of the formatted items"""
+        destination = queue_items[0].get('destination') or {}
+        data = '[{}]'.format(','.join(queue_item['formatted_item'] for queue_item in queue_items))
+
+        def push():
+            status_code = self._push_item(destination, data)
+            if status_code not in (200, 201):
+                raise PublishHTTPPushError.httpPushError(
+                    Exception('Failed to push the items, status code {}'.format(status_code)),
+                    destination
+                )
+
+        return self._transmit_with_retries(push, [queue_item.get('item_id') for queue_item in queue_items])
+
+    def _transmit_with_retries(self, callback, item_ids):
+        for attempt in range(self.retries + 1):
+            try:
+                callback()
+                logger.info('Successfully transmitted item {}'.format(item_ids))
+                return True
+            except Exception:
+                if attempt >= self.retries:
+                    logger.exception("Failed to transmit the item {}.".format(item_ids))
+                    return False
+
+                delay = self.backoff * (2 ** attempt)
+                logger.warning('Failed to transmit the item {}, retrying in {} seconds'.format(item_ids, delay))
+                time.sleep(delay)
 
 
 class ExportToNewsroom(Command):
@@ -27,11 +67,17 @@ class ExportToNewsroom(Command):
     resource-url: resource url of the Newsroom website
     assets-url: assets url of the Newsroom website
     page-size: No. of documents to process in a batch. Default is 200.
+    workers: No. of worker threads used to transmit the items. Default is 1.
+    retries: No. of times a failed transmission is retried. Default is 3.
+    batch-size: No. of items sent per request, the payload being a list of items. Default is 1.
+    checkpoint: Path to a file used to resume an interrupted export.
     Example:
     ::
 
         $ python manage.py planning:export_to_newsroom --resource-url=http://<host>:<port>/<path>
         --assets-url=http://<host>:<port>/<path> --page-size=200
+        $ python manage.py planning:export_to_newsroom --resource-url=http://<host>:<port>/<path>
+        --assets-url=http://<host>:<port>/<path> --workers=8 --checkpoint=/tmp/export_to_newsroom.json
 
     """
 
@@ -39,8 +85,17 @@ class ExportToNewsroom(Command):
         Option('--resource-url', '-u', dest='resource_url', required=True),
         Option('--assets-url', '-a', dest='assets_url', required=True),
         Option('--page-size', '-p', dest='size', required=False),
+        Option('--workers', '-w', dest='workers', required=False),
+        Option('--retries', '-r', dest='retries', required=False),
+        Option('--batch-size', '-b', dest='batch_size', required=False),
+        Option('--checkpoint', '-c', dest='checkpoint', required=False),
     )
     page_size = 200
+    workers = 1
+    retries = 3
+    backoff = 1.0
+    batch_size = 1
+    checkpoint = None
 
     # dummy subscriber
     subscriber = {
@@ -51,7 +106,8 @@ class ExportToNewsroom(Command):
     resource_url = None
     assets_url = None
 
-    def run(self, resource_url, assets_url, size=None):
+    def run(self, resource_url, assets_url, size=None, workers=None, retries=None, batch_size=None,
+            checkpoint=None):
         logger.info('Starting to export content')
 
         if size:
@@ -59,15 +115,29 @@ class ExportToNewsroom(Command):
 
         self.resource_url = resource_url
         self.assets_url = assets_url
+        self.workers = int(workers or app.config.get('PLANNING_EXPORT_TO_NEWSROOM_WORKERS', 1))
+        self.retries = int(retries if retries is not None else app.config.get('PLANNING_EXPORT_TO_NEWSROOM_RETRIES', 3))
+        self.backoff = float(app.config.get('PLANNING_EXPORT_TO_NEWSROOM_BACKOFF', 1.0))
+        self.batch_size = int(batch_size or app.config.get('PLANNING_EXPORT_TO_NEWSROOM_BATCH_SIZE', 1))
+        self.checkpoint = CommandCheckpoint(checkpoint or app.config.get('PLANNING_EXPORT_TO_NEWSROOM_CHECKPOINT_FILE'))
 
         lock_name = get_lock_id('planning', 'export_to_newsroom')
         if not lock(lock_name, expire=610):
             logger.info('export to newsroom task is already running')
             return
 
+        if self.checkpoint.load():
+            logger.info('Resuming export from checkpoint {}'.format(self.checkpoint.path))
+
         try:
             self._export_events()
             self._export_planning()
+
+            if self._get_failed_ids('events') or self._get_failed_ids('planning'):
+                # Keep the checkpoint, so the failed items are sent again on the next run
+                logger.warning('Some items failed to export, keeping checkpoint {}'.format(self.checkpoint.path))
+            else:
+                self.checkpoint.clear()
         except Exception:
             logger.exception('Failed to export events and planning')
         finally:
@@ -75,8 +145,13 @@ class ExportToNewsroom(Command):
 
         logger.info('Completed export events and planning.')
 
-    def _fetch_items(self, fetch_callback):
-        """"""
+    def _fetch_items(self, fetch_callback, search_after=None, ids=None):
+        """Fetch the posted items in pages using a stable ``search_after`` cursor
+
+        :param func fetch_callback: callback to retrieve the items (i.e. ``service.get``)
+        :param list search_after: sort values to continue from (i.e. from the checkpoint)
+        :param list ids: if provided, only fetch the items with these ids (i.e. failed items from the checkpoint)
+        """
         query = {
             'query': {
                 'bool': {
@@ -85,72 +160,138 @@ class ExportToNewsroom(Command):
                         {'terms': {'state': ['scheduled', 'postponed', 'rescheduled']}}
                     ]
                 }
-            },
-            'sort': [
-                {'versioncreated': {'order': 'asc'}}
-            ],
-            'size': 0
+            }
         }
-        req = ParsedRequest()
-        req.args = {'source': json.dumps(query)}
-        cursor = fetch_callback(req=req, lookup=None)
-        total_documents = cursor.count()
-
-        if total_documents > 0:
-            query['size'] = self.page_size
-            total_pages = len(range(0, total_documents, self.page_size))
-            for page_num in range(0, total_pages):
-                query['from'] = page_num * self.page_size
-                req = ParsedRequest()
-                req.args = {'source': json.dumps(query)}
-                cursor = fetch_callback(req=req, lookup=None)
-                yield list(cursor)
+        if ids:
+            query['query']['bool']['must'].append({'terms': {config.ID_FIELD: ids}})
+
+        def fetch(source):
+            req = ParsedRequest()
+            req.args = {'source': json.dumps(source, default=json_serialize_datetime_objectId)}
+            return fetch_callback(req=req, lookup=None)
+
+        return iter_search_after(
+            fetch,
+            query,
+            'versioncreated',
+            page_size=int(self.page_size),
+            search_after=search_after
+        )
+
+    def _get_transmitter(self):
+        transmitter = NewsroomHTTPTransmitter()
+        transmitter.retries = self.retries
+        transmitter.backoff = self.backoff
+        return transmitter
 
     def _export_events(self):
         """Export events"""
         logger.info('Starting to export events')
-        events_service = get_resource_service('events')
-
         formatter = JsonEventFormatter()
-        destination = self._get_destination('json_event')
-        formatter.set_destination(destination=destination, subscriber=self.subscriber)
-        transmitter = NewsroomHTTPTransmitter()
-        for items in self._fetch_items(events_service.get):
-            for item in items:
-                try:
-                    logger.info('Processing event item: {}'.format(item.get('_id')))
-                    version, event = get_version_item_for_post(item)
-                    queue_item = self._get_queue_item(event, formatter._format_item, destination)
-                    transmitter.transmit(queue_item)
-                    logger.info('Processing processed item: {}'.format(item.get('_id')))
-                except Exception:
-                    logger.exception('Failed to export event: {}'.format(item.get('_id')))
+
+        self._export_items(
+            'events',
+            formatter,
+            lambda items: [formatter._format_item(item) for item in items]
+        )
 
     def _export_planning(self):
-        """Export events"""
+        """Export planning"""
         logger.info('Starting to export planning')
-        planning_service = get_resource_service('planning')
-
         formatter = JsonPlanningFormatter()
-        destination = self._get_destination('json_planning')
+
+        self._export_items('planning', formatter, formatter.format_items)
+
+    @staticmethod
+    def _get_failed_key(resource):
+        return '{}_failed'.format(resource)
+
+    def _get_failed_ids(self, resource):
+        return self.checkpoint.get(self._get_failed_key(resource)) or []
+
+    def _export_items(self, resource, formatter, format_items):
+        """Export the items of the resource, one page at a time
+
+        The items of each page are transmitted using a pool of ``workers`` threads. Once the page
+        has been transmitted, the sort values of its last item are stored in the checkpoint, along with
+        the ids of the items that failed to be transmitted. The failed items are sent again on the next run.
+
+        :param str resource: the resource to export, ``events`` or ``planning``
+        :param formatter: the formatter for the resource
+        :param func format_items: callback to format a list of items
+        """
+        destination = self._get_destination(formatter.format_type)
         formatter.set_destination(destination=destination, subscriber=self.subscriber)
-        transmitter = NewsroomHTTPTransmitter()
-        for items in self._fetch_items(planning_service.get):
-            for item in items:
-                try:
-                    logger.info('Processing planning item: {}'.format(item.get('_id')))
-                    version, plan = get_version_item_for_post(item)
-                    queue_item = self._get_queue_item(plan, formatter._format_item, destination)
-                    transmitter.transmit(queue_item)
-                    logger.info('Processed planning item: {}'.format(item.get('item_id')))
-                except Exception:
-                    logger.exception('Failed to export planning item: {}'.format(item.get('_id')))
-
-    def _get_queue_item(self, item, format_callback, destination):
+        transmitter = self._get_transmitter()
+        service = get_resource_service(resource)
+        transmitted = []
+        failed = []
+
+        def transmit(queue_items):
+            if len(queue_items) == 1:
+                success = transmitter.transmit(queue_items[0])
+            else:
+                success = transmitter.transmit_batch(queue_items)
+
+            (transmitted if success is not False else failed).extend(
+                queue_item.get('item_id') for queue_item in queue_items
+            )
+
+        def export_page(items):
+            run_in_batches(
+                transmit,
+                self._get_queue_items(resource, items, format_items, destination),
+                self.batch_size,
+                self.workers
+            )
+
+        retry_ids = self._get_failed_ids(resource)
+        if retry_ids:
+            logger.info('Retrying {} failed {} items'.format(len(retry_ids), resource))
+            for items in self._fetch_items(service.get, ids=retry_ids):
+                export_page(items)
+
+        self.checkpoint.set(self._get_failed_key(resource), list(failed))
+
+        for items in self._fetch_items(service.get, self.checkpoint.get(resource)):
+            # Get the position of the page before the items are formatted
+            search_after = get_search_after(items[-1], 'versioncreated')
+
+            export_page(items)
+            self.checkpoint.update({
+                resource: search_after,
+                self._get_failed_key(resource): list(failed),
+            })
+
+        logger.info('Exported {} {} items, {} failed: {}'.format(len(transmitted), resource, len(failed), failed))
+
+    def _get_queue_items(self, resource, items, format_items, destination):
+        """Format the items, falling back to formatting one item at a time if the batch fails"""
+        items = [get_version_item_for_post(item)[1] for item in items]
+
+        try:
+            return [
+                self._get_queue_item(item, formatted_item, destination)
+                for item, formatted_item in zip(items, format_items(items))
+            ]
+        except Exception:
+            logger.exception('Failed to format {} items, formatting items individually'.format(resource))
+
+        queue_items = []
+        for item in items:
+            try:
+                logger.info('Processing {} item: {}'.format(resource, item.get('_id')))
+                queue_items.append(self._get_queue_item(item, format_items([item])[0], destination))
+            except Exception:
+                logger.exception('Failed to export {} item: {}'.format(resource, item.get('_id')))
+
+        return queue_items
+
+    def _get_queue_item(self, item, formatted_item, destination):
         """Get the queue item
 
         :param dict item: item to transmit
-        :param func format_callback: callback to format the item
+        :param dict formatted_item: the formatted item
         :param dict destination: destination for the queue item
         """
         return {
@@ -158,7 +299,7 @@ class ExportToNewsroom(Command):
             'item_version': item.get(config.VERSION),
             'subscriber_id': self.subscriber.get('_id'),
             'destination': destination,
-            'formatted_item': json.dumps(format_callback(item), default=json_serialize_datetime_objectId),
+            'formatted_item': json.dumps(formatted_item, default=json_serialize_datetime_objectId),
             'content_type': item.get('type')
         }
 
@@ -8,7 +8,13 @@
 # AUTHORS and LICENSE files distributed with this source code, or
 # at https://www.sourcefabric.org/superdesk/license
 import mock
+import json
+import os
+import tempfile
+import threading
 from datetime import timedelta
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
 from .export_to_newsroom import ExportToNewsroom
 from superdesk import get_resource_service
 from superdesk.utc import utcnow
@@ -26,6 +32,54 @@ class MockTransmitter:
             self.planning.append(queue_item.get('item_id'))
 
 
+class NewsroomRequestHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8'))
+        items = body if isinstance(body, list) else [body]
+
+        with self.server.lock:
+            self.server.requests += 1
+            if any(item['_id'] in self.server.fail_once for item in items):
+                self.server.fail_once.difference_update(item['_id'] for item in items)
+                self.send_response(500)
+                self.end_headers()
+                return
+
+            self.server.received.extend((item['type'], item['_id']) for item in items)
+
+        self.send_response(201)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalNewsroom(ThreadingMixIn, HTTPServer):
+    """Local stand-in for the Newsroom push endpoint"""
+
+    daemon_threads = True
+
+    def __init__(self, fail_once=None):
+        super().__init__(('127.0.0.1', 0), NewsroomRequestHandler)
+        self.lock = threading.Lock()
+        self.received = []
+        self.requests = 0
+        self.fail_once = set(fail_once or [])
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}/push'.format(self.server_address[1])
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+
+
 class ExportToNewsroomTest(TestCase):
 
     def setUp(self):
@@ -231,3 +285,88 @@ class ExportToNewsroomTest(TestCase):
 
             for item_id in mock_transmitter.return_value.planning:
                 self.assertIn(item_id, valid_ids)
+
+    def _get_checkpoint_path(self):
+        fd, path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        os.remove(path)
+        self.addCleanup(lambda: os.path.exists(path) and os.remove(path))
+        return path
+
+    def test_export_to_local_http_server(self):
+        self.app.config['PLANNING_EXPORT_TO_NEWSROOM_BACKOFF'] = 0
+        with self.app.app_context():
+            self.setUp_data()
+
+            checkpoint = self._get_checkpoint_path()
+            with LocalNewsroom(fail_once=['postponed']) as newsroom:
+                ExportToNewsroom().run(
+                    assets_url=newsroom.url,
+                    resource_url=newsroom.url,
+                    workers=3,
+                    checkpoint=checkpoint
+                )
+
+            valid_ids = ['scheduled', 'postponed', 'rescheduled']
+            self.assertEqual(
+                sorted(newsroom.received),
+                sorted([('event', item_id) for item_id in valid_ids] + [('planning', item_id) for item_id in valid_ids])
+            )
+
+            # The failed Event was retried
+            self.assertEqual(newsroom.requests, 7)
+            self.assertFalse(os.path.exists(checkpoint))
+
+    def test_export_batched_payloads(self):
+        with self.app.app_context():
+            self.setUp_data()
+
+            with LocalNewsroom() as newsroom:
+                ExportToNewsroom().run(assets_url=newsroom.url, resource_url=newsroom.url, batch_size=2)
+
+            self.assertEqual(len(newsroom.received), 6)
+            self.assertEqual(newsroom.requests, 4)
+
+    def test_export_resumes_from_checkpoint(self):
+        with self.app.app_context():
+            self.setUp_data()
+            checkpoint = self._get_checkpoint_path()
+
+            with LocalNewsroom() as newsroom:
+                with mock.patch.object(ExportToNewsroom, '_export_planning', side_effect=Exception('Interrupted')):
+                    ExportToNewsroom().run(assets_url=newsroom.url, resource_url=newsroom.url, checkpoint=checkpoint)
+
+                self.assertEqual(len(newsroom.received), 3)
+                self.assertTrue(os.path.exists(checkpoint))
+
+                # The Events are not exported again
+                ExportToNewsroom().run(assets_url=newsroom.url, resource_url=newsroom.url, checkpoint=checkpoint)
+
+            self.assertEqual(len(newsroom.received), 6)
+            self.assertEqual(sorted(item_type for item_type, _id in newsroom.received[3:]), ['planning'] * 3)
+            self.assertFalse(os.path.exists(checkpoint))
+
+    def test_export_resends_failed_items(self):
+        with self.app.app_context():
+            self.setUp_data()
+            checkpoint = self._get_checkpoint_path()
+
+            with LocalNewsroom(fail_once=['postponed']) as newsroom:
+                ExportToNewsroom().run(assets_url=newsroom.url, resource_url=newsroom.url, retries=0,
+                                       checkpoint=checkpoint)
+
+                # The failed Event is kept in the checkpoint
+                self.assertEqual(len(newsroom.received), 5)
+                self.assertNotIn(('event', 'postponed'), newsroom.received)
+                self.assertTrue(os.path.exists(checkpoint))
+                with open(checkpoint) as f:
+                    self.assertEqual(json.load(f)['events_failed'], ['postponed'])
+
+                # Only the failed Event is sent on the next run
+                ExportToNewsroom().run(assets_url=newsroom.url, resource_url=newsroom.url, retries=0,
+                                       checkpoint=checkpoint)
+
+            self.assertEqual(len(newsroom.received), 6)
+            self.assertEqual(newsroom.received[-1], ('event', 'postponed'))
+            self.assertEqual(newsroom.requests, 7)
+            self.assertFalse(os.path.exists(checkpoint))
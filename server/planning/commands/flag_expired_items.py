@@ -14,10 +14,11 @@ from superdesk.logging import logger
 from superdesk.utc import utcnow
 from superdesk.celery_task_utils import get_lock_id
 from superdesk.lock import lock, unlock, remove_locks
-from superdesk.notification import push_notification
+from planning.signals import push_notification
 from datetime import timedelta, datetime
 from eve.utils import config
 from bson.objectid import ObjectId
+from planning.common import bulk_system_update, get_planning_expiry_batch_size
 
 
 class FlagExpiredItems(Command):
@@ -71,7 +72,6 @@ class FlagExpiredItems(Command):
     def _flag_expired_events(self, expiry_datetime):
         logger.info('{} Starting to flag expired events'.format(self.log_msg))
         events_service = get_resource_service('events')
-        planning_service = get_resource_service('planning')
 
         locked_events = set()
         events_in_use = set()
@@ -86,18 +86,19 @@ class FlagExpiredItems(Command):
 
         self._set_event_plans(events)
 
+        events_to_expire = []
+        plans_to_expire = []
         for event_id, event in events.items():
             if event.get('lock_user'):
                 locked_events.add(event_id)
             elif self._get_event_schedule(event) > expiry_datetime:
                 events_in_use.add(event_id)
             else:
-                events_expired.add(event_id)
-                events_service.system_update(event_id, {'expired': True}, event)
-                for plan in event.get('_plans', []):
-                    plan_id = plan[config.ID_FIELD]
-                    planning_service.system_update(plan_id, {'expired': True}, plan)
-                    plans_expired.add(plan_id)
+                events_to_expire.append(event)
+                plans_to_expire.extend(event.get('_plans', []))
+
+        events_expired.update(self._bulk_flag_expired('events', events_to_expire))
+        plans_expired.update(self._bulk_flag_expired('planning', plans_to_expire))
 
         if len(locked_events) > 0:
             logger.info('{} Skipping {} locked Events: {}'.format(
@@ -140,12 +141,14 @@ class FlagExpiredItems(Command):
         locked_plans = set()
         plans_expired = set()
 
+        plans_to_expire = []
         for plan_id, plan in plans.items():
             if plan.get('lock_user'):
                 locked_plans.add(plan_id)
             else:
-                planning_service.system_update(plan[config.ID_FIELD], {'expired': True}, plan)
-                plans_expired.add(plan_id)
+                plans_to_expire.append(plan)
+
+        plans_expired.update(self._bulk_flag_expired('planning', plans_to_expire))
 
         if len(locked_plans) > 0:
             logger.info('{} Skipping {} locked Planning items: {}'.format(
@@ -162,6 +165,26 @@ class FlagExpiredItems(Command):
 
         logger.info('{} {} Planning items expired: {}'.format(self.log_msg, len(plans_expired), list(plans_expired)))
 
+    @staticmethod
+    def _bulk_flag_expired(resource, items):
+        """Flag the items as expired in batches of ``PLANNING_EXPIRY_BATCH_SIZE``
+
+        :param str resource: The name of the resource
+        :param list items: List of items to flag as expired
+        :return list: List of IDs of the items flagged as expired
+        """
+        batch_size = get_planning_expiry_batch_size()
+        expired_ids = []
+
+        for i in range(0, len(items), batch_size):
+            batch = [
+                {key: value for key, value in item.items() if key != '_plans'}
+                for item in items[i:i + batch_size]
+            ]
+            expired_ids.extend(bulk_system_update(resource, batch, {'expired': True}))
+
+        return expired_ids
+
     @staticmethod
     def _set_event_plans(events):
         planning_service = get_resource_service('planning')
@@ -8,7 +8,9 @@
 # AUTHORS and LICENSE files distributed with this source code, or
 # at https://www.sourcefabric.org/superdesk/license
 
+from unittest import mock
 from .flag_expired_items import FlagExpiredItems
+from planning.common import bulk_system_update
 from planning.tests import TestCase
 from superdesk import get_resource_service
 from superdesk.utc import utcnow
@@ -110,6 +112,40 @@ class FlagExpiredItemsTest(TestCase):
                 'e3': True
             })
 
+    @mock.patch('planning.commands.flag_expired_items.push_notification')
+    def test_event_bulk_batches(self, push_notification):
+        self.app.config.update({'PLANNING_EXPIRY_BATCH_SIZE': 2})
+
+        with self.app.app_context():
+            self.insert('events', [
+                {'guid': 'e1', **expired['event']},
+                {'guid': 'e2', **expired['event']},
+                {'guid': 'e3', **expired['event']},
+                {'guid': 'e4', **active['event']},
+            ])
+
+            with mock.patch('planning.commands.flag_expired_items.bulk_system_update',
+                            wraps=bulk_system_update) as bulk_update:
+                FlagExpiredItems().run()
+
+                # 3 expired Events in batches of 2
+                self.assertEqual(
+                    [len(call[0][1]) for call in bulk_update.call_args_list if call[0][0] == 'events'],
+                    [2, 1]
+                )
+
+            self.assertExpired('events', {
+                'e1': True,
+                'e2': True,
+                'e3': True,
+                'e4': False,
+            })
+
+            # A single aggregated notification is sent for all expired Events
+            notifications = [call for call in push_notification.call_args_list if call[0][0] == 'events:expired']
+            self.assertEqual(len(notifications), 1)
+            self.assertEqual(sorted(notifications[0][1]['items']), ['e1', 'e2', 'e3'])
+
     def test_planning(self):
         with self.app.app_context():
             self.insert('planning', [
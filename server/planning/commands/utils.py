@@ -0,0 +1,115 @@
+# -*- coding: utf-8; -*-
+#
+# This file is part of Superdesk.
+#
+# Copyright 2013, 2014, 2015, 2016, 2017, 2018 Sourcefabric z.u. and contributors.
+#
+# For the full copyright and license information, please see the
+# AUTHORS and LICENSE files distributed with this source code, or
+# at https://www.sourcefabric.org/superdesk/license
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from flask import current_app as app
+from superdesk.logging import logger
+from superdesk.utils import json_serialize_datetime_objectId
+
+
+class CommandCheckpoint:
+    """Persists the progress of a long running command to a JSON file
+
+    If the command is interrupted (i.e. killed after the lock expires), the next run
+    loads the checkpoint and continues from where the previous run left off.
+    If no ``path`` is provided, the checkpoint is kept in memory only.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.data = {}
+
+    def load(self):
+        self.data = {}
+        if not self.path or not os.path.exists(self.path):
+            return self.data
+
+        try:
+            with open(self.path, 'r') as f:
+                self.data = json.load(f)
+        except (OSError, ValueError):
+            logger.exception('Failed to load checkpoint file {}'.format(self.path))
+
+        return self.data
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def set(self, key, value):
+        self.data[key] = value
+        self.save()
+
+    def update(self, values):
+        self.data.update(values)
+        self.save()
+
+    def remove(self, key):
+        self.data.pop(key, None)
+        self.save()
+
+    def save(self):
+        if not self.path:
+            return
+
+        # Write to a temporary file first, so a killed process doesn't leave a corrupted checkpoint
+        tmp_path = '{}.tmp'.format(self.path)
+        with open(tmp_path, 'w') as f:
+            json.dump(self.data, f, default=json_serialize_datetime_objectId)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        self.data = {}
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def get_batches(items, batch_size):
+    """Split the list of ``items`` into lists of ``batch_size`` length"""
+    items = list(items)
+    return [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+
+
+def run_in_batches(callback, items, batch_size, workers=1, on_batch_complete=None):
+    """Run the ``callback`` for each batch of ``items``, optionally using a pool of worker threads
+
+    Each worker runs inside its own app context. ``on_batch_complete`` is always called from the
+    calling thread, so it is safe to use it to update a ``CommandCheckpoint``.
+
+    :param func callback: Function that receives a list of items to process
+    :param list items: The items to process
+    :param int batch_size: Number of items per batch
+    :param int workers: Number of worker threads, 1 processes the batches sequentially
+    :param func on_batch_complete: Function that receives the batch once it has been processed
+    """
+    batches = get_batches(items, batch_size)
+
+    if workers <= 1 or len(batches) <= 1:
+        for batch in batches:
+            callback(batch)
+            if on_batch_complete:
+                on_batch_complete(batch)
+        return
+
+    flask_app = app._get_current_object()
+
+    def _run(batch):
+        with flask_app.app_context():
+            callback(batch)
+        return batch
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_run, batch) for batch in batches]
+        for future in as_completed(futures):
+            batch = future.result()
+            if on_batch_complete:
+                on_batch_complete(batch)
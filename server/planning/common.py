@@ -12,7 +12,8 @@ import re
 import time
 from flask import current_app as app
 from collections import namedtuple
-from datetime import timedelta
+from copy import deepcopy
+from datetime import datetime, timedelta
 from superdesk.resource import not_analyzed, build_custom_hateoas
 from superdesk import get_resource_service, logger
 from superdesk.metadata.item import ITEM_TYPE, CONTENT_STATE
@@ -21,11 +22,14 @@ from superdesk.celery_app import celery
 from apps.archive.common import get_user, get_auth
 from apps.publish.enqueue import get_enqueue_service
 from .item_lock import LOCK_SESSION, LOCK_ACTION, LOCK_TIME, LOCK_USER
+from planning.reference_data import get_reference_item
 from eve.utils import config, ParsedRequest
 from werkzeug.datastructures import MultiDict
 from superdesk.etree import parse_html
 import json
 from bson import ObjectId
+from pymongo import UpdateOne
+from eve.methods.common import resolve_document_etag
 
 ITEM_STATE = 'state'
 ITEM_EXPIRY = 'expiry'
@@ -84,6 +88,11 @@ TEMP_ID_PREFIX = 'tempId-'
 TO_BE_CONFIRMED_FIELD = '_time_to_be_confirmed'
 TO_BE_CONFIRMED_FIELD_SCHEMA = {'type': 'boolean'}
 
+# Extra field used to collapse Planning items onto their Event in the combined view.
+# It stores the ``event_item`` of a linked Planning item, otherwise the item's own ``_id``
+COMBINED_ID_FIELD = '_combined_id'
+COMBINED_ID_FIELD_SCHEMA = {'type': 'string', 'mapping': not_analyzed}
+
 
 def set_item_expiry(doc):
     expiry_minutes = app.settings.get('PLANNING_EXPIRY_MINUTES', None)
@@ -99,6 +108,48 @@ def get_max_recurrent_events(current_app=None):
     return int(app.config.get('MAX_RECURRENT_EVENTS', 200))
 
 
+def get_planning_expiry_batch_size(current_app=None):
+    return int((current_app or app).config.get('PLANNING_EXPIRY_BATCH_SIZE', 500))
+
+
+def planning_combined_search_collapse(current_app=None):
+    return (current_app or app).config.get('PLANNING_COMBINED_SEARCH_COLLAPSE', False)
+
+
+def get_search_query_cache_size(current_app=None):
+    return int((current_app or app).config.get('PLANNING_SEARCH_QUERY_CACHE_SIZE', 500))
+
+
+def get_search_query_cache_ttl(current_app=None):
+    return int((current_app or app).config.get('PLANNING_SEARCH_QUERY_CACHE_TTL', 60))
+
+
+def get_search_results_cache_backend(current_app=None):
+    return (current_app or app).config.get('PLANNING_SEARCH_RESULTS_CACHE')
+
+
+def get_search_results_cache_size(current_app=None):
+    return int((current_app or app).config.get('PLANNING_SEARCH_RESULTS_CACHE_SIZE', 200))
+
+
+def get_search_results_cache_ttl(current_app=None):
+    return int((current_app or app).config.get('PLANNING_SEARCH_RESULTS_CACHE_TTL', 30))
+
+
+def get_search_results_cache_url(current_app=None):
+    current_app = current_app or app
+    return current_app.config.get('PLANNING_SEARCH_RESULTS_CACHE_URL') or current_app.config.get('REDIS_URL')
+
+
+def get_combined_id(item):
+    """Returns the ``_combined_id`` of an Event or Planning item"""
+    return item.get('event_item') or item.get(config.ID_FIELD)
+
+
+def set_combined_id(item):
+    item[COMBINED_ID_FIELD] = get_combined_id(item)
+
+
 def planning_auto_assign_to_workflow(current_app=None):
     if current_app is not None:
         return current_app.config.get('PLANNING_AUTO_ASSIGN_TO_WORKFLOW', False)
@@ -176,10 +227,7 @@ def remove_lock_information(item):
 
 
 def get_coverage_cancellation_state():
-    coverage_states = get_resource_service('vocabularies').find_one(
-        req=None,
-        _id='newscoveragestatus'
-    )
+    coverage_states = get_reference_item('vocabularies', 'newscoveragestatus')
 
     coverage_cancel_state = None
     if coverage_states:
@@ -297,7 +345,7 @@ def get_coverage_type_name(qcode):
     :param qcode:
     :return: the name
     """
-    coverage_types = get_resource_service('vocabularies').find_one(req=None, _id='g2_content_type')
+    coverage_types = get_reference_item('vocabularies', 'g2_content_type')
 
     coverage_type = {}
     if coverage_types:
@@ -347,6 +395,36 @@ def enqueue_planning_item(id):
         logger.error('Failed to retrieve planning item from planning versions with id: {}'.format(id))
 
 
+@celery.task(soft_time_limit=600)
+def enqueue_planning_items(ids):
+    """
+    Get the versions of the items to be published from the planning versions collection and enqueue them.
+
+    Used when posting a series of items, so that a single task is queued for the entire series.
+
+    :param list ids: List of the planning version ids
+    """
+    lookup_ids = list(ids) + [ObjectId(_id) for _id in ids if isinstance(_id, str) and ObjectId.is_valid(_id)]
+    planning_versions = {
+        str(planning_version[config.ID_FIELD]): planning_version
+        for planning_version in get_resource_service('published_planning').find(
+            where={config.ID_FIELD: {'$in': lookup_ids}}
+        )
+    }
+
+    enqueue_service = get_enqueue_service('publish')
+    for id in ids:
+        planning_version = planning_versions.get(str(id))
+        if not planning_version:
+            logger.error('Failed to retrieve planning item from planning versions with id: {}'.format(id))
+            continue
+
+        try:
+            enqueue_service.enqueue_item(planning_version.get('published_item'), 'event')
+        except Exception:
+            logger.exception('Failed to queue {} item {}'.format(planning_version.get('type'), id))
+
+
 def sanitize_query_text(text):
     """Sanitize the query text"""
     if text:
@@ -639,3 +717,130 @@ def is_content_link_to_coverage_allowed(archive_item):
 
     return True if not len(allowed_coverage_link_types) else \
         archive_item['type'] in allowed_coverage_link_types
+
+
+def _get_search_after_value(doc, field):
+    value = doc
+    for key in field.split('.'):
+        value = (value or {}).get(key)
+
+    if isinstance(value, datetime):
+        # Elastic stores dates as epoch milliseconds for sorting purposes
+        return int(value.timestamp() * 1000)
+
+    return value
+
+
+def get_search_after(doc, sort_field, tie_breaker=config.ID_FIELD):
+    """Returns the ``search_after`` sort values to continue a search from the provided doc"""
+    return [
+        _get_search_after_value(doc, sort_field),
+        _get_search_after_value(doc, tie_breaker),
+    ]
+
+
+def iter_search_after(fetch, query, sort_field, sort_order='asc', page_size=200, tie_breaker=config.ID_FIELD,
+                      search_after=None):
+    """Generator that pages through a search using ``search_after`` instead of ``from``/``size``
+
+    Results are sorted by ``sort_field`` and then by ``tie_breaker``, and each subsequent page
+    continues from the sort values of the last document of the previous page. This gives a constant
+    cost per page (no deep pagination, no extra count query), and items are neither skipped nor
+    duplicated if documents that were already returned stop matching the query (i.e. flagged as
+    ``expired`` by the callee) while iterating.
+
+    :param fetch: Callback that receives the query and returns a cursor of docs (i.e. ``service.search``)
+    :param dict query: The Elastic query to run, ``sort``, ``size`` and ``from`` will be overridden
+    :param str sort_field: The (dotted) field name to sort on
+    :param str sort_order: The order to sort by, ``asc`` or ``desc``
+    :param int page_size: The number of documents to retrieve per page
+    :param str tie_breaker: Unique field used to order documents with the same sort value
+    :param list search_after: Sort values to start from (i.e. from ``get_search_after`` of a previous run)
+    :return: Generator yielding a list of documents per page
+    """
+    query = deepcopy(query)
+    query.pop('from', None)
+    query['size'] = page_size
+    query['sort'] = [
+        {sort_field: {'order': sort_order}},
+        {tie_breaker: {'order': sort_order}},
+    ]
+    if search_after:
+        query['search_after'] = search_after
+
+    while True:
+        docs = list(fetch(query))
+
+        # If the last query doesn't contain any results, return here
+        if not len(docs):
+            break
+
+        # Store the sort values of the last document before yielding
+        # as the callee may modify the documents
+        query['search_after'] = get_search_after(docs[-1], sort_field, tie_breaker)
+
+        # Yield the results for iteration by the callee
+        yield docs
+
+        if len(docs) < page_size:
+            break
+
+
+def get_mongo_collection(resource):
+    """Returns the raw pymongo collection for the provided resource"""
+    source = app.config['DOMAIN'][resource]['datasource']['source']
+    return app.data.mongo.pymongo(resource=resource).db[source]
+
+
+def bulk_system_update(resource, items, updates):
+    """Apply the same ``updates`` to many items using bulk writes
+
+    Updates all ``items`` in Mongo with a single bulk write and then re-indexes them in Elastic
+    with a single bulk request. Unlike ``service.system_update``, no per item notification is sent,
+    it is up to the callee to send an aggregated notification.
+
+    :param str resource: The name of the resource
+    :param list items: List of original documents to update
+    :param dict updates: The updates to apply to every document
+    :return list: List of IDs of the updated documents
+    """
+    bulk_system_update_items(resource, [(item, deepcopy(updates)) for item in items])
+    return [item[config.ID_FIELD] for item in items]
+
+
+def bulk_system_update_items(resource, items):
+    """Apply individual updates to many items using bulk writes
+
+    Same as ``bulk_system_update``, except that each item has its own set of updates.
+    The ``_updated`` and ``_etag`` of each of the updates are populated with the new values.
+
+    :param str resource: The name of the resource
+    :param list items: List of (original, updates) tuples
+    :return list: List of the updated documents, as stored in Mongo
+    """
+    if not items:
+        return []
+
+    now = utcnow()
+    operations = []
+    item_ids = []
+    for item, item_updates in items:
+        item_updates[config.LAST_UPDATED] = now
+        updated = {key: value for key, value in item.items() if key != config.ETAG}
+        updated.update(item_updates)
+        resolve_document_etag(updated, resource)
+
+        if updated.get(config.ETAG):
+            item_updates[config.ETAG] = updated[config.ETAG]
+
+        operations.append(UpdateOne({config.ID_FIELD: item[config.ID_FIELD]}, {'$set': item_updates}))
+        item_ids.append(item[config.ID_FIELD])
+
+    collection = get_mongo_collection(resource)
+    collection.bulk_write(operations, ordered=False)
+
+    # Re-index the updated documents from Mongo in Elastic
+    docs = list(collection.find({config.ID_FIELD: {'$in': item_ids}}))
+    app.data._search_backend(resource).bulk_insert(resource, docs)
+
+    return docs
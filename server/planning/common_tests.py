@@ -1,5 +1,6 @@
 from planning.tests import TestCase
-from .common import set_actioned_date_to_event
+from .common import set_actioned_date_to_event, iter_search_after
+from copy import deepcopy
 from datetime import datetime, timedelta
 from superdesk.utc import utcnow
 
@@ -43,3 +44,35 @@ class CommonTestCase(TestCase):
         }
         set_actioned_date_to_event(updates, original)
         self.assertEqual(updates, {})
+
+    def test_iter_search_after(self):
+        start = datetime(2029, 1, 1)
+        docs = [
+            {'_id': 'item{}'.format(i), 'dates': {'start': start + timedelta(days=i // 2)}}
+            for i in range(5)
+        ]
+        queries = []
+
+        def fetch(query):
+            queries.append(deepcopy(query))
+            results = docs
+            if query.get('search_after'):
+                last_start, last_id = query['search_after']
+                results = [
+                    doc for doc in docs
+                    if (int(doc['dates']['start'].timestamp() * 1000), doc['_id']) > (last_start, last_id)
+                ]
+
+            return results[:query['size']]
+
+        pages = list(iter_search_after(fetch, {'query': {}, 'from': 10}, 'dates.start', page_size=2))
+
+        self.assertEqual(
+            [[doc['_id'] for doc in page] for page in pages],
+            [['item0', 'item1'], ['item2', 'item3'], ['item4']]
+        )
+        self.assertEqual(len(queries), 3)
+        self.assertNotIn('from', queries[0])
+        self.assertNotIn('search_after', queries[0])
+        self.assertEqual(queries[0]['sort'], [{'dates.start': {'order': 'asc'}}, {'_id': {'order': 'asc'}}])
+        self.assertEqual(queries[2]['search_after'], [int(docs[3]['dates']['start'].timestamp() * 1000), 'item3'])
@@ -0,0 +1,32 @@
+# -*- coding: utf-8; -*-
+# This file is part of Superdesk.
+# For the full copyright and license information, please see the
+# AUTHORS and LICENSE files distributed with this source code, or
+# at https://www.sourcefabric.org/superdesk/license
+#
+# Creation: 2021-04-01 10:00
+
+from superdesk.commands.data_updates import BaseDataUpdate
+from planning.common import COMBINED_ID_FIELD, get_combined_id, bulk_system_update_items
+
+BATCH_SIZE = 500
+
+
+class DataUpdate(BaseDataUpdate):
+
+    resource = 'events'
+
+    def forwards(self, mongodb_collection, mongodb_database):
+        # Populate the field used to collapse Planning items onto their Event in the combined view
+        batch = []
+        for item in mongodb_collection.find({COMBINED_ID_FIELD: None}):
+            batch.append((item, {COMBINED_ID_FIELD: get_combined_id(item)}))
+
+            if len(batch) >= BATCH_SIZE:
+                bulk_system_update_items(self.resource, batch)
+                batch = []
+
+        bulk_system_update_items(self.resource, batch)
+
+    def backwards(self, mongodb_collection, mongodb_database):
+        pass
@@ -128,6 +128,7 @@ def init_app(app):
     )
 
     app.on_updated_events += events_history_service.on_item_updated
+    app.on_updated_events_series += events_history_service.on_series_updated
     app.on_inserted_events += events_history_service.on_item_created
     app.on_deleted_item_events -= events_history_service.on_item_deleted
     app.on_deleted_item_events += events_history_service.on_item_deleted
@@ -16,6 +16,9 @@ import itertools
 import copy
 import pytz
 import re
+from bisect import bisect_right
+from datetime import datetime
+from functools import lru_cache
 from eve.methods.common import resolve_document_etag
 from eve.utils import config, date_to_str
 from flask import current_app as app
@@ -26,16 +29,17 @@ from superdesk import get_resource_service
 from superdesk.errors import SuperdeskApiError
 from superdesk.metadata.utils import generate_guid
 from superdesk.metadata.item import GUID_NEWSML
-from superdesk.notification import push_notification
+from planning.signals import push_notification
 from superdesk.utc import utcnow
 from apps.auth import get_user, get_user_id
 from apps.archive.common import get_auth, update_dates_for
 from superdesk.users.services import current_user_has_privilege
-from .events_base_service import EventsBaseService
+from .events_base_service import EventsBaseService, invalidate_recurring_timeline
 from planning.common import UPDATE_SINGLE, UPDATE_FUTURE, get_max_recurrent_events, \
     WORKFLOW_STATE, ITEM_STATE, remove_lock_information, format_address, update_post_item, \
     post_required, POST_STATE, get_event_max_multi_day_duration, set_original_creator, set_ingested_event_state, \
-    LOCK_ACTION, sanitize_input_data
+    LOCK_ACTION, sanitize_input_data, iter_search_after, bulk_system_update_items, set_combined_id, \
+    COMBINED_ID_FIELD
 from .events_schema import events_schema
 
 logger = logging.getLogger(__name__)
@@ -70,8 +74,9 @@ class EventsService(superdesk.Service):
         return res
 
     def on_fetched(self, docs):
+        planning_ids = self.get_planning_ids_for_events(docs['_items'])
         for doc in docs['_items']:
-            self._enhance_event_item(doc)
+            self._enhance_event_item(doc, planning_ids.get(doc.get(config.ID_FIELD)) or [])
 
     def on_fetched_item(self, doc):
         self._enhance_event_item(doc)
@@ -82,12 +87,46 @@ class EventsService(superdesk.Service):
             'event_item': event.get(config.ID_FIELD)
         })
 
-    def _enhance_event_item(self, doc):
-        plannings = self.get_plannings_for_event(doc)
+    @staticmethod
+    def get_planning_ids_for_events(events):
+        """Returns the Planning IDs linked to each of the provided Events
+
+        Uses a single aggregation over the ``planning.event_item`` index, returning only
+        the ``_id`` of each Planning item, grouped by the Event ID.
+
+        :param list events: List of Event documents
+        :return dict: Dictionary of Event ID to list of Planning IDs
+        """
+        event_ids = [event[config.ID_FIELD] for event in events or [] if event.get(config.ID_FIELD)]
+        if not event_ids:
+            return {}
+
+        pipeline = [
+            {'$match': {'event_item': {'$in': event_ids}}},
+            {'$project': {'event_item': 1}},
+            {'$group': {'_id': '$event_item', 'planning_ids': {'$push': '$_id'}}},
+        ]
 
-        if plannings.count() > 0:
-            doc['planning_ids'] = [planning.get('_id') for planning in plannings]
+        return {
+            group['_id']: group['planning_ids']
+            for group in app.data.mongo.pymongo(resource='planning').db['planning'].aggregate(pipeline)
+        }
+
+    def _enhance_event_item(self, doc, planning_ids=None):
+        if planning_ids is None:
+            planning_ids = self.get_planning_ids_for_events([doc]).get(doc.get(config.ID_FIELD)) or []
+
+        if len(planning_ids) > 0:
+            doc['planning_ids'] = planning_ids
+
+        self.format_event_fields(doc)
+
+    @staticmethod
+    def format_event_fields(doc):
+        """Enhance the fields of the Event that are stored in the item (i.e. the ``formatted_address``)
 
+        Only the fields present in the doc are changed, so this can be used with projected docs
+        """
         for location in (doc.get('location') or []):
             format_address(location)
 
@@ -110,6 +149,21 @@ class EventsService(superdesk.Service):
             # Get associated planning items
             return self.get_plannings_for_event(item)
 
+    @staticmethod
+    def get_relationship_lookups(item):
+        """Returns the lookups used to find the items related to this Event
+
+        Same items as ``get_all_items_in_relationship``, but returned as a list of
+        ``(resource, lookup)`` tuples, so the callee can query only the fields it requires.
+        """
+        if item.get('recurrence_id'):
+            return [
+                ('events', {'recurrence_id': item['recurrence_id']}),
+                ('planning', {'recurrence_id': item['recurrence_id']}),
+            ]
+
+        return [('planning', {'event_item': item.get(config.ID_FIELD)})]
+
     def on_locked_event(self, doc, user_id):
         self._enhance_event_item(doc)
 
@@ -126,6 +180,47 @@ class EventsService(superdesk.Service):
         )
         item['ingest_provider_sequence'] = str(sequence_number)
 
+    def create(self, docs, **kwargs):
+        """Saves the Events in Mongo, then indexes them in Elastic using a bulk request
+
+        This avoids sending an Elastic request per Event when creating a recurring series.
+        """
+        # ``on_create`` sets the ``_combined_id``, but recurring series and rescheduled Events
+        # are created without going through it
+        for doc in docs:
+            set_combined_id(doc)
+
+        ids = self.backend.create_in_mongo(self.datasource, docs, **kwargs)
+        app.data._search_backend(self.datasource).bulk_insert(self.datasource, docs)
+        invalidate_recurring_timeline(*docs)
+        return ids
+
+    def create_recurring_series(self, events, notify=True):
+        """Creates the Events of a recurring series in bulk
+
+        The Events are written to Mongo and Elastic using bulk requests, and the ``events_history``
+        entries for all Events are created in a single write. A single ``events:created:recurring``
+        notification is sent for the series.
+
+        :param list events: List of Events generated for the series
+        :param bool notify: If True, sends the ``events:created:recurring`` notification
+        :return list: List of IDs of the created Events
+        """
+        if not events:
+            return []
+
+        ids = self.create(events)
+        app.on_inserted_events(events)
+
+        if notify:
+            push_notification(
+                'events:created:recurring',
+                item=str(events[0]['recurrence_id']),
+                user=str(events[0].get('original_creator', ''))
+            )
+
+        return ids
+
     def on_create(self, docs):
         # events generated by recurring rules
         generated_events = []
@@ -188,6 +283,9 @@ class EventsService(superdesk.Service):
         if generated_events:
             docs.extend(generated_events)
 
+        for event in docs:
+            set_combined_id(event)
+
     def validate_event(self, updates, original=None):
         """Validate the event
 
@@ -336,6 +434,7 @@ class EventsService(superdesk.Service):
     def update(self, id, updates, original):
         updates.setdefault('versioncreated', utcnow())
         item = self.backend.update(self.datasource, id, updates, original)
+        invalidate_recurring_timeline(updates, original)
         return item
 
     def on_update(self, updates, original):
@@ -408,6 +507,7 @@ class EventsService(superdesk.Service):
         self._enhance_event_item(updates)
 
     def on_deleted(self, doc):
+        invalidate_recurring_timeline(doc)
         push_notification(
             'events:delete',
             item=str(doc.get(config.ID_FIELD)),
@@ -467,7 +567,7 @@ class EventsService(superdesk.Service):
         updates.pop('dates', None)
 
         if update_method == UPDATE_FUTURE:
-            historic, past, future = self.get_recurring_timeline(original)
+            historic, past, future = self.get_recurring_timeline(original, historic_docs=False)
             events = future
         else:
             historic, past, future = self.get_recurring_timeline(original)
@@ -476,11 +576,14 @@ class EventsService(superdesk.Service):
         events_post_service = get_resource_service('events_post')
 
         # First we want to validate that all events can be posted
+        merged_events = []
         for e in events:
             if post_required(updates, e):
-                merged = deepcopy(e)
+                # ``validate_items`` validates copies of the items
+                merged = dict(e)
                 merged.update(updates)
-                events_post_service.validate_item(merged)
+                merged_events.append(merged)
+        events_post_service.validate_items(merged_events)
 
         # If this update is from assignToCalendar action
         # Then we only want to update the calendars of each Event
@@ -498,24 +601,21 @@ class EventsService(superdesk.Service):
 
         mark_completed = original.get('lock_action') == 'mark_completed' and updates.get('actioned_date')
         mark_complete_validated = False
+        series_updates = []
         for e in events:
-            event_id = e[config.ID_FIELD]
-
-            new_updates = deepcopy(updates)
-            new_updates['skip_on_update'] = True
-            new_updates[config.ID_FIELD] = event_id
+            event_updates = updates
 
             if only_calendars:
-                # Get the original for this item, and add new calendars to it
+                # Add the new calendars to this Event
                 # Skipping calendars already assigned to this item
-                original_event = self.find_one(req=None, _id=event_id)
                 original_qcodes = [
                     calendar['qcode']
-                    for calendar in original_event.get('calendars') or []
+                    for calendar in e.get('calendars') or []
                 ]
 
-                new_updates['calendars'] = deepcopy(original_event.get('calendars') or [])
-                new_updates['calendars'].extend([
+                event_updates = dict(updates)
+                event_updates['calendars'] = deepcopy(e.get('calendars') or [])
+                event_updates['calendars'].extend([
                     calendar
                     for calendar in updated_calendars
                     if calendar['qcode'] not in original_qcodes
@@ -525,8 +625,11 @@ class EventsService(superdesk.Service):
                 # It is validated if the previous funciton did not raise an error
                 mark_complete_validated = True
 
-            self.patch(event_id, new_updates)
-            app.on_updated_events(new_updates, {'_id': event_id})
+            diff = self._get_series_event_updates(e, event_updates)
+            if diff:
+                series_updates.append((e, diff))
+
+        self.update_recurring_series(series_updates)
 
         # And finally push a notification to connected clients
         push_notification(
@@ -536,6 +639,57 @@ class EventsService(superdesk.Service):
             user=str(updates.get('version_creator', ''))
         )
 
+    @staticmethod
+    def _get_series_event_updates(event, updates):
+        """Returns the fields from ``updates`` that are different to the ones stored in the ``event``"""
+        ignored_fields = {config.ID_FIELD, 'version_creator', 'skip_on_update'}
+        diff = {
+            key: value
+            for key, value in updates.items()
+            if key not in ignored_fields and event.get(key) != value
+        }
+
+        if diff:
+            if updates.get('version_creator'):
+                diff['version_creator'] = updates['version_creator']
+            diff['versioncreated'] = utcnow()
+
+        return diff
+
+    def update_recurring_series(self, items):
+        """Applies the updates to Events in a series using bulk writes
+
+        The Events are updated with a single Mongo bulk write and Elastic bulk request,
+        then the ``on_updated_events_series`` hooks are called once for the entire series.
+
+        :param list items: List of (original, updates) tuples
+        :return list: List of the updated Events
+        """
+        if not items:
+            return []
+
+        docs = bulk_system_update_items(self.datasource, items)
+        invalidate_recurring_timeline(*(original for original, updates in items))
+
+        removed_files = set()
+        for original, updates in items:
+            update_post_item(updates, original)
+
+            if 'files' in updates:
+                removed_files.update(
+                    file for file in original.get('files') or []
+                    if file not in (updates['files'] or [])
+                )
+
+        self._delete_unused_files(removed_files)
+
+        app.on_updated_events_series(
+            [updates for original, updates in items],
+            [original for original, updates in items]
+        )
+
+        return docs
+
     def mark_event_complete(self, original, updates, event, mark_complete_validated):
         # If the entire series is in future, raise an error
         if event.get('recurrence_id'):
@@ -592,13 +746,14 @@ class EventsService(superdesk.Service):
             remove_lock_information(item=updates)
 
         # Create the new events and generate their history
-        self.create(generated_events)
-        app.on_inserted_events(generated_events)
+        # The 'events:updated:recurring' notification is sent once the original Event is updated
+        self.create_recurring_series(generated_events, notify=False)
         return generated_events
 
-    def get_recurring_timeline(self, selected, spiked=False):
+    def get_recurring_timeline(self, selected, spiked=False, historic_docs=True):
         events_base_service = EventsBaseService('events', backend=superdesk.get_backend())
-        return events_base_service.get_recurring_timeline(selected, postponed=True, spiked=spiked)
+        return events_base_service.get_recurring_timeline(selected, postponed=True, spiked=spiked,
+                                                          historic_docs=historic_docs)
 
     @staticmethod
     def _link_to_planning(event):
@@ -614,6 +769,7 @@ class EventsService(superdesk.Service):
         planning_item = planning_service.find_one(req=None, _id=plan_id)
 
         updates = {'event_item': event_id}
+        set_combined_id(updates)
 
         if 'recurrence_id' in event:
             updates['recurrence_id'] = event['recurrence_id']
@@ -635,41 +791,18 @@ class EventsService(superdesk.Service):
         query = {
             'query': {'bool': {'must_not': [{'term': {'expired': True}}]}},
             'filter': {'range': {'dates.end': {'lte': date_to_str(expiry_datetime)}}},
-            'sort': [{'dates.start': 'asc'}],
-            'size': get_max_recurrent_events()
         }
 
         if spiked_events_only:
             query['query'] = {'bool': {'must': [{'term': {'state': WORKFLOW_STATE.SPIKED}}]}}
 
-        total_received = 0
-        total_events = -1
-
-        while True:
-            query["from"] = total_received
-
-            results = self.search(query)
-
-            # If the total_events has not been set, then this is the first query
-            # In which case we need to store the total hits from the search
-            if total_events < 0:
-                total_events = results.count()
-
-                # If the search doesn't contain any results, return here
-                if total_events < 1:
-                    break
-
-            # If the last query doesn't contain any results, return here
-            if not len(results.docs):
-                break
-
-            total_received += len(results.docs)
-
-            # Yield the results for iteration by the callee
-            yield list(results.docs)
+        return iter_search_after(self.search, query, 'dates.start', page_size=get_max_recurrent_events())
 
     def delete_event_files(self, updates, original):
         files = [f for f in original.get('files', []) if f not in (updates or {}).get('files', [])]
+        self._delete_unused_files(files)
+
+    def _delete_unused_files(self, files):
         files_service = get_resource_service('events_files')
         for file in files:
             events_using_file = self.find(where={'files': file})
@@ -693,6 +826,7 @@ class EventsResource(superdesk.Resource):
         'default_sort': [('dates.start', 1)],
     }
     item_methods = ['GET', 'PATCH']
+    etag_ignore_fields = [COMBINED_ID_FIELD]
     mongo_indexes = {
         'recurrence_id_1': ([('recurrence_id', 1)], {'background': True}),
         'state': ([('state', 1)], {'background': True}),
@@ -770,15 +904,67 @@ def generate_recurring_dates(start, frequency, interval=1, endRepeatMode='count'
     )
     # if a timezone has been applied, returns UTC
     if tz:
-        if date_only:
-            return (tz.localize(dt).astimezone(pytz.UTC).replace(tzinfo=None).date() for dt in dates)
-        else:
-            return (tz.localize(dt).astimezone(pytz.UTC).replace(tzinfo=None) for dt in dates)
+        dates = local_dates_to_utc(dates, tz)
+
+    if date_only:
+        return (date.date() for date in dates)
     else:
-        if date_only:
-            return (date.date() for date in dates)
+        return (date for date in dates)
+
+
+@lru_cache(maxsize=None)
+def _get_utc_offset_ranges(tz):
+    """Returns the local time ranges where the UTC offset of the timezone is constant
+
+    The ranges exclude the local times around a transition that are either ambiguous or
+    non-existent (i.e. DST changes), these have to be localized individually.
+
+    :param tz: pytz timezone
+    :return tuple: sorted list of local range starts, list of local range ends and list of UTC offsets
+    """
+    transitions = getattr(tz, '_utc_transition_times', None) or []
+    offsets = [info[0] for info in getattr(tz, '_transition_info', None) or []]
+
+    if not transitions or len(transitions) != len(offsets):
+        # A static timezone, the offset is the same for all dates
+        offset = tz.localize(datetime(2000, 1, 1)).utcoffset()
+        return [datetime.min], [datetime.max], [offset]
+
+    starts = [datetime.min]
+    ends = []
+    for i in range(1, len(transitions)):
+        previous_offset = offsets[i - 1]
+        next_offset = offsets[i]
+        ends.append(transitions[i] + min(previous_offset, next_offset))
+        starts.append(transitions[i] + max(previous_offset, next_offset))
+    ends.append(datetime.max)
+
+    return starts, ends, offsets
+
+
+def local_dates_to_utc(dates, tz):
+    """Converts naive local datetimes to naive UTC datetimes
+
+    Instead of localizing each date through pytz, the UTC offset is resolved once per
+    timezone transition, and applied to all dates that fall between two transitions.
+    Dates that are ambiguous or don't exist (during a DST change) fall back to ``tz.localize``.
+
+    :param dates: iterable of naive datetimes in the local time of ``tz``, in ascending order
+    :param tz: pytz timezone
+    :return: generator of naive UTC datetimes
+    """
+    starts, ends, offsets = _get_utc_offset_ranges(tz)
+    index = 0
+
+    for date in dates:
+        if date < starts[index]:
+            index = 0
+        index = bisect_right(starts, date, lo=index) - 1
+
+        if date < ends[index]:
+            yield date - offsets[index]
         else:
-            return (date for date in dates)
+            yield tz.localize(date).astimezone(pytz.UTC).replace(tzinfo=None)
 
 
 def setRecurringMode(event):
@@ -795,12 +981,28 @@ def overwrite_event_expiry_date(event):
 
 
 def generate_recurring_events(event):
+    """Generates the Events of a recurring series
+
+    The Events are materialised from a single template, which is deep-copied once from the original Event.
+    Each generated Event gets its own copy of ``dates`` (including the ``recurring_rule``) and its own identifiers,
+    all other sub-documents (i.e. ``location`` or ``calendars``) are shared between the generated Events
+    and must be treated as read-only, or copied before being changed.
+    """
     generated_events = []
     setRecurringMode(event)
 
     # Get the recurrence_id, or generate one if it doesn't exist
     recurrence_id = event.get('recurrence_id', generate_guid(type=GUID_NEWSML))
 
+    # Remove fields not required by the new events
+    template = copy.deepcopy({
+        key: value
+        for key, value in event.items()
+        if not key.startswith('_') and not key.startswith('lock_') and key not in ['pubstatus', 'reschedule_from']
+    })
+    template['recurrence_id'] = recurrence_id
+    template_dates = template.pop('dates')
+
     # compute the difference between start and end in the original event
     time_delta = event['dates']['end'] - event['dates']['start']
     # for all the dates based on the recurring rules:
@@ -809,25 +1011,14 @@ def generate_recurring_events(event):
             tz=event['dates'].get('tz') and pytz.timezone(event['dates']['tz'] or None),
             **event['dates']['recurring_rule']
     ), 0, get_max_recurrent_events()):  # set a limit to prevent too many events to be created
-        # create event with the new dates
-        new_event = copy.deepcopy(event)
-
-        # Remove fields not required by the new events
-        for key in list(new_event.keys()):
-            if key.startswith('_'):
-                new_event.pop(key)
-            elif key.startswith('lock_'):
-                new_event.pop(key)
-        new_event.pop('pubstatus', None)
-        new_event.pop('reschedule_from', None)
-
+        # create event with the new dates, the dates are the only sub-document changed per occurrence
+        new_event = template.copy()
+        new_event['dates'] = copy.deepcopy(template_dates)
         new_event['dates']['start'] = date
         new_event['dates']['end'] = date + time_delta
         # set a unique guid
         new_event['guid'] = generate_guid(type=GUID_NEWSML)
         new_event['_id'] = new_event['guid']
-        # set the recurrence id
-        new_event['recurrence_id'] = recurrence_id
 
         # set expiry date
         overwrite_event_expiry_date(new_event)
@@ -8,23 +8,122 @@
 # AUTHORS and LICENSE files distributed with this source code, or
 # at https://www.sourcefabric.org/superdesk/license
 import json
+from bisect import bisect_left, bisect_right
 from datetime import datetime
-from flask import request
+from flask import request, g
 from eve.utils import config, ParsedRequest
 
 from superdesk.errors import SuperdeskApiError
 from superdesk.services import BaseService
 from superdesk import get_resource_service
-from superdesk.notification import push_notification
+from planning.signals import push_notification
 from superdesk.utc import utcnow
 from apps.auth import get_user_id
 from apps.archive.common import get_auth
 
-from planning.common import UPDATE_SINGLE, WORKFLOW_STATE, get_max_recurrent_events, update_post_item, \
-    set_ingested_event_state, is_valid_event_planning_reason
+from planning.common import UPDATE_SINGLE, WORKFLOW_STATE, update_post_item, set_ingested_event_state, \
+    is_valid_event_planning_reason, get_mongo_collection
 from planning.item_lock import LOCK_USER, LOCK_SESSION, LOCK_ACTION
 
 
+class RecurringTimeline:
+    """Index of the Events in a recurring series
+
+    Stores the ``_id``, ``state`` and dates of each Event in the series, sorted by the start date.
+    This allows the series to be split around a selected Event without loading the full documents.
+    """
+
+    def __init__(self, events):
+        self.ids = []
+        self.starts = []
+        self.ends = []
+        self.states = []
+
+        for event in events:
+            self.ids.append(event[config.ID_FIELD])
+            self.starts.append(event['dates']['start'])
+            self.ends.append(event['dates']['end'])
+            self.states.append(event.get('state'))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def split(self, selected_id, selected_start, excluded_states, now):
+        """Splits the series into historic, past and future Events
+
+        Historic: event.dates.end < now
+        Past: event.dates.start < selected_start
+        Future: event.dates.start > selected_start
+
+        :return tuple: The historic, past and future lists of indexes into the timeline
+        """
+        historic = []
+        past = []
+        future = []
+
+        # Only Events that have started can be historic
+        started = bisect_left(self.starts, now)
+        past_end = bisect_left(self.starts, selected_start)
+        future_start = bisect_right(self.starts, selected_start)
+
+        def _include(index):
+            return self.ids[index] != selected_id and self.states[index] not in excluded_states
+
+        for index in filter(_include, range(started)):
+            if self.ends[index] < now:
+                historic.append(index)
+            elif index < past_end:
+                past.append(index)
+            elif index >= future_start:
+                future.append(index)
+
+        past.extend(filter(_include, range(started, past_end)))
+        future.extend(filter(_include, range(max(started, future_start), len(self.ids))))
+
+        return historic, past, future
+
+    def get_summary(self, index):
+        """Returns the Event at ``index`` with the fields stored in the timeline"""
+        return {
+            config.ID_FIELD: self.ids[index],
+            'state': self.states[index],
+            'dates': {
+                'start': self.starts[index],
+                'end': self.ends[index]
+            }
+        }
+
+
+def get_recurring_timeline_index(recurrence_id):
+    """Returns the ``RecurringTimeline`` for the series
+
+    The timeline is cached for the duration of the request, and is invalidated when
+    an Event in the series is written (see ``invalidate_recurring_timeline``)
+    """
+    timelines = g.get('recurring_timelines')
+    if timelines is None:
+        timelines = g.recurring_timelines = {}
+
+    if recurrence_id not in timelines:
+        events = get_mongo_collection('events').find(
+            {'recurrence_id': recurrence_id},
+            {'state': 1, 'dates.start': 1, 'dates.end': 1}
+        ).sort('dates.start', 1)
+        timelines[recurrence_id] = RecurringTimeline(events)
+
+    return timelines[recurrence_id]
+
+
+def invalidate_recurring_timeline(*events):
+    """Removes the cached ``RecurringTimeline`` for the series of the provided Events"""
+    timelines = g.get('recurring_timelines')
+    if not timelines:
+        return
+
+    for event in events:
+        timelines.pop((event or {}).get('recurrence_id'), None)
+
+
 class EventsBaseService(BaseService):
     """
     Base class for Event action endpoints
@@ -91,7 +190,9 @@ class EventsBaseService(BaseService):
 
         updates.pop('update_method', None)
         updates.pop('skip_on_update', None)
-        return self.backend.update(self.datasource, id, updates, original)
+        item = self.backend.update(self.datasource, id, updates, original)
+        invalidate_recurring_timeline(updates, original)
+        return item
 
     def on_updated(self, updates, original):
         # Because we require the original item being actioned against to be locked
@@ -209,13 +310,17 @@ class EventsBaseService(BaseService):
             for doc in docs:
                 yield doc
 
-    def get_recurring_timeline(self, selected, spiked=False, rescheduled=False, cancelled=False, postponed=False):
+    def get_recurring_timeline(self, selected, spiked=False, rescheduled=False, cancelled=False, postponed=False,
+                               historic_docs=True):
         """Utility method to get all events in the series
 
         This splits up the series of events into 3 separate arrays.
         Historic: event.dates.start < utcnow()
         Past: utcnow() < event.dates.start < selected.dates.start
         Future: event.dates.start > selected.dates.start
+
+        The series is split using the cached ``RecurringTimeline``, then only the required Events are loaded.
+        If ``historic_docs`` is False, the historic Events only contain the ``_id``, ``state`` and ``dates``.
         """
         excluded_states = []
 
@@ -228,43 +333,41 @@ class EventsBaseService(BaseService):
         if not postponed:
             excluded_states.append(WORKFLOW_STATE.POSTPONED)
 
-        query = {
-            '$and': [
-                {'recurrence_id': selected['recurrence_id']},
-                {'_id': {'$ne': selected[config.ID_FIELD]}}
-            ]
-        }
-
-        if excluded_states:
-            query['$and'].append({'state': {'$nin': excluded_states}})
-
-        sort = '[("dates.start", 1)]'
-        max_results = get_max_recurrent_events()
         selected_start = selected.get('dates', {}).get('start', utcnow())
 
         # Make sure we are working with a datetime instance
         if not isinstance(selected_start, datetime):
             selected_start = datetime.strptime(selected_start, '%Y-%m-%dT%H:%M:%S%z')
 
-        historic = []
-        past = []
-        future = []
+        timeline = get_recurring_timeline_index(selected['recurrence_id'])
+        historic, past, future = timeline.split(
+            selected[config.ID_FIELD],
+            selected_start,
+            excluded_states,
+            utcnow()
+        )
 
-        for event in self.get_series(query, sort, max_results):
-            event['dates']['end'] = event['dates']['end']
-            event['dates']['start'] = event['dates']['start']
-            for sched in event.get('_planning_schedule', []):
-                sched['scheduled'] = sched['scheduled']
-            end = event['dates']['end']
-            start = event['dates']['start']
-            if end < utcnow():
-                historic.append(event)
-            elif start < selected_start:
-                past.append(event)
-            elif start > selected_start:
-                future.append(event)
+        # Load the full documents, in a single query, for the Events that are needed
+        event_ids = [timeline.ids[index] for index in (historic if historic_docs else []) + past + future]
+        events = {event[config.ID_FIELD]: event for event in self._get_events_by_ids(event_ids)}
 
-        return historic, past, future
+        def _get_events(indexes):
+            return [events[timeline.ids[index]] for index in indexes if timeline.ids[index] in events]
+
+        if historic_docs:
+            historic = _get_events(historic)
+        else:
+            historic = [timeline.get_summary(index) for index in historic]
+
+        return historic, _get_events(past), _get_events(future)
+
+    def _get_events_by_ids(self, event_ids):
+        if not event_ids:
+            return []
+
+        req = ParsedRequest()
+        req.max_results = len(event_ids)
+        return self.get_from_mongo(req=req, lookup={config.ID_FIELD: {'$in': event_ids}})
 
     @staticmethod
     def get_plannings_for_event(event):
@@ -9,7 +9,8 @@
 # at https://www.sourcefabric.org/superdesk/license
 
 from superdesk import get_resource_service
-from superdesk.notification import push_notification
+from planning.signals import push_notification
+from planning.reference_data import get_reference_item
 from eve.utils import config
 from apps.archive.common import get_user, get_auth
 from planning.common import UPDATE_FUTURE, WORKFLOW_STATE, remove_lock_information, set_actioned_date_to_event
@@ -44,10 +45,7 @@ class EventsCancelService(EventsBaseService):
 
     @staticmethod
     def _get_cancel_state():
-        eocstat_map = get_resource_service('vocabularies').find_one(
-            req=None,
-            _id='eventoccurstatus'
-        )
+        eocstat_map = get_reference_item('vocabularies', 'eventoccurstatus')
 
         occur_cancel_state = [x for x in eocstat_map.get('items', []) if
                               x['qcode'] == 'eocstat:eos6'][0]
@@ -120,7 +118,7 @@ class EventsCancelService(EventsBaseService):
 
     def update_recurring_events(self, updates, original, update_method):
         occur_cancel_state = self._get_cancel_state()
-        historic, past, future = self.get_recurring_timeline(original, postponed=True)
+        historic, past, future = self.get_recurring_timeline(original, postponed=True, historic_docs=False)
 
         # Determine if the selected event is the first one, if so then
         # act as if we're changing future events
@@ -15,6 +15,7 @@ from superdesk.services import BaseService
 from superdesk.metadata.utils import item_url
 from flask import request, current_app as app
 from planning.common import ITEM_STATE, WORKFLOW_STATE
+from planning.reference_data import get_reference_item
 from eve.utils import config
 
 
@@ -71,7 +72,7 @@ class EventsDuplicateService(BaseService):
         new_doc.get('dates').pop('recurring_rule', None)
         new_doc[ITEM_STATE] = WORKFLOW_STATE.DRAFT
         new_doc['duplicate_from'] = original[config.ID_FIELD]
-        eocstat_map = get_resource_service('vocabularies').find_one(req=None, _id='eventoccurstatus')
+        eocstat_map = get_reference_item('vocabularies', 'eventoccurstatus')
         if eocstat_map:
             new_doc['occur_status'] = [x for x in eocstat_map.get('items', []) if
                                        x['qcode'] == 'eocstat:eos5' and x.get('is_active', True)][0]
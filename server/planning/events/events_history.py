@@ -13,6 +13,7 @@ from planning.history import HistoryService
 import logging
 from eve.utils import config
 from copy import deepcopy
+from bson import ObjectId
 from planning.item_lock import LOCK_ACTION
 
 logger = logging.getLogger(__name__)
@@ -32,18 +33,34 @@ class EventsHistoryResource(Resource):
 
 class EventsHistoryService(HistoryService):
     def on_item_created(self, items, operation=None):
-        created_from_planning = []
-        regular_events = []
+        """Saves the history for the created Events using a single write
+
+        The Planning items linked to the Events are retrieved with a single query.
+        If ``operation`` is not provided, it is ``created_from_planning`` for Events linked to a Planning item,
+        otherwise ``create``
+        """
+        planning_ids = get_resource_service('events').get_planning_ids_for_events(items)
+        histories = []
+
         for item in items:
-            planning_items = get_resource_service('events').get_plannings_for_event(item)
-            if planning_items.count() > 0:
-                item['created_from_planning'] = planning_items[0].get('_id')
-                created_from_planning.append(item)
-            else:
-                regular_events.append((item))
+            if item.get('duplicate_from'):
+                continue
+
+            item_operation = operation or 'create'
+            item_planning_ids = planning_ids.get(item.get(config.ID_FIELD))
+            if item_planning_ids:
+                item['created_from_planning'] = item_planning_ids[0]
+                item_operation = operation or 'created_from_planning'
 
-        super().on_item_created(created_from_planning, 'created_from_planning')
-        super().on_item_created(regular_events)
+            event_id = item[config.ID_FIELD]
+            histories.append(self._get_history(
+                {config.ID_FIELD: ObjectId(event_id) if ObjectId.is_valid(event_id) else str(event_id)},
+                deepcopy(item),
+                item_operation
+            ))
+
+        if histories:
+            self.post(histories)
 
     def on_item_deleted(self, doc):
         lookup = {'event_id': doc[config.ID_FIELD]}
@@ -63,7 +80,30 @@ class EventsHistoryService(HistoryService):
 
         self._save_history(item, diff, operation)
 
+    def on_series_updated(self, updates, originals, operation='edited'):
+        """Saves the history for the Events updated as part of a recurring series using a single write"""
+        histories = [
+            self._get_history(original, self._remove_unwanted_fields(event_updates), operation)
+            for event_updates, original in zip(updates, originals)
+        ]
+
+        if histories:
+            self.post(histories)
+
+    def on_series_posted(self, updates, events):
+        """Saves the post history for the Events posted as part of a recurring series using a single write"""
+        histories = [
+            self._get_history(event, event_updates, 'post')
+            for event_updates, event in zip(updates, events)
+        ]
+
+        if histories:
+            self.post(histories)
+
     def _save_history(self, event, update, operation):
+        self.post([self._get_history(event, update, operation)])
+
+    def _get_history(self, event, update, operation):
         history = {
             'event_id': event[config.ID_FIELD],
             'user_id': self.get_user_id(),
@@ -78,7 +118,8 @@ class EventsHistoryService(HistoryService):
                 history['operation'] = 'unpost'
         elif operation == 'create' and 'ingested' == update.get('state', ''):
             history['operation'] = 'ingested'
-        self.post([history])
+
+        return history
 
     def on_update_repetitions(self, updates, event_id, operation):
         self.on_item_updated(updates, {'_id': event_id}, operation or 'update_repetitions')
@@ -4,12 +4,14 @@ from eve.utils import config
 
 from superdesk import get_resource_service, logger
 from superdesk.resource import Resource, not_analyzed
-from superdesk.notification import push_notification
+from superdesk.utc import utcnow
+from planning.signals import push_notification
 
 from .events import EventsResource
-from .events_base_service import EventsBaseService
+from .events_base_service import EventsBaseService, invalidate_recurring_timeline
 from planning.common import WORKFLOW_STATE, POST_STATE, post_state, UPDATE_SINGLE,\
-    UPDATE_METHODS, UPDATE_FUTURE, get_item_post_state, enqueue_planning_item, get_version_item_for_post
+    UPDATE_METHODS, UPDATE_FUTURE, get_item_post_state, enqueue_planning_item, get_version_item_for_post, \
+    enqueue_planning_items, bulk_system_update_items
 
 
 class EventsPostResource(EventsResource):
@@ -67,16 +69,19 @@ class EventsPostService(EventsBaseService):
 
     @staticmethod
     def validate_item(doc):
-        errors = get_resource_service('planning_validator').post([{
-            'validate_on_post': True,
-            'type': 'event',
-            'validate': doc
-        }])[0]
+        EventsPostService.validate_items([doc])
+
+    @staticmethod
+    def validate_items(docs):
+        """Validate a series of Events for posting, resolving the planning type once for the whole series"""
+        if not docs:
+            return
 
-        if errors:
-            # We use abort here instead of raising SuperdeskApiError.badRequestError
-            # as eve handles error responses differently between POST and PATCH methods
-            abort(400, description=errors)
+        for errors in get_resource_service('planning_validator').validate_items('event', docs, validate_on_post=True):
+            if errors:
+                # We use abort here instead of raising SuperdeskApiError.badRequestError
+                # as eve handles error responses differently between POST and PATCH methods
+                abort(400, description=errors)
 
     def _post_single_event(self, doc, event):
         self.validate_post_state(doc['pubstatus'])
@@ -111,21 +116,17 @@ class EventsPostService(EventsBaseService):
             posted_events = historic + past + [original] + future
 
         # First we want to validate that all events can be posted
-        for event in posted_events:
-            self.validate_post_state(post_to_state)
-            self.validate_item(event)
-
-        # Next we perform the actual post
-        updated_event = None
-        ids = []
-        items = []
-        for event in posted_events:
-            updated_event = self.post_event(event, post_to_state, doc.get('repost_on_update'))
-            ids.append(event[config.ID_FIELD])
-            items.append({
-                'id': event[config.ID_FIELD],
-                'etag': updated_event['_etag']
-            })
+        self.validate_post_state(post_to_state)
+        self.validate_items(posted_events)
+
+        # Next we perform the actual post, for the entire series at once
+        updated_events = self.post_events(posted_events, post_to_state, doc.get('repost_on_update'))
+        updated_event = updated_events[-1]
+        ids = [event[config.ID_FIELD] for event in posted_events]
+        items = [{
+            'id': event[config.ID_FIELD],
+            'etag': event_updates['_etag']
+        } for event, event_updates in zip(posted_events, updated_events)]
 
         # Do not send push-notification if reposting as each event's post state is different
         # The original action's notifications should refetch items
@@ -144,8 +145,9 @@ class EventsPostService(EventsBaseService):
 
         return ids
 
-    def post_event(self, event, new_post_state, repost):
-        # update the event with new state
+    @staticmethod
+    def _get_post_updates(event, new_post_state, repost):
+        """Returns the updates to post the event, and sets the new ``pubstatus`` on the event"""
         if repost:
             # same pubstatus or scheduled (for draft events)
             new_post_state = event.get('pubstatus', POST_STATE.USABLE)
@@ -159,6 +161,13 @@ class EventsPostService(EventsBaseService):
             if not event.get('completed'):
                 updates['actioned_date'] = None
 
+        return updates
+
+    def post_event(self, event, new_post_state, repost):
+        # update the event with new state
+        updates = self._get_post_updates(event, new_post_state, repost)
+        new_post_state = updates['pubstatus']
+
         updated_event = get_resource_service('events').update(event['_id'], updates, event)
         event.update(updated_event)
 
@@ -179,6 +188,86 @@ class EventsPostService(EventsBaseService):
 
         return updated_event
 
+    def post_events(self, events, new_post_state, repost):
+        """Post a series of Events
+
+        Same as ``post_event``, except that the Events are updated using a single bulk write,
+        their history and versions are saved with a single insert each, and
+        a single celery task is queued to enqueue all the versions for publishing.
+
+        :param list events: List of Events to post
+        :param str new_post_state: The new post state
+        :param bool repost: If True, keep the current post state of each Event
+        :return list: List of the updates applied to each Event
+        """
+        if not events:
+            return []
+
+        now = utcnow()
+        items = []
+        for event in events:
+            updates = self._get_post_updates(event, new_post_state, repost)
+            updates['versioncreated'] = now
+            items.append((event, updates))
+
+        bulk_system_update_items('events', items)
+        invalidate_recurring_timeline(*events)
+
+        event_ids = [event[config.ID_FIELD] for event in events]
+        plannings = {event_id: [] for event_id in event_ids}
+        for planning in get_resource_service('planning').find(where={'event_item': {'$in': event_ids}}):
+            plannings[planning['event_item']].append(planning)
+
+        history_updates = []
+        versions = []
+        for event, updates in items:
+            history_update = dict(updates)
+            event.update(updates)
+
+            # these fields are set for enqueue process to work. otherwise not needed
+            version, event = get_version_item_for_post(event)
+            # save the version into the history
+            history_update['version'] = version
+            history_updates.append(history_update)
+
+            event['plans'] = [p.get('_id') for p in plannings[event[config.ID_FIELD]]]
+            versions.append((event, version))
+
+        get_resource_service('events_history').on_series_posted(history_updates, events)
+        self.publish_events(versions)
+
+        # Planning items are only posted when the Events are unposted
+        related_plannings = [
+            planning
+            for event, updates in items
+            if updates['pubstatus'] == POST_STATE.CANCELLED
+            for planning in plannings[event[config.ID_FIELD]]
+        ]
+        if len(related_plannings) > 0:
+            self.post_related_plannings(related_plannings, POST_STATE.CANCELLED)
+
+        return [updates for event, updates in items]
+
+    def publish_events(self, versions):
+        """Enqueue a series of Events for publish, using a single celery task
+
+        :param list versions: List of (event, version) tuples
+        """
+        version_ids = get_resource_service('published_planning').post([{
+            'item_id': event['_id'],
+            'version': version,
+            'type': 'event',
+            'published_item': event
+        } for event, version in versions])
+
+        if version_ids:
+            # Asynchronously enqueue the items for publishing.
+            enqueue_planning_items.apply_async(kwargs={'ids': version_ids}, serializer="eve/json")
+        else:
+            logger.error('Failed to save planning versions for event series {}'.format(
+                [event['_id'] for event, version in versions]
+            ))
+
     def publish_event(self, event, version):
         """Enqueue the items for publish"""
         version_id = get_resource_service('published_planning').post([{'item_id': event['_id'],
@@ -9,7 +9,7 @@
 # at https://www.sourcefabric.org/superdesk/license
 
 from superdesk import get_resource_service
-from superdesk.notification import push_notification
+from planning.signals import push_notification
 from eve.utils import config
 from apps.archive.common import get_user, get_auth
 from planning.common import UPDATE_FUTURE, WORKFLOW_STATE, remove_lock_information, set_actioned_date_to_event
@@ -103,7 +103,7 @@ class EventsPostponeService(EventsBaseService):
         updates['state_reason'] = reason
 
     def update_recurring_events(self, updates, original, update_method):
-        historic, past, future = self.get_recurring_timeline(original)
+        historic, past, future = self.get_recurring_timeline(original, historic_docs=False)
 
         # Determine if the selected event is the first one, if so then
         # act as if we're changing future events
@@ -143,7 +143,7 @@ class EventsRescheduleService(EventsBaseService):
         reason = updates.pop('reason', None)
 
         events_service = get_resource_service('events')
-        historic, past, future = self.get_recurring_timeline(original, postponed=True)
+        historic, past, future = self.get_recurring_timeline(original, postponed=True, historic_docs=False)
 
         # Determine if the selected event is the first one, if so then
         # act as if we're changing future events
@@ -283,8 +283,7 @@ class EventsRescheduleService(EventsBaseService):
 
         # Now iterate over the new events and create them
         if new_events:
-            events_service.create(new_events)
-            app.on_inserted_events(new_events)
+            events_service.create_recurring_series(new_events, notify=False)
 
         # Iterate over the events to delete/spike
         self._set_events_planning(deleted_events)
@@ -14,7 +14,7 @@ from superdesk.metadata.item import metadata_schema, ITEM_TYPE
 from copy import deepcopy
 
 from planning.common import WORKFLOW_STATE_SCHEMA, POST_STATE_SCHEMA, UPDATE_METHODS, \
-    TO_BE_CONFIRMED_FIELD, TO_BE_CONFIRMED_FIELD_SCHEMA
+    TO_BE_CONFIRMED_FIELD, TO_BE_CONFIRMED_FIELD_SCHEMA, COMBINED_ID_FIELD, COMBINED_ID_FIELD_SCHEMA
 
 event_type = deepcopy(Resource.rel('events', type='string'))
 event_type['mapping'] = not_analyzed
@@ -340,6 +340,7 @@ events_schema = {
     },
     'completed': {'type': 'boolean'},
     TO_BE_CONFIRMED_FIELD: TO_BE_CONFIRMED_FIELD_SCHEMA,
+    COMBINED_ID_FIELD: COMBINED_ID_FIELD_SCHEMA,
 
 
     # This is used if an Event is created from a Planning Item
@@ -13,7 +13,7 @@ from .events_base_service import EventsBaseService
 from superdesk.errors import SuperdeskApiError
 from planning.common import ITEM_EXPIRY, ITEM_STATE, set_item_expiry, UPDATE_FUTURE, \
     WORKFLOW_STATE, remove_lock_information, remove_autosave_on_spike
-from superdesk.notification import push_notification
+from planning.signals import push_notification
 from apps.archive.common import get_user, get_auth
 from superdesk import config, get_resource_service
 from planning.item_lock import LOCK_USER, LOCK_SESSION
@@ -142,7 +142,8 @@ class EventsSpikeService(EventsBaseService):
         # Ensure that no other Event or Planning item is currently locked
         events_with_plans = self._validate_recurring(original, original['recurrence_id'])
 
-        historic, past, future = self.get_recurring_timeline(original, postponed=True, cancelled=True)
+        historic, past, future = self.get_recurring_timeline(original, postponed=True, cancelled=True,
+                                                             historic_docs=False)
 
         # Mark item as unlocked directly in order to avoid more queries and notifications
         # coming from lockservice.
@@ -266,7 +267,7 @@ class EventsUnspikeService(EventsBaseService):
         self._unspike_event(updates, original)
 
     def update_recurring_events(self, updates, original, update_method):
-        historic, past, future = self.get_recurring_timeline(original, spiked=True)
+        historic, past, future = self.get_recurring_timeline(original, spiked=True, historic_docs=False)
 
         self._unspike_event(updates, original)
 
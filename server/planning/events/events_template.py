@@ -14,7 +14,7 @@ from eve.utils import config, ParsedRequest
 from superdesk import Resource, get_resource_service
 from superdesk.services import BaseService
 from superdesk.metadata.item import metadata_schema
-from superdesk.notification import push_notification
+from planning.signals import push_notification
 from superdesk.errors import SuperdeskApiError
 from superdesk.utils import ListCursor
 from apps.archive.common import get_user
@@ -5,9 +5,10 @@ from mock import Mock, patch
 from superdesk import get_resource_service
 from superdesk.utc import utcnow
 from planning.tests import TestCase
-from planning.common import format_address
+from planning.common import format_address, get_mongo_collection, UPDATE_ALL
 from planning.item_lock import LockService
-from planning.events.events import generate_recurring_dates
+from planning.events.events import generate_recurring_dates, local_dates_to_utc
+from planning.events import events as events_module
 
 
 class EventTestCase(TestCase):
@@ -83,6 +84,48 @@ class EventTestCase(TestCase):
             datetime(2016, 12, 1, 23, 00),  # it's friday in Berlin
         ])
 
+    def test_local_dates_to_utc(self):
+        for zone in ['Australia/Sydney', 'Europe/Prague', 'America/New_York', 'UTC']:
+            tz = pytz.timezone(zone)
+            dates = [datetime(2020, 1, 1, 0, 30) + timedelta(hours=7 * i) for i in range(5000)]
+
+            # Include dates that are ambiguous or don't exist due to DST
+            dates.extend([datetime(2025, 3, 30, 2, 30), datetime(2025, 10, 26, 2, 30)])
+            dates.sort()
+
+            self.assertEqual(
+                list(local_dates_to_utc(dates, tz)),
+                [tz.localize(date).astimezone(pytz.UTC).replace(tzinfo=None) for date in dates]
+            )
+
+    def test_generated_events_sub_documents(self):
+        with self.app.app_context():
+            event = {
+                'name': 'Event',
+                'calendars': [{'qcode': 'sport', 'name': 'Sport'}],
+                'location': [{'name': 'Stadium', 'address': {'line': ['Main St']}}],
+                'dates': {
+                    'start': datetime(2021, 1, 1, 10, 0),
+                    'end': datetime(2021, 1, 1, 12, 0),
+                    'tz': 'UTC',
+                    'recurring_rule': {'frequency': 'DAILY', 'interval': 1, 'endRepeatMode': 'count', 'count': 3},
+                },
+            }
+            generated_events = events_module.generate_recurring_events(event)
+            self.assertEqual(len(generated_events), 3)
+
+            # The dates are copied for each Event
+            generated_events[0]['dates']['recurring_rule']['count'] = 5
+            for generated_event in generated_events[1:] + [event]:
+                self.assertEqual(generated_event['dates']['recurring_rule']['count'], 3)
+
+            # The other sub-documents are shared between the generated Events, but not with the original Event
+            self.assertIs(generated_events[0]['location'], generated_events[1]['location'])
+            generated_events[0]['location'][0]['formatted_address'] = 'Main St'
+            generated_events[0]['calendars'][0]['name'] = 'Football'
+            self.assertNotIn('formatted_address', event['location'][0])
+            self.assertEqual(event['calendars'][0]['name'], 'Sport')
+
     def test_get_recurring_timeline(self):
         with self.app.app_context():
             generated_events = generate_recurring_events(10)
@@ -114,6 +157,185 @@ class EventTestCase(TestCase):
                 self.assertEquals(e['dates']['start'], expected_time)
                 expected_time += timedelta(days=1)
 
+    def test_get_recurring_timeline_cache(self):
+        with self.app.app_context():
+            generated_events = generate_recurring_events(10)
+            for i, event in enumerate(generated_events):
+                event['_id'] = event['guid'] = 'event{}'.format(i)
+            self.app.data.insert('events', generated_events)
+
+            service = get_resource_service('events')
+            selected = service.find_one(req=None, _id='event5')
+
+            with patch('planning.events.events_base_service.get_mongo_collection',
+                       wraps=get_mongo_collection) as get_collection:
+                (historic, past, future) = service.get_recurring_timeline(selected, historic_docs=False)
+                service.get_recurring_timeline(selected)
+
+                # The timeline of the series is only loaded once
+                self.assertEqual(get_collection.call_count, 1)
+
+            # Historic Events only contain the fields from the timeline
+            self.assertEqual(['event0', 'event1'], [e['_id'] for e in historic])
+            self.assertEqual({'_id', 'state', 'dates'}, set(historic[0].keys()))
+            self.assertEqual('Event 6', future[0]['name'])
+
+            # Writing to an Event in the series invalidates the timeline
+            service.update('event6', {'state': 'spiked'}, future[0])
+            (historic, past, future) = service.get_recurring_timeline(selected)
+            self.assertEqual(['event7', 'event8', 'event9'], [e['_id'] for e in future])
+
+    def test_get_planning_ids_for_events(self):
+        with self.app.app_context():
+            self.app.data.insert('planning', [
+                {'_id': 'plan1', 'event_item': 'event1', 'planning_date': utcnow()},
+                {'_id': 'plan2', 'event_item': 'event1', 'planning_date': utcnow()},
+                {'_id': 'plan3', 'event_item': 'event2', 'planning_date': utcnow()},
+                {'_id': 'plan4', 'planning_date': utcnow()},
+            ])
+
+            service = get_resource_service('events')
+            planning_ids = service.get_planning_ids_for_events([
+                {'_id': 'event1'},
+                {'_id': 'event2'},
+                {'_id': 'event3'},
+            ])
+
+            self.assertEqual(sorted(planning_ids['event1']), ['plan1', 'plan2'])
+            self.assertEqual(planning_ids['event2'], ['plan3'])
+            self.assertNotIn('event3', planning_ids)
+
+            docs = {'_items': [{'_id': 'event1'}, {'_id': 'event3'}]}
+            service.on_fetched(docs)
+            self.assertEqual(sorted(docs['_items'][0]['planning_ids']), ['plan1', 'plan2'])
+            self.assertNotIn('planning_ids', docs['_items'][1])
+
+    @patch('planning.events.events.push_notification')
+    def test_create_recurring_series(self, push_notification):
+        with self.app.app_context():
+            events = generate_recurring_events(10)
+            for i, event in enumerate(events):
+                event['_id'] = event['guid'] = 'event{}'.format(i)
+
+            service = get_resource_service('events')
+            history_service = get_resource_service('events_history')
+            with patch.object(history_service, 'post', wraps=history_service.post) as post_history:
+                service.create_recurring_series(events)
+
+                # The history for all the Events is created with a single write
+                self.assertEqual(post_history.call_count, 1)
+                self.assertEqual(len(post_history.call_args[0][0]), 10)
+
+            self.assertEqual(service.find(where={'recurrence_id': 'rec1'}).count(), 10)
+            self.assertEqual(history_service.find(where={'operation': 'create'}).count(), 10)
+
+            push_notification.assert_called_once_with('events:created:recurring', item='rec1', user='')
+
+    def test_events_history_created_operation(self):
+        with self.app.app_context():
+            self.app.data.insert('planning', [{'_id': 'plan1', 'event_item': 'event1', 'planning_date': utcnow()}])
+            history_service = get_resource_service('events_history')
+
+            history_service.on_item_created([{'_id': 'event1'}, {'_id': 'event2'}])
+            self.assertEqual(history_service.find(where={'event_id': 'event1'})[0]['operation'],
+                             'created_from_planning')
+            self.assertEqual(history_service.find(where={'event_id': 'event2'})[0]['operation'], 'create')
+
+            # The provided operation is used for all the Events
+            history_service.on_item_created([{'_id': 'event3'}, {'_id': 'event1'}], 'duplicate')
+            self.assertEqual(history_service.find(where={'event_id': 'event3'})[0]['operation'], 'duplicate')
+            self.assertEqual(
+                history_service.find(where={'event_id': 'event1', 'operation': 'duplicate'}).count(), 1
+            )
+
+    @patch('planning.events.events.push_notification')
+    def test_update_recurring_series_calendars(self, push_notification):
+        with self.app.app_context():
+            events = generate_recurring_events(10)
+            for i, event in enumerate(events):
+                event['_id'] = event['guid'] = 'event{}'.format(i)
+                event['calendars'] = [{'qcode': 'sport'}] if i < 5 else []
+            self.app.data.insert('events', events)
+
+            service = get_resource_service('events')
+            history_service = get_resource_service('events_history')
+            selected = service.find_one(req=None, _id='event7')
+            selected['lock_action'] = 'assign_calendar'
+            updates = {'calendars': [{'qcode': 'finance'}]}
+
+            with patch.object(service, 'patch') as patch_event, \
+                    patch.object(service, 'find_one') as find_one, \
+                    patch.object(history_service, 'post', wraps=history_service.post) as post_history:
+                service._update_recurring_events(updates, selected, UPDATE_ALL)
+
+                # The series is updated using the timeline without fetching or patching each Event
+                patch_event.assert_not_called()
+                find_one.assert_not_called()
+
+                # The history for all the Events is created with a single write
+                self.assertEqual(post_history.call_count, 1)
+                self.assertEqual(len(post_history.call_args[0][0]), 9)
+
+            for i in range(10):
+                if i == 7:
+                    continue
+
+                event = service.find_one(req=None, _id='event{}'.format(i))
+                expected = ['sport', 'finance'] if i < 5 else ['finance']
+                self.assertEqual([calendar['qcode'] for calendar in event['calendars']], expected)
+
+            push_notification.assert_called_once_with(
+                'events:updated:recurring',
+                item='event7',
+                recurrence_id='rec1',
+                user=''
+            )
+
+    @patch('planning.events.events_post.push_notification')
+    @patch('planning.events.events_post.enqueue_planning_items')
+    def test_post_recurring_series(self, enqueue_planning_items, push_notification):
+        with self.app.app_context():
+            events = generate_recurring_events(10)
+            for i, event in enumerate(events):
+                event['_id'] = event['guid'] = 'event{}'.format(i)
+            self.app.data.insert('events', events)
+            self.app.data.insert('planning', [{'_id': 'plan1', 'slugline': 'Plan', 'event_item': 'event3'}])
+
+            service = get_resource_service('events_post')
+            events_service = get_resource_service('events')
+            history_service = get_resource_service('events_history')
+            selected = events_service.find_one(req=None, _id='event0')
+
+            with patch.object(events_service, 'update') as update_event, \
+                    patch.object(history_service, 'post', wraps=history_service.post) as post_history:
+                ids = service._post_recurring_events({'pubstatus': 'usable'}, selected, UPDATE_ALL)
+
+                # The series is posted without updating each Event individually
+                update_event.assert_not_called()
+
+                # The history for all the Events is created with a single write
+                self.assertEqual(post_history.call_count, 1)
+                self.assertEqual(len(post_history.call_args[0][0]), 10)
+
+            self.assertEqual(ids, ['event{}'.format(i) for i in range(10)])
+            for i in range(10):
+                event = events_service.find_one(req=None, _id='event{}'.format(i))
+                self.assertEqual(event['state'], 'scheduled')
+                self.assertEqual(event['pubstatus'], 'usable')
+
+            self.assertEqual(history_service.find(where={'operation': 'post'}).count(), 10)
+
+            # All the versions are enqueued for publishing with a single task
+            self.assertEqual(enqueue_planning_items.apply_async.call_count, 1)
+            version_ids = enqueue_planning_items.apply_async.call_args[1]['kwargs']['ids']
+            self.assertEqual(len(version_ids), 10)
+
+            version = get_resource_service('published_planning').find_one(req=None, item_id='event3')
+            self.assertEqual(version['published_item']['plans'], ['plan1'])
+
+            self.assertEqual(push_notification.call_count, 1)
+            self.assertEqual(push_notification.call_args[0][0], 'events:posted:recurring')
+
 
 class EventLocationFormatAddress(TestCase):
     def test_format_address(self):
@@ -366,6 +588,102 @@ class EventPlanningSchedule(TestCase):
         update_repetitions.is_original_event = is_original_event_func
         update_repetitions.REQUIRE_LOCK = True
 
+    def test_update_repetitions_series_diff(self):
+        service = get_resource_service('events')
+        history_service = get_resource_service('events_history')
+        event = {
+            'name': 'Friday Club',
+            'dates': {
+                'start': datetime(2099, 11, 21, 12, 00, 00, tzinfo=pytz.UTC),
+                'end': datetime(2099, 11, 21, 14, 00, 00, tzinfo=pytz.UTC),
+                'tz': 'Australia/Sydney',
+                'recurring_rule': {
+                    'frequency': 'DAILY',
+                    'interval': 1,
+                    'count': 5,
+                    'endRepeatMode': 'count'
+                }
+            }
+        }
+
+        service.post([event])
+        events = list(service.get(req=None, lookup=None))
+        self.assertEqual(len(events), 5)
+
+        update_repetitions = get_resource_service('events_update_repetitions')
+        update_repetitions.REQUIRE_LOCK = False
+        is_original_event_func = update_repetitions.is_original_event
+        update_repetitions.is_original_event = Mock(return_value=False)
+
+        # Decreasing the series deletes the Events that are not in use
+        schedule = deepcopy(events[0].get('dates'))
+        schedule['recurring_rule']['count'] = 3
+        update_repetitions.patch(events[0].get('_id'), {'dates': schedule})
+
+        events = list(service.get(req=None, lookup=None))
+        self.assertPlanningSchedule(events, 3)
+        self.assertEqual(history_service.find(where={'operation': 'update_repetitions_update'}).count(), 3)
+
+        # Increasing the series only creates the new Events
+        schedule = deepcopy(events[0].get('dates'))
+        schedule['recurring_rule']['count'] = 6
+        with patch.object(history_service, 'post', wraps=history_service.post) as post_history:
+            update_repetitions.patch(events[0].get('_id'), {'dates': schedule})
+
+            # One history write for the updated Events, and one for the created Events
+            self.assertEqual(post_history.call_count, 2)
+
+        events = list(service.get(req=None, lookup=None))
+        self.assertPlanningSchedule(events, 6)
+        self.assertEqual(history_service.find(where={'operation': 'update_repetitions_create'}).count(), 3)
+
+        update_repetitions.is_original_event = is_original_event_func
+        update_repetitions.REQUIRE_LOCK = True
+
+    @patch('planning.events.events_cancel.EventsCancelService._get_cancel_state')
+    def test_update_repetitions_cancel_calls_hook(self, get_cancel_state):
+        get_cancel_state.return_value = {'qcode': 'eocstat:eos6', 'name': 'Cancelled'}
+        service = get_resource_service('events')
+        history_service = get_resource_service('events_history')
+        event = {
+            'name': 'Friday Club',
+            'dates': {
+                'start': datetime(2099, 11, 21, 12, 00, 00, tzinfo=pytz.UTC),
+                'end': datetime(2099, 11, 21, 14, 00, 00, tzinfo=pytz.UTC),
+                'tz': 'Australia/Sydney',
+                'recurring_rule': {
+                    'frequency': 'DAILY',
+                    'interval': 1,
+                    'count': 5,
+                    'endRepeatMode': 'count'
+                }
+            }
+        }
+
+        service.post([event])
+        events = sorted(service.get(req=None, lookup=None), key=lambda e: e['dates']['start'])
+        schedule = deepcopy(events[0]['dates'])
+        schedule['recurring_rule']['count'] = 3
+
+        on_cancel = Mock()
+        self.app.on_updated_events_cancel += on_cancel
+        try:
+            update_repetitions = get_resource_service('events_update_repetitions')
+            update_repetitions._cancel_events(events[3:], schedule['recurring_rule'])
+        finally:
+            self.app.on_updated_events_cancel -= on_cancel
+
+        # The hook is called for each cancelled Event, which records its history as events_cancel
+        self.assertEqual(on_cancel.call_count, 2)
+        self.assertEqual(
+            [original['_id'] for updates, original in (call[0] for call in on_cancel.call_args_list)],
+            [events[3]['_id'], events[4]['_id']]
+        )
+        self.assertEqual(history_service.find(where={'operation': 'events_cancel'}).count(), 2)
+
+        for event_id in [events[3]['_id'], events[4]['_id']]:
+            self.assertEqual(service.find_one(req=None, _id=event_id)['state'], 'cancelled')
+
     @patch('planning.events.events.get_user')
     def test_planning_schedule_convert_to_recurring(self, get_user_mock):
         service = get_resource_service('events')
@@ -14,9 +14,9 @@ from superdesk.metadata.utils import generate_guid
 from superdesk.metadata.item import GUID_NEWSML
 from apps.auth import get_user_id
 from planning.common import remove_lock_information, WORKFLOW_STATE, POST_STATE, \
-    get_max_recurrent_events, set_original_creator
+    get_max_recurrent_events, set_original_creator, bulk_system_update_items
 from .events import EventsResource, generate_recurring_dates
-from .events_base_service import EventsBaseService
+from .events_base_service import EventsBaseService, invalidate_recurring_timeline
 from planning.item_lock import LOCK_ACTION
 
 from eve.utils import config
@@ -68,19 +68,19 @@ class EventsUpdateRepetitionsService(EventsBaseService):
             **updated_rule
         )]
 
-        original_dates = [date for date in generate_recurring_dates(
+        # Use sets for the date lookups, as both series can contain hundreds of Events
+        new_dates_set = set(new_dates)
+        original_dates = set(generate_recurring_dates(
             start=first_event.get('dates', {}).get('start'),
             tz=original['dates'].get('tz') and pytz.timezone(original['dates']['tz'] or None),
             **original_rule
-        )]
+        ))
 
         # Compute the difference between start and end in the updated event
         time_delta = original['dates']['end'] - original['dates']['start']
 
-        events_service = get_resource_service('events')
-
         deleted_events = {}
-        new_events = []
+        updated_events = []
 
         # Update the recurring rules for EVERY event in the series
         # Also if we're decreasing the length of the series, then
@@ -88,34 +88,26 @@ class EventsUpdateRepetitionsService(EventsBaseService):
         for event in existing_events:
             # if the event does not occur in the new dates, then we need to either
             # delete or cancel this event
-            if event['dates']['start'].replace(tzinfo=None) not in new_dates:
+            if event['dates']['start'].replace(tzinfo=None) not in new_dates_set:
                 deleted_events[event[config.ID_FIELD]] = event
 
             # Otherwise this Event does occur in the new dates
             # So just update the recurring_rule to match the new series recurring_rule
             else:
-                self._update_event(updated_rule, event)
+                updated_events.append(event)
+
+        self._update_events(updated_rule, updated_events)
 
         # Create new events that do not fall on the original series
-        for date in new_dates:
-            if date not in original_dates:
-                new_events.append(self._create_event(date, updates, original, time_delta))
-
-        # Now iterate over the new events and create them
-        if new_events:
-            events_service.create(new_events)
-            for event in new_events:
-                get_resource_service('events_history').on_update_repetitions(
-                    event,
-                    event[config.ID_FIELD],
-                    'update_repetitions_create'
-                )
+        self._create_events([
+            self._create_event(date, updates, original, time_delta)
+            for date in new_dates
+            if date not in original_dates
+        ])
 
         # Iterate over the events to delete/cancel
         self._set_events_planning(deleted_events)
-
-        for event in deleted_events.values():
-            self._delete_event(event, events_service, updated_rule)
+        self._delete_events(deleted_events.values(), updated_rule)
 
         # if the original event was "posted" then post the new generated events
         if original.get('pubstatus') in [POST_STATE.CANCELLED, POST_STATE.USABLE]:
@@ -128,21 +120,49 @@ class EventsUpdateRepetitionsService(EventsBaseService):
         Don't update the Event item here
 
         Instead modifications are done on Event items in the following functions:
-        * _update_event
-        * _create_event
-        * _delete_event
-        * _cancel_event
+        * _update_events
+        * _create_events
+        * _delete_events
+        * _cancel_events
         """
         pass
 
-    def _update_event(self, updated_rule, original):
-        updates = self._update_rules(original, updated_rule)
-        self.set_planning_schedule(updates)
-        self.backend.update(self.datasource, original[config.ID_FIELD], updates, original)
-        get_resource_service('events_history').on_update_repetitions(
-            updates,
-            original[config.ID_FIELD],
-            'update_repetitions' if original.get(LOCK_ACTION) == 'update_repetitions' else 'update_repetitions_update'
+    def _update_events(self, updated_rule, events):
+        """Updates the recurring rules of the Events using a single bulk write"""
+        if not events:
+            return
+
+        items = []
+        for event in events:
+            updates = self._update_rules(event, updated_rule)
+            self.set_planning_schedule(updates)
+            items.append((event, updates))
+
+        self._bulk_update(items)
+
+        histories = {}
+        for event, updates in items:
+            operation = 'update_repetitions' if event.get(LOCK_ACTION) == 'update_repetitions' \
+                else 'update_repetitions_update'
+            histories.setdefault(operation, []).append((event, updates))
+
+        for operation, operation_items in histories.items():
+            get_resource_service('events_history').on_series_updated(
+                [updates for event, updates in operation_items],
+                [event for event, updates in operation_items],
+                operation
+            )
+
+    def _create_events(self, new_events):
+        """Creates the new Events using bulk writes, and saves their history in a single write"""
+        if not new_events:
+            return
+
+        get_resource_service('events').create(new_events)
+        get_resource_service('events_history').on_series_updated(
+            new_events,
+            new_events,
+            'update_repetitions_create'
         )
 
     def _create_event(self, date, updates, original, time_delta):
@@ -168,33 +188,69 @@ class EventsUpdateRepetitionsService(EventsBaseService):
 
         return new_event
 
-    def _delete_event(self, event, events_service, updated_rule):
-        event_plans = event.get('_plans', [])
+    def _delete_events(self, events, updated_rule):
+        """Deletes the Events that are not in use, and cancels the ones that are"""
+        cancelled_events = []
+        deleted_events = []
+
+        for event in events:
+            if len(event.get('_plans', [])) > 0 or event.get('pubstatus', None) is not None:
+                cancelled_events.append(event)
+            else:
+                deleted_events.append(event)
+
+        if deleted_events:
+            get_resource_service('events').delete_action(lookup={
+                config.ID_FIELD: {'$in': [event[config.ID_FIELD] for event in deleted_events]}
+            })
+            for event in deleted_events:
+                app.on_deleted_item_events(event)
+
+        self._cancel_events(cancelled_events, updated_rule)
 
-        if len(event_plans) > 0 or event.get('pubstatus', None) is not None:
-            self._cancel_event(event, updated_rule)
-        else:
-            events_service.delete_action(lookup={'_id': event[config.ID_FIELD]})
-            app.on_deleted_item_events(event)
+    def _cancel_events(self, events, updated_rule):
+        """Cancels the Events using a single bulk write, then calls the ``on_updated_events_cancel`` hook for each"""
+        if not events:
+            return
 
-    def _cancel_event(self, event, updated_rule):
         cancel_service = get_resource_service('events_cancel')
+        occur_cancel_state = cancel_service._get_cancel_state()
+
+        items = []
+        for event in events:
+            # If the Event is not in a valid state to Cancel, then we simply ignore this Event
+            if not cancel_service.validate_states(event):
+                continue
+
+            updates = self._update_rules(event, updated_rule)
+            cancel_service._set_event_cancelled(updates, event, occur_cancel_state)
 
-        # If the Event is not in a valid state to Cancel, then we simply ignore this Event
-        if not cancel_service.validate_states(event):
+            # Cancel the Planning items as the Event is in use
+            if event.get('_plans'):
+                cancel_service._cancel_event_plannings(updates, event)
+
+            items.append((event, updates))
+
+        if not items:
             return
 
-        updates = self._update_rules(event, updated_rule)
+        self._bulk_update(items)
 
-        cancel_service.update_single_event(updates, event)
-        self.backend.update(self.datasource, event[config.ID_FIELD], updates, event)
-        app.on_updated_events_cancel(updates, {'_id': event[config.ID_FIELD]})
+        for event, updates in items:
+            app.on_updated_events_cancel(updates, event)
 
-        # If the event was posted we need to post the cancellation
-        if event.get('pubstatus') in [POST_STATE.CANCELLED, POST_STATE.USABLE]:
-            post = {'event': event[config.ID_FIELD], 'etag': event['_etag'],
-                    'update_method': 'single', 'pubstatus': event.get('pubstatus')}
-            get_resource_service('events_post').post([post])
+            # If the event was posted we need to post the cancellation
+            if event.get('pubstatus') in [POST_STATE.CANCELLED, POST_STATE.USABLE]:
+                post = {'event': event[config.ID_FIELD], 'etag': updates['_etag'],
+                        'update_method': 'single', 'pubstatus': event.get('pubstatus')}
+                get_resource_service('events_post').post([post])
+
+    def _bulk_update(self, items):
+        for event, updates in items:
+            event.pop('_plans', None)
+
+        bulk_system_update_items(self.datasource, items)
+        invalidate_recurring_timeline(*(event for event, updates in items))
 
     @staticmethod
     def _update_rules(event, updated_rules):
@@ -24,6 +24,7 @@ from superdesk import get_resource_service
 import pytz
 from icalendar import Calendar
 from planning.common import get_max_recurrent_events
+from planning.reference_data import get_reference_item
 
 utc = pytz.UTC
 logger = logging.getLogger(__name__)
@@ -77,7 +78,7 @@ class IcsTwoFeedParser(FileFeedParser):
                     item['original_source'] = component.get('uid')
                     item['state'] = CONTENT_STATE.INGESTED
                     item['pubstatus'] = None
-                    eocstat_map = get_resource_service('vocabularies').find_one(req=None, _id='eventoccurstatus')
+                    eocstat_map = get_reference_item('vocabularies', 'eventoccurstatus')
                     if eocstat_map:
                         item['occur_status'] = [x for x in eocstat_map.get('items', []) if
                                                 x['qcode'] == 'eocstat:eos5' and x.get('is_active', True)][0]
@@ -14,7 +14,7 @@ from datetime import datetime
 
 from superdesk.errors import ParserError, ProviderError
 from superdesk.io.feeding_services.file_service import FileFeedingService
-from superdesk.notification import push_notification
+from planning.signals import push_notification
 from superdesk.utc import utc
 from superdesk.utils import get_sorted_files, FileSortAttributes
 
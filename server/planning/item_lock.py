@@ -9,14 +9,18 @@
 # at https://www.sourcefabric.org/superdesk/license
 
 import logging
+import json
 import superdesk
 
 from superdesk.errors import SuperdeskApiError
-from superdesk.notification import push_notification
+from planning.signals import push_notification
 from superdesk.users.services import current_user_has_privilege
 from superdesk.utc import utcnow
-from superdesk.lock import lock, unlock
-from eve.utils import config
+from planning.lock_registry import acquire_lease, release_lease
+from eve.utils import config, ParsedRequest
+from eve.methods.common import resolve_document_etag
+from flask import current_app
+from pymongo import ReturnDocument
 from superdesk import get_resource_service, get_resource_privileges
 from apps.common.components.base_component import BaseComponent
 
@@ -45,7 +49,6 @@ class LockService(BaseComponent):
         if not item:
             raise SuperdeskApiError.notFoundError()
 
-        item_service = get_resource_service(resource)
         item_id = item.get(config.ID_FIELD)
 
         # lock_id will be:
@@ -61,8 +64,10 @@ class LockService(BaseComponent):
         # set the lock_id it per item
         lock_id = "item_lock {}".format(item.get(lock_id_field))
 
-        # get the lock it not raise forbidden exception
-        if not lock(lock_id, expire=5):
+        # get the lease on the lock_id, waiting for a concurrent request to release it
+        # if not acquired in time raise forbidden exception
+        lease = acquire_lease(lock_id, resource, item_id, user_id, session_id, action)
+        if lease is None:
             raise SuperdeskApiError.forbiddenError(message="Item is locked by another user.")
 
         try:
@@ -77,7 +82,10 @@ class LockService(BaseComponent):
                 if action:
                     updates['lock_action'] = action
 
-                item_service.update(item.get(config.ID_FIELD), updates, item)
+                # The lock is only written if it is unchanged since it was checked, as the lease may have
+                # expired and another request may have locked the item in the meantime
+                if not self.compare_and_set_lock(item, updates, resource):
+                    raise SuperdeskApiError.forbiddenError(message="Item is locked by another user.")
 
                 push_notification(resource + ':lock',
                                   item=str(item.get(config.ID_FIELD)),
@@ -88,21 +96,60 @@ class LockService(BaseComponent):
             else:
                 raise SuperdeskApiError.forbiddenError(message=error_message)
 
-            item = item_service.find_one(req=None, _id=item_id)
+            # apply the lock fields that were just written instead of reading the item again
+            item = dict(item)
+            item.update(updates)
 
             # following line executes handlers attached to function:
             # on_locked_'resource' - ex. on_locked_planning, on_locked_event
             getattr(self.app, 'on_locked_%s' % resource)(item, user_id)
             return item
         finally:
-            # unlock the lock :)
-            unlock(lock_id, remove=True)
+            # release the lease :)
+            release_lease(lease)
+
+    @staticmethod
+    def compare_and_set_lock(item, updates, resource):
+        """Write the lock fields, only if the lock of the item is unchanged since the item was read
+
+        This is the only write to Mongo when locking an item, the updated item is then re-indexed in Elastic.
+        The ``_updated`` and ``_etag`` of the ``updates`` are populated with the new values.
+
+        :param dict item: The item as it was read before checking the lock
+        :param dict updates: The lock fields to write
+        :param str resource: The name of the resource
+        :return bool: True if the lock fields were written
+        """
+        # Imported here as planning.common depends on the lock fields defined in this module
+        from planning.common import get_mongo_collection
+
+        updates[config.LAST_UPDATED] = utcnow()
+        updated = {key: value for key, value in item.items() if key != config.ETAG}
+        updated.update(updates)
+        resolve_document_etag(updated, resource)
+        if updated.get(config.ETAG):
+            updates[config.ETAG] = updated[config.ETAG]
+
+        lookup = {
+            config.ID_FIELD: item.get(config.ID_FIELD),
+            LOCK_USER: item.get(LOCK_USER),
+            LOCK_SESSION: item.get(LOCK_SESSION),
+        }
+        doc = get_mongo_collection(resource).find_one_and_update(
+            lookup,
+            {'$set': dict(updates)},
+            return_document=ReturnDocument.AFTER
+        )
+        if doc is None:
+            return False
+
+        current_app.data._search_backend(resource).bulk_insert(resource, [doc])
+        return True
 
     def unlock(self, item, user_id, session_id, resource):
         if not item:
             raise SuperdeskApiError.notFoundError()
 
-        item_service = get_resource_service(resource)
         item_id = item.get(config.ID_FIELD)
 
         can_user_unlock, error_message = self.can_unlock(item, user_id, resource)
@@ -151,10 +198,82 @@ class LockService(BaseComponent):
 
     def unlock_session_for_resource(self, user_id, session_id, resource):
         item_service = get_resource_service(resource)
-        items = item_service.find(where={'lock_session': session_id})
+        items = list(item_service.find(where={'lock_session': session_id}))
+
+        if items:
+            self.unlock_items(items, user_id, session_id, resource, skip_forbidden=True)
+
+    def unlock_items(self, items, user_id, session_id, resource, skip_forbidden=False):
+        """Unlock many items of the same resource, i.e. all the items locked in a session
+
+        The lock fields are cleared using a single bulk write, the ``on_unlock_<resource>_items``
+        and ``on_unlocked_<resource>_items`` hooks are called once with all the items, and a single
+        ``<resource>:unlock`` notification is sent with the list of unlocked items.
+
+        :param list items: List of items to unlock
+        :param user_id: The ID of the user unlocking the items
+        :param session_id: The ID of the session unlocking the items
+        :param str resource: The name of the resource
+        :param bool skip_forbidden: If True, the items the user cannot unlock are skipped (i.e. when the session ends),
+        otherwise a forbidden error is raised before any item is unlocked
+        """
+        # Imported here as planning.common depends on the lock fields defined in this module
+        from planning.common import bulk_system_update_items
+
+        unlockable_items = []
+        for item in items:
+            can_user_unlock, error_message = self.can_unlock(item, user_id, resource)
+            if can_user_unlock:
+                unlockable_items.append(item)
+            elif skip_forbidden:
+                logger.warning('Skipped unlocking {} item {}: {}'.format(
+                    resource, item.get(config.ID_FIELD), error_message
+                ))
+            else:
+                raise SuperdeskApiError.forbiddenError(message=error_message)
+
+        items = unlockable_items
+        if not items:
+            return
+
+        # following lines execute handlers attached to functions:
+        # on_unlock_'resource'_items - ex. on_unlock_planning_items, on_unlock_events_items
+        # on_unlock_'resource' - ex. on_unlock_planning, on_unlock_events (only if any are attached)
+        getattr(self.app, 'on_unlock_%s_items' % resource)(items, user_id)
+        self._call_item_hooks('on_unlock_%s' % resource, items, user_id)
+
+        updates = [
+            (item, {LOCK_USER: None, LOCK_SESSION: None, LOCK_TIME: None, LOCK_ACTION: None})
+            for item in items
+            if item.get(LOCK_USER)
+        ]
+        bulk_system_update_items(resource, updates)
+        etags = {item[config.ID_FIELD]: item_updates.get('_etag') for item, item_updates in updates}
+
+        # on_unlocked_'resource'_items - ex. on_unlocked_planning_items, on_unlocked_events_items
+        # on_unlocked_'resource' - ex. on_unlocked_planning, on_unlocked_events (only if any are attached)
+        getattr(self.app, 'on_unlocked_%s_items' % resource)(items, user_id)
+        self._call_item_hooks('on_unlocked_%s' % resource, items, user_id)
+
+        push_notification(
+            resource + ':unlock',
+            items=[{
+                'item': str(item.get(config.ID_FIELD)),
+                'etag': etags.get(item[config.ID_FIELD]) or item.get('_etag'),
+                'event_item': item.get('event_item') or None,
+                'recurrence_id': item.get('recurrence_id') or None
+            } for item in items],
+            user=str(user_id),
+            lock_session=str(session_id)
+        )
+
+    def _call_item_hooks(self, name, items, user_id):
+        hook = getattr(self.app, name)
+        if not len(hook):
+            return
 
         for item in items:
-            self.unlock(item, user_id, session_id, resource)
+            hook(item, user_id)
 
     def can_lock(self, item, user_id, session_id, resource):
         """
@@ -193,12 +312,30 @@ class LockService(BaseComponent):
     def on_session_end(self, user_id, session_id):
         self.unlock_session(user_id, session_id)
 
+    def get_locked_items_in_relationship(self, item, resource_name):
+        """Returns the first locked item, for each resource, related to the provided item
+
+        Uses a single query per resource that only matches the locked items,
+        with a projection of the fields required to check the locks.
+        """
+        req = ParsedRequest()
+        req.max_results = 1
+        req.projection = json.dumps({'type': 1, LOCK_USER: 1, LOCK_SESSION: 1})
+
+        for resource, lookup in get_resource_service(resource_name).get_relationship_lookups(item):
+            lookup = dict(lookup)
+            lookup.setdefault(config.ID_FIELD, {'$ne': item[config.ID_FIELD]})
+            lookup.update({
+                LOCK_USER: {'$ne': None},
+                LOCK_SESSION: {'$ne': None},
+            })
+            yield from get_resource_service(resource).get_from_mongo(req=req, lookup=lookup)
+
     def validate_relationship_locks(self, item, resource_name):
         if not item:
             raise SuperdeskApiError.notFoundError()
 
-        all_items = get_resource_service(resource_name).get_all_items_in_relationship(item)
-        for related_item in all_items:
+        for related_item in self.get_locked_items_in_relationship(item, resource_name):
             if related_item[config.ID_FIELD] != item[config.ID_FIELD]:
                 if related_item.get(LOCK_USER) and related_item.get(LOCK_SESSION):
                     # Frame appropriate error message string
@@ -0,0 +1,142 @@
+from mock import Mock, patch
+from bson import ObjectId
+
+from superdesk import get_resource_service
+from superdesk.errors import SuperdeskApiError
+from superdesk.utc import utcnow
+
+from planning.tests import TestCase
+from planning.item_lock import LockService
+
+
+class LockServiceTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.user_id = ObjectId()
+        lock = {
+            'lock_user': self.user_id,
+            'lock_session': 'session1',
+            'lock_action': 'edit',
+            'lock_time': utcnow(),
+        }
+
+        with self.app.app_context():
+            self.app.data.insert('events', [
+                dict(_id='event{}'.format(i), type='event', name='Event {}'.format(i), recurrence_id='rec1', **lock)
+                for i in range(5)
+            ] + [{'_id': 'event5', 'type': 'event', 'name': 'Event 5'}])
+            self.app.data.insert('planning', [
+                dict(_id='plan1', type='planning', slugline='Plan 1', event_item='event1', **lock),
+                {'_id': 'plan2', 'type': 'planning', 'slugline': 'Plan 2', 'lock_user': self.user_id,
+                 'lock_session': 'session2'},
+            ])
+
+    @patch('planning.item_lock.push_notification')
+    def test_unlock_session(self, push_notification):
+        with self.app.app_context():
+            lock_service = LockService(self.app)
+            on_unlocked_events_items = Mock()
+            self.app.on_unlocked_events_items += on_unlocked_events_items
+
+            events_service = get_resource_service('events')
+            with patch.object(events_service, 'update') as update_event:
+                lock_service.unlock_session(self.user_id, 'session1')
+
+                # The items are unlocked without updating each item individually
+                update_event.assert_not_called()
+
+            for i in range(5):
+                event = events_service.find_one(req=None, _id='event{}'.format(i))
+                self.assertIsNone(event.get('lock_user'))
+                self.assertIsNone(event.get('lock_session'))
+
+            planning_service = get_resource_service('planning')
+            self.assertIsNone(planning_service.find_one(req=None, _id='plan1').get('lock_user'))
+            self.assertEqual(planning_service.find_one(req=None, _id='plan2')['lock_session'], 'session2')
+
+            # The hooks are called once with all the items
+            self.assertEqual(on_unlocked_events_items.call_count, 1)
+            self.assertEqual(len(on_unlocked_events_items.call_args[0][0]), 5)
+
+            # A single notification is sent per resource
+            self.assertEqual(
+                [call[0][0] for call in push_notification.call_args_list],
+                ['planning:unlock', 'events:unlock']
+            )
+
+            planning_notification = push_notification.call_args_list[0][1]
+            self.assertEqual(planning_notification['lock_session'], 'session1')
+            self.assertEqual(len(planning_notification['items']), 1)
+            self.assertEqual(planning_notification['items'][0]['item'], 'plan1')
+            self.assertEqual(planning_notification['items'][0]['event_item'], 'event1')
+
+            events_notification = push_notification.call_args_list[1][1]
+            self.assertEqual(
+                sorted(item['item'] for item in events_notification['items']),
+                ['event{}'.format(i) for i in range(5)]
+            )
+            self.assertEqual(events_notification['items'][0]['recurrence_id'], 'rec1')
+
+    @patch('planning.item_lock.push_notification')
+    def test_unlock_session_skips_items_that_cannot_be_unlocked(self, push_notification):
+        with self.app.app_context():
+            lock_service = LockService(self.app)
+
+            def can_unlock(item, user_id, resource):
+                if item['_id'] == 'event2':
+                    return False, 'You don\'t have permissions to unlock an item.'
+                return True, ''
+
+            with patch.object(lock_service, 'can_unlock', side_effect=can_unlock):
+                lock_service.unlock_session(self.user_id, 'session1')
+
+                # Unlocking the items directly still fails without unlocking any of them
+                with self.assertRaises(SuperdeskApiError):
+                    lock_service.unlock_items(
+                        [get_resource_service('events').find_one(req=None, _id='event2')],
+                        self.user_id,
+                        'session1',
+                        'events'
+                    )
+
+            events_service = get_resource_service('events')
+            self.assertEqual(events_service.find_one(req=None, _id='event2')['lock_session'], 'session1')
+            for event_id in ['event0', 'event1', 'event3', 'event4']:
+                self.assertIsNone(events_service.find_one(req=None, _id=event_id).get('lock_session'))
+
+            events_notification = push_notification.call_args_list[1][1]
+            self.assertEqual(
+                sorted(item['item'] for item in events_notification['items']),
+                ['event0', 'event1', 'event3', 'event4']
+            )
+
+    def test_validate_relationship_locks(self):
+        with self.app.app_context():
+            lock_service = LockService(self.app)
+            events_service = get_resource_service('events')
+            planning_service = get_resource_service('planning')
+
+            # Locked Events in the same series
+            with patch.object(events_service, 'find') as find_events:
+                with self.assertRaises(SuperdeskApiError) as context:
+                    lock_service.validate_relationship_locks({'_id': 'event6', 'recurrence_id': 'rec1'}, 'events')
+
+                # The full documents of the series are not loaded
+                find_events.assert_not_called()
+
+            self.assertEqual(context.exception.message, 'Another event in this recurring series is already locked.')
+
+            # The associated Planning item is locked
+            self.app.data.update('planning', 'plan2', {'event_item': 'event5'}, {'_id': 'plan2'})
+            with self.assertRaises(SuperdeskApiError) as context:
+                lock_service.validate_relationship_locks(events_service.find_one(req=None, _id='event5'), 'events')
+            self.assertEqual(context.exception.message, 'An associated planning item is already locked.')
+
+            with self.assertRaises(SuperdeskApiError) as context:
+                lock_service.validate_relationship_locks(planning_service.find_one(req=None, _id='plan1'), 'planning')
+            self.assertEqual(context.exception.message, 'An associated event is already locked.')
+
+            # Locks of the item itself, or of unrelated items, are ignored
+            lock_service.validate_relationship_locks({'_id': 'event6'}, 'events')
+            lock_service.validate_relationship_locks({'_id': 'plan2', 'event_item': 'event5'}, 'planning')
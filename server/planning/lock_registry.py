@@ -0,0 +1,196 @@
+# -*- coding: utf-8; -*-
+#
+# This file is part of Superdesk.
+#
+#  Copyright 2021 Sourcefabric z.u. and contributors.
+#
+# For the full copyright and license information, please see the
+# AUTHORS and LICENSE files distributed with this source code, or
+# at https://www.sourcefabric.org/superdesk/license
+
+"""Registry of the leases taken while locking Events, Planning items and Assignments
+
+``LockService.lock`` takes a lease on the lock id of the item (the ``recurrence_id``, ``event_item``
+or ``_id`` of the item) while it checks the locks of the related items (i.e. the other Events of the series),
+so two items of the same series cannot be locked at the same time. The lock fields of the item itself are written
+with a compare-and-set, in case the lease expired before they are written.
+A lease is acquired with a single atomic upsert, which only succeeds if there is no lease on
+the lock id or the existing lease has expired. Each acquisition increments the fencing ``token`` of
+the lease, which is used so that only the current holder can release it.
+
+When the lease is held by another request, the acquisition is retried with an exponential backoff
+for up to ``PLANNING_LOCK_REGISTRY_WAIT`` seconds, instead of failing straight away.
+"""
+
+from typing import Dict, Any, Optional
+import logging
+import time
+from datetime import timedelta
+from threading import Lock
+
+from flask import current_app as app
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+import superdesk
+from superdesk import Resource, Service
+from superdesk.utc import utcnow
+
+logger = logging.getLogger(__name__)
+
+LOCK_REGISTRY_RESOURCE = 'planning_lock_registry'
+
+
+def get_lock_registry_lease_time(current_app=None):
+    return int((current_app or app).config.get('PLANNING_LOCK_REGISTRY_LEASE_TIME', 5))
+
+
+def get_lock_registry_wait(current_app=None):
+    return float((current_app or app).config.get('PLANNING_LOCK_REGISTRY_WAIT', 2))
+
+
+class LockRegistryResource(Resource):
+    endpoint_name = LOCK_REGISTRY_RESOURCE
+    schema = {
+        # The lock id of the item
+        '_id': {'type': 'string'},
+        'resource': {'type': 'string'},
+        'item_id': {'type': 'string'},
+        'user': Resource.rel('users'),
+        'session': Resource.rel('auth'),
+        'action': {'type': 'string'},
+        'expiry': {'type': 'datetime'},
+        # Incremented on every acquisition of the lease
+        'token': {'type': 'integer'},
+    }
+    internal_resource = True
+    resource_methods = []
+    item_methods = []
+    # Keep the released leases for a day, so their tokens keep increasing
+    mongo_indexes = {'expiry_1': ([('expiry', 1)], {'expireAfterSeconds': 86400})}
+
+
+class LockRegistryService(Service):
+    pass
+
+
+class LockMetrics:
+    """Counters of the lease acquisitions made by this process"""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.acquired = 0
+        self.conflicts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def on_acquired(self, wait: float):
+        with self.lock:
+            self.acquired += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def on_conflict(self):
+        with self.lock:
+            self.conflicts += 1
+
+    def on_timeout(self):
+        with self.lock:
+            self.timeouts += 1
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                'acquired': self.acquired,
+                'conflicts': self.conflicts,
+                'timeouts': self.timeouts,
+                'average_wait_ms': self.total_wait * 1000 / self.acquired if self.acquired else 0.0,
+                'max_wait_ms': self.max_wait * 1000,
+            }
+
+
+def get_lock_metrics() -> LockMetrics:
+    if 'planning_lock_metrics' not in app.extensions:
+        app.extensions['planning_lock_metrics'] = LockMetrics()
+
+    return app.extensions['planning_lock_metrics']
+
+
+def get_lock_registry_collection():
+    source = app.config['DOMAIN'][LOCK_REGISTRY_RESOURCE]['datasource']['source']
+    return app.data.mongo.pymongo(resource=LOCK_REGISTRY_RESOURCE).db[source]
+
+
+def _try_acquire_lease(lock_id: str, lease: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    now = utcnow()
+    updates = dict(lease)
+    updates['expiry'] = now + timedelta(seconds=get_lock_registry_lease_time())
+
+    try:
+        return get_lock_registry_collection().find_one_and_update(
+            {'_id': lock_id, 'expiry': {'$lte': now}},
+            {'$set': updates, '$inc': {'token': 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # Another request holds a lease that has not expired
+        return None
+
+
+def acquire_lease(lock_id: str, resource: str, item_id, user_id, session_id, action) -> Optional[Dict[str, Any]]:
+    """Acquire the lease on the lock id, waiting for the current lease to be released if required
+
+    :param str lock_id: The lock id of the item
+    :param str resource: The name of the resource being locked
+    :param item_id: The ID of the item being locked
+    :param user_id: The ID of the user locking the item
+    :param session_id: The ID of the session locking the item
+    :param action: The lock action
+    :return dict: The lease, or None if the lease could not be acquired in time
+    """
+    metrics = get_lock_metrics()
+    lease = {
+        'resource': resource,
+        'item_id': str(item_id),
+        'user': user_id,
+        'session': session_id,
+        'action': action,
+    }
+    started = time.monotonic()
+    deadline = started + get_lock_registry_wait()
+    delay = 0.02
+
+    while True:
+        acquired = _try_acquire_lease(lock_id, lease)
+        now = time.monotonic()
+
+        if acquired is not None:
+            metrics.on_acquired(now - started)
+            return acquired
+
+        metrics.on_conflict()
+        if now + delay > deadline:
+            metrics.on_timeout()
+            logger.warning('Timed out waiting for the lock registry lease "{}"'.format(lock_id))
+            return None
+
+        time.sleep(delay)
+        delay = min(delay * 2, 0.5)
+
+
+def release_lease(lease: Dict[str, Any]):
+    """Release the lease, if it is still held with the same fencing token
+
+    The lease is expired instead of removed, so the token keeps increasing on the next acquisition.
+    """
+    get_lock_registry_collection().update_one(
+        {'_id': lease['_id'], 'token': lease['token']},
+        {'$set': {'expiry': utcnow()}}
+    )
+
+
+def init_app(app):
+    service = LockRegistryService(LOCK_REGISTRY_RESOURCE, backend=superdesk.get_backend())
+    LockRegistryResource(LOCK_REGISTRY_RESOURCE, app=app, service=service)
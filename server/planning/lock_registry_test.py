@@ -0,0 +1,85 @@
+from datetime import timedelta
+from unittest import mock
+
+from superdesk import get_resource_service
+from superdesk.errors import SuperdeskApiError
+from superdesk.utc import utcnow
+
+from planning.tests import TestCase
+from planning.item_lock import LockService
+from planning.lock_registry import acquire_lease, release_lease, get_lock_metrics, get_lock_registry_collection
+
+
+class LockRegistryTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.app.config['PLANNING_LOCK_REGISTRY_WAIT'] = 0
+        self.app.extensions.pop('planning_lock_metrics', None)
+
+    def test_acquire_and_release_lease(self):
+        with self.app.app_context():
+            lease = acquire_lease('item_lock rec1', 'events', 'event1', 'user1', 'session1', 'edit')
+            self.assertEqual(lease['token'], 1)
+            self.assertEqual(lease['session'], 'session1')
+
+            # The lease is held by another request
+            self.assertIsNone(acquire_lease('item_lock rec1', 'events', 'event2', 'user2', 'session2', 'edit'))
+
+            release_lease(lease)
+            lease = acquire_lease('item_lock rec1', 'events', 'event2', 'user2', 'session2', 'edit')
+            self.assertEqual(lease['token'], 2)
+            self.assertEqual(lease['session'], 'session2')
+
+            # A stale holder cannot release the lease of the new holder
+            release_lease({'_id': 'item_lock rec1', 'token': 1})
+            self.assertIsNone(acquire_lease('item_lock rec1', 'events', 'event3', 'user3', 'session3', 'edit'))
+
+            # An expired lease can be acquired
+            get_lock_registry_collection().update_one(
+                {'_id': 'item_lock rec1'},
+                {'$set': {'expiry': utcnow() - timedelta(seconds=1)}}
+            )
+            lease = acquire_lease('item_lock rec1', 'events', 'event3', 'user3', 'session3', 'edit')
+            self.assertEqual(lease['token'], 3)
+
+            metrics = get_lock_metrics().get_metrics()
+            self.assertEqual(metrics['acquired'], 3)
+            self.assertEqual(metrics['conflicts'], 2)
+            self.assertEqual(metrics['timeouts'], 2)
+
+    def test_lock_item(self):
+        with self.app.app_context():
+            self.app.data.insert('events', [{'_id': 'event1', 'type': 'event', 'name': 'Event 1'}])
+            event = get_resource_service('events').find_one(req=None, _id='event1')
+
+            lock_service = LockService(self.app)
+            events_service = get_resource_service('events')
+            with mock.patch.object(events_service, 'update') as update_event:
+                locked = lock_service.lock(event, None, 'session1', 'edit', 'events')
+
+                # The lock is written with a single compare-and-set
+                update_event.assert_not_called()
+
+            self.assertEqual(locked['lock_session'], 'session1')
+            self.assertEqual(locked['lock_action'], 'edit')
+            self.assertEqual(events_service.find_one(req=None, _id='event1')['_etag'], locked['_etag'])
+
+            # The lease is released once the item is locked
+            lease = get_lock_registry_collection().find_one({'_id': 'item_lock event1', 'expiry': {'$lte': utcnow()}})
+            self.assertEqual(lease['token'], 1)
+            self.assertEqual(get_lock_metrics().get_metrics()['acquired'], 1)
+
+    def test_lock_item_changed_after_read(self):
+        with self.app.app_context():
+            self.app.data.insert('events', [{'_id': 'event1', 'type': 'event', 'name': 'Event 1'}])
+            event = get_resource_service('events').find_one(req=None, _id='event1')
+
+            # The item is locked by another request, after its lease expired
+            self.app.data.update('events', 'event1', {'lock_user': 'user2', 'lock_session': 'session2'}, event)
+
+            with self.assertRaises(SuperdeskApiError) as context:
+                LockService(self.app).lock(event, None, 'session1', 'edit', 'events')
+            self.assertEqual(context.exception.message, 'Item is locked by another user.')
+
+            event = get_resource_service('events').find_one(req=None, _id='event1')
+            self.assertEqual(event['lock_session'], 'session2')
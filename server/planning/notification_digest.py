@@ -0,0 +1,172 @@
+# -*- coding: utf-8; -*-
+#
+# This file is part of Superdesk.
+#
+#  Copyright 2021 Sourcefabric z.u. and contributors.
+#
+# For the full copyright and license information, please see the
+# AUTHORS and LICENSE files distributed with this source code, or
+# at https://www.sourcefabric.org/superdesk/license
+
+"""Buffer of the Slack and email assignment notifications, combined into a digest per recipient
+
+When ``PLANNING_NOTIFICATION_DIGEST_WINDOW`` is set, the notifications are stored in a single digest
+document per channel and recipient instead of being sent straight away. The first notification of a digest
+schedules a celery task to send it once the window has elapsed, so any notification added in the meantime
+is sent in the same Slack message or email.
+
+The messages are only removed from the digest once they were sent, a notification added while the digest
+was being sent is kept and its send is scheduled again. If the digest has not been sent ``ORPHANED_DIGEST_GRACE_PERIOD``
+seconds after the window has elapsed (i.e. the celery task was lost or the send failed), the periodic
+``planning.send_orphaned_notification_digests`` task schedules the send again.
+"""
+
+from typing import Dict, Any, List, Optional
+import logging
+from datetime import timedelta
+
+from bson import ObjectId
+from flask import current_app as app
+from pymongo.errors import DuplicateKeyError
+
+import superdesk
+from superdesk import Resource, Service
+from superdesk.utc import utcnow
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_DIGEST_RESOURCE = 'planning_notification_digest'
+
+DIGEST_CHANNELS = ['slack_user', 'slack_desk', 'email_user', 'email_contact']
+
+#: Number of seconds after the window, after which a digest that has not been sent is considered orphaned
+ORPHANED_DIGEST_GRACE_PERIOD = 300
+
+
+def get_notification_digest_window(current_app=None):
+    return int((current_app or app).config.get('PLANNING_NOTIFICATION_DIGEST_WINDOW', 0))
+
+
+class NotificationDigestResource(Resource):
+    endpoint_name = NOTIFICATION_DIGEST_RESOURCE
+    schema = {
+        # <channel>:<recipient>
+        '_id': {'type': 'string'},
+        'channel': {
+            'type': 'string',
+            'allowed': DIGEST_CHANNELS,
+        },
+        # The ID of the user, desk or contact
+        'recipient': {'type': ['string', 'objectid']},
+        # The time the send of the digest was last scheduled
+        'scheduled': {'type': 'datetime'},
+        'messages': {
+            'type': 'list',
+            'schema': {'type': 'dict'},
+        },
+    }
+    internal_resource = True
+    resource_methods = []
+    item_methods = []
+
+
+class NotificationDigestService(Service):
+    pass
+
+
+def get_notification_digest_collection():
+    source = app.config['DOMAIN'][NOTIFICATION_DIGEST_RESOURCE]['datasource']['source']
+    return app.data.mongo.pymongo(resource=NOTIFICATION_DIGEST_RESOURCE).db[source]
+
+
+def get_digest_id(channel: str, recipient) -> str:
+    return '{}:{}'.format(channel, recipient)
+
+
+def add_to_digest(channel: str, recipient, message: Dict[str, Any]) -> Optional[str]:
+    """Add the message to the digest of the recipient
+
+    :param str channel: The channel the message is sent through, one of ``DIGEST_CHANNELS``
+    :param recipient: The ID of the user, desk or contact
+    :param dict message: The message to send
+    :return str: The ID of the digest if its send needs to be scheduled, otherwise None
+    """
+    digest_id = get_digest_id(channel, recipient)
+    collection = get_notification_digest_collection()
+
+    # Each message gets an ID, so only the messages that were sent are removed from the digest
+    message = dict(message, _id=ObjectId())
+
+    for _ in range(2):
+        try:
+            original = collection.find_one_and_update(
+                {'_id': digest_id},
+                {
+                    '$push': {'messages': message},
+                    '$setOnInsert': {'channel': channel, 'recipient': recipient, 'scheduled': utcnow()},
+                },
+                upsert=True
+            )
+            return digest_id if original is None else None
+        except DuplicateKeyError:
+            # The digest was created by a concurrent request, retry to add the message to it
+            continue
+
+    logger.warning('Failed to add the notification to the digest "{}"'.format(digest_id))
+    return None
+
+
+def get_digest(digest_id: str) -> Optional[Dict[str, Any]]:
+    return get_notification_digest_collection().find_one({'_id': digest_id})
+
+
+def remove_sent_messages(digest: Dict[str, Any]) -> bool:
+    """Remove the sent messages from the digest, and delete it if no other message was added in the meantime
+
+    :param dict digest: The digest that was sent
+    :return bool: True if messages were added while the digest was sent, and its send needs to be scheduled again
+    """
+    collection = get_notification_digest_collection()
+    digest_id = digest['_id']
+    message_ids = [message.get('_id') for message in get_digest_messages(digest)]
+
+    if message_ids:
+        collection.update_one({'_id': digest_id}, {'$pull': {'messages': {'_id': {'$in': message_ids}}}})
+
+    if collection.delete_one({'_id': digest_id, 'messages': {'$size': 0}}).deleted_count:
+        return False
+
+    return collection.find_one_and_update(
+        {'_id': digest_id, 'messages.0': {'$exists': True}},
+        {'$set': {'scheduled': utcnow()}}
+    ) is not None
+
+
+def claim_orphaned_digests(digest_window: int) -> List[str]:
+    """Return the IDs of the digests that should have been sent already, and mark them as scheduled again
+
+    :param int digest_window: The number of seconds the digest is sent after
+    :return list: The IDs of the digests whose send needs to be scheduled again
+    """
+    collection = get_notification_digest_collection()
+    now = utcnow()
+    orphaned_query = {'scheduled': {'$lt': now - timedelta(seconds=digest_window + ORPHANED_DIGEST_GRACE_PERIOD)}}
+
+    digest_ids = []
+    for digest in collection.find(orphaned_query, {'_id': 1}):
+        # Only one of concurrent runs of the task schedules the digest again
+        claimed = collection.update_one({'_id': digest['_id'], **orphaned_query}, {'$set': {'scheduled': now}})
+        if claimed.modified_count:
+            logger.warning('Scheduling the orphaned notification digest "{}" again'.format(digest['_id']))
+            digest_ids.append(digest['_id'])
+
+    return digest_ids
+
+
+def get_digest_messages(digest: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return (digest or {}).get('messages') or []
+
+
+def init_app(app):
+    service = NotificationDigestService(NOTIFICATION_DIGEST_RESOURCE, backend=superdesk.get_backend())
+    NotificationDigestResource(NOTIFICATION_DIGEST_RESOURCE, app=app, service=service)
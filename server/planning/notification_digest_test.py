@@ -0,0 +1,71 @@
+from datetime import timedelta
+
+from mock import patch
+
+from superdesk.utc import utcnow
+
+from planning.tests import TestCase
+from planning.notification_digest import add_to_digest, get_digest, get_digest_messages, remove_sent_messages, \
+    claim_orphaned_digests, get_notification_digest_collection
+from planning.planning_notifications import PlanningNotifications
+
+
+class NotificationDigestTestCase(TestCase):
+    def test_add_to_digest(self):
+        with self.app.app_context():
+            # Only the first message schedules the digest
+            self.assertEqual(add_to_digest('slack_user', 'user1', {'message': 'one'}), 'slack_user:user1')
+            self.assertIsNone(add_to_digest('slack_user', 'user1', {'message': 'two'}))
+            self.assertEqual(add_to_digest('slack_desk', 'user1', {'message': 'three'}), 'slack_desk:user1')
+
+            digest = get_digest('slack_user:user1')
+            self.assertEqual(digest['recipient'], 'user1')
+            self.assertEqual([m['message'] for m in get_digest_messages(digest)], ['one', 'two'])
+
+            # The digest is deleted once its messages were sent
+            self.assertFalse(remove_sent_messages(digest))
+            self.assertIsNone(get_digest('slack_user:user1'))
+
+            # A message added after the digest was sent starts a new digest
+            self.assertEqual(add_to_digest('slack_user', 'user1', {'message': 'four'}), 'slack_user:user1')
+
+    def test_message_added_while_sending_is_kept(self):
+        with self.app.app_context():
+            add_to_digest('slack_user', 'user1', {'message': 'one'})
+            digest = get_digest('slack_user:user1')
+
+            # The same message is added again while the digest is being sent
+            self.assertIsNone(add_to_digest('slack_user', 'user1', {'message': 'one'}))
+
+            self.assertTrue(remove_sent_messages(digest))
+            self.assertEqual(len(get_digest_messages(get_digest('slack_user:user1'))), 1)
+
+    def test_orphaned_digest_is_scheduled_again(self):
+        with self.app.app_context():
+            add_to_digest('email_user', 'user1', {'message': 'one'})
+            add_to_digest('email_user', 'user2', {'message': 'two'})
+            self.assertEqual(claim_orphaned_digests(60), [])
+
+            # The digest was not sent in time, i.e. the celery task was lost
+            get_notification_digest_collection().update_one(
+                {'_id': 'email_user:user1'},
+                {'$set': {'scheduled': utcnow() - timedelta(hours=1)}}
+            )
+
+            self.assertEqual(claim_orphaned_digests(60), ['email_user:user1'])
+            self.assertEqual(claim_orphaned_digests(60), [])
+
+    @patch('planning.planning_notifications._send_user_emails')
+    def test_digest_is_kept_when_the_send_fails(self, send_user_emails):
+        with self.app.app_context():
+            add_to_digest('email_user', 'user1', {'source': 'one', 'meta_message': '', 'data': {}})
+
+            send_user_emails.side_effect = Exception('SMTP server unavailable')
+            with self.assertRaises(Exception):
+                PlanningNotifications()._notify_digest('email_user:user1')
+            self.assertEqual(len(get_digest_messages(get_digest('email_user:user1'))), 1)
+
+            send_user_emails.side_effect = None
+            PlanningNotifications()._notify_digest('email_user:user1')
+            self.assertEqual(send_user_emails.call_count, 2)
+            self.assertIsNone(get_digest('email_user:user1'))
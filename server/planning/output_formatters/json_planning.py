@@ -13,8 +13,8 @@ from superdesk.publish.formatters import Formatter
 import superdesk
 import json
 from superdesk.utils import json_serialize_datetime_objectId
-from copy import deepcopy
 from superdesk import get_resource_service
+from eve.utils import config
 from planning.common import ASSIGNMENT_WORKFLOW_STATE, WORKFLOW_STATE
 from superdesk.metadata.item import CONTENT_STATE
 from .utils import expand_contact_info
@@ -51,66 +51,156 @@ class JsonPlanningFormatter(Formatter):
         output_item = self._format_item(item)
         return [(pub_seq_num, json.dumps(output_item, default=json_serialize_datetime_objectId))]
 
-    def _format_item(self, item):
-        """Format the item to json event"""
-        output_item = deepcopy(item)
-        for f in self.remove_fields:
-            output_item.pop(f, None)
-        for coverage in output_item.get('coverages', []):
-            self._expand_coverage_contacts(coverage)
+    def format_items(self, items):
+        """Format a batch of items, using a single query per lookup resource for the entire batch
 
-            deliveries, workflow_state = self._expand_delivery(coverage)
-            if workflow_state:
-                coverage['workflow_status'] = self._get_coverage_workflow_state(workflow_state)
-
-            coverage['deliveries'] = deliveries
-            for f in self.remove_coverage_fields:
-                coverage.pop(f, None)
+        :param list items: List of planning items
+        :return: List of formatted items, in the same order as ``items``
+        """
+        lookups = self._get_lookups(items)
+        return [self._format_item(item, lookups) for item in items]
 
-            for key in self.remove_coverage_planning_fields:
-                if key in (coverage.get('planning') or {}):
-                    coverage['planning'].pop(key, None)
+    def _format_item(self, item, lookups=None):
+        """Format the item to json event
 
-        output_item['agendas'] = self._expand_agendas(item)
+        The output is built from shallow copies of the item, coverages and coverage planning,
+        so the original ``item`` is not modified.
+        """
+        if lookups is None:
+            lookups = self._get_lookups([item])
+
+        output_item = {key: value for key, value in item.items() if key not in self.remove_fields}
+        output_item['coverages'] = [
+            self._format_coverage(coverage, lookups)
+            for coverage in item.get('coverages') or []
+        ]
+        if 'coverages' not in item:
+            output_item.pop('coverages')
+
+        output_item['agendas'] = self._expand_agendas(item, lookups)
         return output_item
 
+    def _format_coverage(self, coverage, lookups):
+        output_coverage = {key: value for key, value in coverage.items() if key not in self.remove_coverage_fields}
+
+        if coverage.get('planning'):
+            output_coverage['planning'] = {
+                key: value
+                for key, value in coverage['planning'].items()
+                if key not in self.remove_coverage_planning_fields
+            }
+
+        self._expand_coverage_contacts(coverage, output_coverage, lookups)
+
+        deliveries, workflow_state = self._expand_delivery(coverage, output_coverage, lookups)
+        if workflow_state:
+            output_coverage['workflow_status'] = self._get_coverage_workflow_state(workflow_state)
+
+        output_coverage['deliveries'] = deliveries
+        return output_coverage
+
+    def _get_lookups(self, items):
+        """Get the users, contacts, assignments, deliveries and agendas referenced by the items
+
+        Each resource is retrieved using a single query for all ``items``
+
+        :param list items: List of planning items
+        :return dict: Dictionary of resource name to a dictionary of the documents by ``_id``
+            (deliveries are a list of documents by ``coverage_id``)
+        """
+        user_ids = set()
+        contact_ids = set()
+        assignment_ids = set()
+        agenda_ids = set()
+        coverage_assignments = {}
+
+        for item in items:
+            agenda_ids.update(item.get('agendas') or [])
+            for coverage in item.get('coverages') or []:
+                assigned_to = coverage.get('assigned_to') or {}
+                if assigned_to.get('user'):
+                    user_ids.add(assigned_to['user'])
+                if assigned_to.get('contact'):
+                    contact_ids.add(assigned_to['contact'])
+                if assigned_to.get('assignment_id'):
+                    assignment_ids.add(assigned_to['assignment_id'])
+                    coverage_assignments[coverage.get('coverage_id')] = str(assigned_to['assignment_id'])
+
+        lookups = {
+            'users': self._find_by_ids('users', user_ids),
+            'contacts': {str(contact[config.ID_FIELD]): contact for contact in expand_contact_info(list(contact_ids))},
+            'assignments': self._find_by_ids('assignments', assignment_ids),
+            'agenda': self._find_by_ids('agenda', agenda_ids),
+            'delivery': {},
+        }
+
+        # Deliveries are only required for completed or in progress assignments
+        coverage_ids = [
+            coverage_id
+            for coverage_id, assignment_id in coverage_assignments.items()
+            if ((lookups['assignments'].get(assignment_id) or {}).get('assigned_to') or {}).get('state') in [
+                ASSIGNMENT_WORKFLOW_STATE.COMPLETED,
+                ASSIGNMENT_WORKFLOW_STATE.IN_PROGRESS
+            ]
+        ]
+        if coverage_ids:
+            for delivery in get_resource_service('delivery').find(where={'coverage_id': {'$in': coverage_ids}}):
+                lookups['delivery'].setdefault(delivery.get('coverage_id'), []).append(delivery)
+
+        return lookups
+
+    @staticmethod
+    def _find_by_ids(resource, ids):
+        if not ids:
+            return {}
+
+        return {
+            str(doc[config.ID_FIELD]): doc
+            for doc in get_resource_service(resource).find(where={config.ID_FIELD: {'$in': list(ids)}})
+        }
+
     def _get_coverage_workflow_state(self, assignment_state):
         if assignment_state in {ASSIGNMENT_WORKFLOW_STATE.SUBMITTED, ASSIGNMENT_WORKFLOW_STATE.IN_PROGRESS}:
             return WORKFLOW_STATE.ACTIVE
         else:
             return assignment_state
 
-    def _expand_agendas(self, item):
+    def _expand_agendas(self, item, lookups):
         """
         Given an item it will scan any agendas, look them up and return the expanded values, if enabled
 
         :param item:
+        :param lookups: Prefetched documents from ``_get_lookups``
         :return: Array of expanded agendas
         """
         remove_agenda_fields = {'_etag', '_type', 'original_creator', '_updated', '_created', 'is_enabled'}
         expanded = []
         for agenda in item.get('agendas', []):
-            agenda_details = get_resource_service('agenda').find_one(req=None, _id=agenda)
+            agenda_details = lookups['agenda'].get(str(agenda))
             if agenda_details and agenda_details.get('is_enabled'):
-                for f in remove_agenda_fields:
-                    agenda_details.pop(f, None)
-                expanded.append(agenda_details)
+                expanded.append({
+                    key: value
+                    for key, value in agenda_details.items()
+                    if key not in remove_agenda_fields
+                })
         return expanded
 
-    def _expand_delivery(self, coverage):
+    def _expand_delivery(self, coverage, output_coverage, lookups):
         """Find any deliveries associated with the assignment
 
-        :param assignment_id:
+        :param coverage: The original coverage
+        :param output_coverage: The formatted coverage
+        :param lookups: Prefetched documents from ``_get_lookups``
         :return:
         """
-        assigned_to = coverage.pop('assigned_to', None) or {}
-        coverage['coverage_provider'] = assigned_to.get('coverage_provider')
+        assigned_to = coverage.get('assigned_to') or {}
+        output_coverage['coverage_provider'] = assigned_to.get('coverage_provider')
         assignment_id = assigned_to.get('assignment_id')
 
         if not assignment_id:
             return [], None
 
-        assignment = superdesk.get_resource_service('assignments').find_one(req=None, _id=assignment_id)
+        assignment = lookups['assignments'].get(str(assignment_id))
         if not assignment:
             return [], None
 
@@ -118,15 +208,15 @@ class JsonPlanningFormatter(Formatter):
                                                               ASSIGNMENT_WORKFLOW_STATE.IN_PROGRESS]:
             return [], assignment.get('assigned_to').get('state')
 
-        delivery_service = get_resource_service('delivery')
         remove_fields = ('coverage_id', 'planning_id', '_created', '_updated', 'assignment_id', '_etag')
-        deliveries = list(delivery_service.get(req=None, lookup={'coverage_id': coverage.get('coverage_id')}))
+        deliveries = [
+            {key: value for key, value in delivery.items() if key not in remove_fields}
+            for delivery in lookups['delivery'].get(coverage.get('coverage_id')) or []
+        ]
 
         # Check to see if in this delivery chain, whether the item has been published at least once
         item_never_published = True
         for delivery in deliveries:
-            for f in remove_fields:
-                delivery.pop(f, None)
             if delivery.get('item_state') == CONTENT_STATE.PUBLISHED:
                 item_never_published = False
 
@@ -135,19 +225,21 @@ class JsonPlanningFormatter(Formatter):
 
         return deliveries, assignment.get('assigned_to').get('state')
 
-    def _expand_coverage_contacts(self, coverage):
-        if (coverage.get('assigned_to') or {}).get('contact'):
-            expanded_contacts = expand_contact_info([coverage['assigned_to']['contact']])
-            if expanded_contacts:
-                coverage['coverage_provider_contact_info'] = {
-                    'first_name': expanded_contacts[0]['first_name'],
-                    'last_name': expanded_contacts[0]['last_name']
+    def _expand_coverage_contacts(self, coverage, output_coverage, lookups):
+        assigned_to = coverage.get('assigned_to') or {}
+
+        if assigned_to.get('contact'):
+            contact = lookups['contacts'].get(str(assigned_to['contact']))
+            if contact:
+                output_coverage['coverage_provider_contact_info'] = {
+                    'first_name': contact['first_name'],
+                    'last_name': contact['last_name']
                 }
 
-        if (coverage.get('assigned_to') or {}).get('user'):
-            user = get_resource_service('users').find_one(req=None, _id=coverage['assigned_to']['user'])
+        if assigned_to.get('user'):
+            user = lookups['users'].get(str(assigned_to['user']))
             if user:
-                coverage['assigned_user'] = {
+                output_coverage['assigned_user'] = {
                     'first_name': user.get('first_name'),
                     'last_name': user.get('last_name')
                 }
@@ -20,7 +20,8 @@ from superdesk.metadata.item import GUID_NEWSML, metadata_schema, ITEM_TYPE
 from superdesk import get_resource_service
 from superdesk.resource import not_analyzed
 from superdesk.users.services import current_user_has_privilege
-from superdesk.notification import push_notification
+from planning.signals import push_notification
+from planning.reference_data import get_reference_items
 from apps.archive.common import get_user, get_auth, update_dates_for
 from copy import deepcopy
 from eve.utils import config, ParsedRequest, date_to_str
@@ -29,7 +30,8 @@ from planning.common import WORKFLOW_STATE_SCHEMA, POST_STATE_SCHEMA, get_covera
     set_original_creator, list_uniq_with_order, TEMP_ID_PREFIX, DEFAULT_ASSIGNMENT_PRIORITY,\
     get_planning_allow_scheduled_updates, TO_BE_CONFIRMED_FIELD, TO_BE_CONFIRMED_FIELD_SCHEMA, \
     get_planning_xmp_assignment_mapping, sanitize_input_data, get_planning_xmp_slugline_mapping, \
-    get_planning_use_xmp_for_pic_slugline, get_planning_use_xmp_for_pic_assignments
+    get_planning_use_xmp_for_pic_slugline, get_planning_use_xmp_for_pic_assignments, iter_search_after, \
+    COMBINED_ID_FIELD, COMBINED_ID_FIELD_SCHEMA, set_combined_id
 from superdesk.utc import utcnow
 from itertools import chain
 from planning.planning_notifications import PlanningNotifications
@@ -47,60 +49,83 @@ class PlanningService(superdesk.Service):
     """Service class for the planning model."""
 
     def generate_related_assignments(self, docs):
-        def _enhance_coverage_entities(coverage_entities, lookup_field='coverage_item'):
-            if not coverage_entities:
-                return
-
-            ids = list(coverage_entities.keys())
+        """Populate the ``assigned_to`` details of coverages and scheduled updates
 
-            assignments = list(get_resource_service('assignments').get_from_mongo(req=None,
-                                                                                  lookup={lookup_field: {'$in': ids}}))
-
-            for coverage_id, coverage in coverage_entities.items():
-                if not coverage.get('assigned_to'):
-                    coverage['assigned_to'] = {}
-                else:
-                    try:
-                        assignment = [a for a in assignments if str(a.get('_id')) ==
-                                      str(coverage['assigned_to'].get('assignment_id'))][0]
-                    except IndexError:
-                        continue
-
-                    coverage['assigned_to']['assignment_id'] = assignment.get(config.ID_FIELD)
-                    coverage['assigned_to']['desk'] = assignment.get('assigned_to', {}).get('desk')
-                    coverage['assigned_to']['user'] = assignment.get('assigned_to', {}).get('user')
-                    coverage['assigned_to']['contact'] = assignment.get('assigned_to', {}).get('contact')
-                    coverage['assigned_to']['state'] = assignment.get('assigned_to', {}).get('state')
-                    coverage['assigned_to']['assignor_user'] = assignment.get('assigned_to', {}).get('assignor_user')
-                    coverage['assigned_to']['assignor_desk'] = assignment.get('assigned_to', {}).get('assignor_desk')
-                    coverage['assigned_to']['assigned_date_desk'] = \
-                        assignment.get('assigned_to', {}).get('assigned_date_desk')
-                    coverage['assigned_to']['assigned_date_user'] = \
-                        assignment.get('assigned_to', {}).get('assigned_date_user')
-                    coverage['assigned_to']['coverage_provider'] = \
-                        assignment.get('assigned_to', {}).get('coverage_provider')
-                    coverage['assigned_to']['priority'] = assignment.get('priority')
+        All coverages and scheduled updates across ``docs`` are collected first, then the
+        related assignments are retrieved using a single query per entity kind and joined
+        back in using a dictionary keyed by the assignment ``_id``.
 
+        :param list docs: List of planning documents
+        """
         coverages = {}
-        for doc in docs:
+        scheduled_updates = {}
+        for doc in docs or []:
             doc.pop('_planning_schedule', None)
             doc.pop('_updates_schedule', None)
 
             if not doc.get('coverages'):
                 doc['coverages'] = []
 
-            for cov in (doc.get('coverages') or []):
-                scheduled_updates = {}
+            for cov in doc['coverages']:
                 coverages[cov.get('coverage_id')] = cov
 
                 if not cov.get('scheduled_updates'):
                     cov['scheduled_updates'] = []
 
-                for s in cov.get('scheduled_updates'):
+                for s in cov['scheduled_updates']:
                     scheduled_updates[s.get('scheduled_update_id')] = s
 
-                _enhance_coverage_entities(coverages)
-                _enhance_coverage_entities(scheduled_updates, lookup_field='scheduled_update_id')
+        self._enhance_coverage_entities(coverages)
+        self._enhance_coverage_entities(scheduled_updates, lookup_field='scheduled_update_id')
+
+    def _get_assignments_by_id(self, entity_ids, lookup_field='coverage_item'):
+        """Returns a dictionary of assignments, keyed by the string ``_id`` of the assignment
+
+        :param list entity_ids: List of coverage_ids or scheduled_update_ids
+        :param str lookup_field: The assignment attribute to match ``entity_ids`` against
+        """
+        if not entity_ids:
+            return {}
+
+        assignments = get_resource_service('assignments').get_from_mongo(
+            req=None,
+            lookup={lookup_field: {'$in': entity_ids}}
+        )
+
+        return {str(assignment.get(config.ID_FIELD)): assignment for assignment in assignments}
+
+    def _enhance_coverage_entities(self, coverage_entities, lookup_field='coverage_item'):
+        if not coverage_entities:
+            return
+
+        entity_ids = [
+            entity_id
+            for entity_id, entity in coverage_entities.items()
+            if entity.get('assigned_to')
+        ]
+        assignments = self._get_assignments_by_id(entity_ids, lookup_field)
+
+        for coverage in coverage_entities.values():
+            if not coverage.get('assigned_to'):
+                coverage['assigned_to'] = {}
+                continue
+
+            assignment = assignments.get(str(coverage['assigned_to'].get('assignment_id')))
+            if not assignment:
+                continue
+
+            assigned_to = assignment.get('assigned_to') or {}
+            coverage['assigned_to']['assignment_id'] = assignment.get(config.ID_FIELD)
+            coverage['assigned_to']['desk'] = assigned_to.get('desk')
+            coverage['assigned_to']['user'] = assigned_to.get('user')
+            coverage['assigned_to']['contact'] = assigned_to.get('contact')
+            coverage['assigned_to']['state'] = assigned_to.get('state')
+            coverage['assigned_to']['assignor_user'] = assigned_to.get('assignor_user')
+            coverage['assigned_to']['assignor_desk'] = assigned_to.get('assignor_desk')
+            coverage['assigned_to']['assigned_date_desk'] = assigned_to.get('assigned_date_desk')
+            coverage['assigned_to']['assigned_date_user'] = assigned_to.get('assigned_date_user')
+            coverage['assigned_to']['coverage_provider'] = assigned_to.get('coverage_provider')
+            coverage['assigned_to']['priority'] = assignment.get('priority')
 
     def on_fetched(self, docs):
         self.generate_related_assignments(docs.get(config.ITEMS))
@@ -131,6 +156,7 @@ class PlanningService(superdesk.Service):
             self._set_planning_event_info(doc, planning_type)
             self._set_coverage(doc)
             self.set_planning_schedule(doc)
+            set_combined_id(doc)
             # set timestamps
             update_dates_for(doc)
 
@@ -215,9 +241,9 @@ class PlanningService(superdesk.Service):
         sanitize_input_data(updates)
 
         # Validate if agendas being added are enabled agendas
-        agenda_service = get_resource_service('agenda')
+        agendas = get_reference_items('agenda', updates.get('agendas', []))
         for agenda_id in updates.get('agendas', []):
-            agenda = agenda_service.find_one(req=None, _id=str(agenda_id))
+            agenda = agendas.get(str(agenda_id))
             if not agenda:
                 raise SuperdeskApiError.forbiddenError('Agenda \'{}\' does not exist'.format(agenda.get('name')))
 
@@ -335,6 +361,26 @@ class PlanningService(superdesk.Service):
         else:
             return all_items
 
+    @staticmethod
+    def get_relationship_lookups(item):
+        """Returns the lookups used to find the items related to this Planning item
+
+        Same items as ``get_all_items_in_relationship``, but returned as a list of
+        ``(resource, lookup)`` tuples, so the callee can query only the fields it requires.
+        """
+        if not item.get('event_item'):
+            return []
+        elif item.get('recurrence_id'):
+            return get_resource_service('events').get_relationship_lookups({
+                config.ID_FIELD: item['event_item'],
+                'recurrence_id': item['recurrence_id']
+            })
+
+        return [
+            ('events', {config.ID_FIELD: item['event_item']}),
+            ('planning', {'event_item': item['event_item']}),
+        ]
+
     def remove_coverages(self, updates, original):
         for coverage in (original or {}).get('coverages') or []:
             updated_coverage = next((cov for cov in updates.get('coverages') or []
@@ -1023,34 +1069,7 @@ class PlanningService(superdesk.Service):
                 }
             }
 
-        query['sort'] = [{'planning_date': 'asc'}]
-        query['size'] = 200
-
-        total_received = 0
-        total_items = -1
-
-        while True:
-            query["from"] = total_received
-
-            results = self.search(query)
-
-            # If the total_items has not been set, then this is the first query
-            # In which case we need to store the total hits from the search
-            if total_items < 0:
-                total_items = results.count()
-
-                # If the search doesn't contain any results, return here
-                if total_items < 1:
-                    break
-
-            # If the last query doesn't contain any results, return here
-            if not len(results.docs):
-                break
-
-            total_received += len(results.docs)
-
-            # Yield the results for iteration by the callee
-            yield list(results.docs)
+        return iter_search_after(self.search, query, 'planning_date')
 
     def on_event_converted_to_recurring(self, updates, original):
         items = self.find(where={
@@ -1565,6 +1584,7 @@ planning_schema = {
     },
 
     TO_BE_CONFIRMED_FIELD: TO_BE_CONFIRMED_FIELD_SCHEMA,
+    COMBINED_ID_FIELD: COMBINED_ID_FIELD_SCHEMA,
 
     '_type': {'type': 'string', 'mapping': None},
 
@@ -1589,8 +1609,11 @@ class PlanningResource(superdesk.Resource):
     privileges = {'POST': 'planning_planning_management',
                   'PATCH': 'planning_planning_management',
                   'DELETE': 'planning'}
-    etag_ignore_fields = ['_planning_schedule', '_updates_schedule']
+    etag_ignore_fields = ['_planning_schedule', '_updates_schedule', COMBINED_ID_FIELD]
 
-    mongo_indexes = {'event_item': ([('event_item', 1)], {'background': True})}
+    mongo_indexes = {
+        'event_item': ([('event_item', 1)], {'background': True}),
+        'recurrence_id_1': ([('recurrence_id', 1)], {'background': True}),
+    }
 
     merge_nested_documents = True
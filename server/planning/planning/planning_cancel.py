@@ -10,7 +10,8 @@
 
 from superdesk import get_resource_service
 from superdesk.services import BaseService
-from superdesk.notification import push_notification
+from planning.signals import push_notification
+from planning.reference_data import get_reference_item
 from superdesk.errors import SuperdeskApiError
 from apps.archive.common import get_user, get_auth
 from eve.utils import config
@@ -56,10 +57,7 @@ class PlanningCancelService(BaseService):
     def update(self, id, updates, original):
         user = get_user(required=True).get(config.ID_FIELD, '')
         session = get_auth().get(config.ID_FIELD, '')
-        coverage_states = get_resource_service('vocabularies').find_one(
-            req=None,
-            _id='newscoveragestatus'
-        )
+        coverage_states = get_reference_item('vocabularies', 'newscoveragestatus')
 
         event_cancellation = request.view_args.get('event_cancellation')
         cancel_all_coverage = updates.pop('cancel_all_coverage', False)
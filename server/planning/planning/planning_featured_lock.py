@@ -17,7 +17,7 @@ from apps.archive.common import get_user, get_auth
 from superdesk.services import BaseService
 from superdesk.lock import lock, unlock
 from planning.item_lock import LOCK_USER, LOCK_SESSION, LOCK_TIME
-from superdesk.notification import push_notification
+from planning.signals import push_notification
 from superdesk import get_resource_service
 
 LOCK_ID = "item_lock_planning_featured"
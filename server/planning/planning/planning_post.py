@@ -13,7 +13,7 @@ from superdesk import get_resource_service, logger
 from superdesk.errors import SuperdeskApiError
 from superdesk.resource import Resource
 from superdesk.services import BaseService
-from superdesk.notification import push_notification
+from planning.signals import push_notification
 from copy import deepcopy
 import logging
 
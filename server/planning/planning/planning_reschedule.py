@@ -9,7 +9,7 @@
 # at https://www.sourcefabric.org/superdesk/license
 
 from superdesk.services import BaseService
-from superdesk.notification import push_notification
+from planning.signals import push_notification
 from apps.archive.common import get_user, get_auth
 from eve.utils import config
 from copy import deepcopy
@@ -12,7 +12,7 @@ from .planning import PlanningResource
 from planning.common import ITEM_EXPIRY, ITEM_STATE, set_item_expiry, WORKFLOW_STATE, get_coverage_type_name,\
     remove_autosave_on_spike
 from superdesk.services import BaseService
-from superdesk.notification import push_notification
+from planning.signals import push_notification
 from superdesk.errors import SuperdeskApiError
 from apps.auth import get_user, get_user_id
 from apps.archive.common import get_auth
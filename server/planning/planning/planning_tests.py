@@ -1,3 +1,5 @@
+from unittest import mock
+
 from planning.tests import TestCase
 from superdesk import get_resource_service
 from superdesk.errors import SuperdeskApiError
@@ -77,3 +79,70 @@ class DuplicateCoverageTestCase(TestCase):
                 return
 
             self.assertFalse('Failed to raise an exception')
+
+
+class GenerateRelatedAssignmentsTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        with self.app.app_context():
+            self.assignment_ids = self.app.data.insert('assignments', [{
+                'planning_item': 'plan1',
+                'coverage_item': 'cov1',
+                'priority': 2,
+                'assigned_to': {'desk': 'desk1', 'user': 'user1', 'state': 'assigned'}
+            }, {
+                'planning_item': 'plan1',
+                'coverage_item': 'cov1',
+                'scheduled_update_id': 'sched1',
+                'priority': 3,
+                'assigned_to': {'desk': 'desk2', 'state': 'assigned'}
+            }, {
+                'planning_item': 'plan2',
+                'coverage_item': 'cov2',
+                'priority': 1,
+                'assigned_to': {'desk': 'desk3', 'state': 'in_progress'}
+            }])
+
+    def test_generate_related_assignments_for_page(self):
+        with self.app.app_context():
+            docs = [{
+                '_id': 'plan1',
+                'coverages': [{
+                    'coverage_id': 'cov1',
+                    'assigned_to': {'assignment_id': str(self.assignment_ids[0])},
+                    'scheduled_updates': [{
+                        'scheduled_update_id': 'sched1',
+                        'assigned_to': {'assignment_id': str(self.assignment_ids[1])}
+                    }]
+                }, {
+                    'coverage_id': 'cov3'
+                }]
+            }, {
+                '_id': 'plan2',
+                'coverages': [{
+                    'coverage_id': 'cov2',
+                    'assigned_to': {'assignment_id': str(self.assignment_ids[2])}
+                }]
+            }, {
+                '_id': 'plan3'
+            }]
+
+            assignments_service = get_resource_service('assignments')
+            with mock.patch.object(assignments_service, 'get_from_mongo',
+                                   wraps=assignments_service.get_from_mongo) as get_from_mongo:
+                get_resource_service('planning').generate_related_assignments(docs)
+
+                # One query for coverages and one for scheduled_updates, regardless of the page size
+                self.assertEqual(get_from_mongo.call_count, 2)
+
+            coverage = docs[0]['coverages'][0]
+            self.assertEqual(coverage['assigned_to']['desk'], 'desk1')
+            self.assertEqual(coverage['assigned_to']['user'], 'user1')
+            self.assertEqual(coverage['assigned_to']['priority'], 2)
+            self.assertEqual(coverage['scheduled_updates'][0]['assigned_to']['desk'], 'desk2')
+            self.assertEqual(coverage['scheduled_updates'][0]['assigned_to']['priority'], 3)
+            self.assertEqual(docs[0]['coverages'][1]['assigned_to'], {})
+            self.assertEqual(docs[0]['coverages'][1]['scheduled_updates'], [])
+            self.assertEqual(docs[1]['coverages'][0]['assigned_to']['desk'], 'desk3')
+            self.assertEqual(docs[1]['coverages'][0]['assigned_to']['state'], 'in_progress')
+            self.assertEqual(docs[2]['coverages'], [])
@@ -23,6 +23,7 @@ from apps.templates.content_templates import get_item_from_template
 from planning.common import WORKFLOW_STATE, format_address, get_contacts_from_item, ASSIGNMENT_WORKFLOW_STATE,\
     get_first_paragraph_text
 from planning.archive import create_item_from_template
+from planning.reference_data import get_reference_item
 
 
 PLACEHOLDER_TEXT = r'{{content}}'
@@ -99,7 +100,7 @@ def group_items_by_agenda(items):
             if len(agenda_in_array) > 0:
                 agenda_in_array[0]['items'].append(item)
             else:
-                agenda = get_resource_service('agenda').find_one(req=None, _id=str(agenda_id))
+                agenda = get_reference_item('agenda', str(agenda_id))
                 if agenda is not None and agenda['is_enabled']:
                     agenda['items'] = [item]
                     agendas.append(agenda)
@@ -122,7 +123,7 @@ def group_items_by_agenda(items):
 
 def inject_internal_coverages(items):
     coverage_labels = {}
-    cv = get_resource_service('vocabularies').find_one(req=None, _id='g2_content_type')
+    cv = get_reference_item('vocabularies', 'g2_content_type')
     if cv:
         coverage_labels = {_type['qcode']: _type['name'] for _type in cv['items']}
 
@@ -136,7 +137,7 @@ def inject_internal_coverages(items):
                 if assigned_to.get('coverage_provider'):
                     user = assigned_to['coverage_provider']
                 elif assigned_to.get('user'):
-                    user = get_resource_service('users').find_one(req=None, _id=assigned_to.get('user'))
+                    user = get_reference_item('users', assigned_to.get('user'))
 
                 coverage_type = coverage.get('planning').get('g2_content_type')
                 label = coverage_labels.get(coverage_type, coverage_type)
@@ -285,7 +286,7 @@ def generate_text_item(items, template_name, resource_type):
     inject_internal_coverages(items)
 
     labels = {}
-    cv = get_resource_service('vocabularies').find_one(req=None, _id='g2_content_type')
+    cv = get_reference_item('vocabularies', 'g2_content_type')
     if cv:
         labels = {_type['qcode']: _type['name'] for _type in cv['items']}
 
@@ -16,6 +16,9 @@ from jinja2 import Template, TemplateNotFound
 from superdesk.errors import SuperdeskApiError
 from superdesk.celery_app import celery
 from planning.common import WORKFLOW_STATE, get_assignment_acceptance_email_address
+from planning.reference_data import get_reference_item, get_reference_items
+from planning.notification_digest import get_notification_digest_window, add_to_digest, get_digest, \
+    get_digest_messages, remove_sent_messages, claim_orphaned_digests
 from superdesk.emails import send_email
 from flask import current_app as app, render_template
 from flask_mail import Attachment
@@ -67,37 +70,66 @@ class PlanningNotifications():
             add_activity(ACTIVITY_UPDATE, can_push_notification=True, resource='assignments', msg=source,
                          notify=[target_user], **data)
         elif target_desk is not None:
-            desk = superdesk.get_resource_service('desks').find_one(req=None, _id=target_desk)
-            if not desk:
+            recipients = _get_desk_recipients(target_desk, target_desk2)
+            if recipients is None:
                 logger.warn('Unable to find desk {} for notification'.format(target_desk))
                 return
-            members = desk.get('members', [])
-            if target_desk2 is not None:
-                desk = superdesk.get_resource_service('desks').find_one(req=None, _id=target_desk2)
-                members = members + [x for x in desk.get('members', []) if x not in members]
-
-            for member in members:
-                if get_user() and str(member.get('user', '')) == str(get_user().get(config.ID_FIELD)):
-                    continue
+
+            # A single activity is written with all the members of the desk(s) as recipients,
+            # which is pushed to the clients in one notification
+            if recipients:
                 add_activity(ACTIVITY_UPDATE, can_push_notification=True, resource='assignments', msg=source,
-                             notify=[member.get('user')], **data)
+                             notify=recipients, **data)
+
+        digest_window = get_notification_digest_window()
 
         # determine if a Slack Bot has been configured
         if slack_client_installed and app.config.get('SLACK_BOT_TOKEN'):
-            args = {'token': app.config.get('SLACK_BOT_TOKEN'), 'target_user': target_user, 'target_desk': target_desk,
-                    'target_desk2': target_desk2, 'message': _get_slack_message_string(source, data)}
-            self._notify_slack.apply_async(kwargs=args, serializer="eve/json")
+            slack_message = _get_slack_message_string(source, data)
+            if digest_window:
+                if target_desk is None and target_user is not None:
+                    self._add_to_digest('slack_user', target_user, {'message': slack_message}, digest_window)
+                for desk_id in [target_desk, target_desk2]:
+                    if desk_id is not None:
+                        self._add_to_digest('slack_desk', desk_id, {'message': slack_message}, digest_window)
+            else:
+                args = {'token': app.config.get('SLACK_BOT_TOKEN'), 'target_user': target_user,
+                        'target_desk': target_desk, 'target_desk2': target_desk2, 'message': slack_message}
+                self._notify_slack.apply_async(kwargs=args, serializer="eve/json")
 
         # send email notification to user
         if (target_user or contact_id) and not data.get('no_email', False):
-            args = {
-                'target_user': target_user,
-                'contact_id': contact_id,
-                'source': source,
-                'meta_message': meta_message,
-                'data': data
-            }
-            self._notify_email.apply_async(kwargs=args, serializer="eve/json")
+            if digest_window:
+                self._add_to_digest(
+                    'email_contact' if contact_id else 'email_user',
+                    contact_id or target_user,
+                    {'source': source, 'meta_message': meta_message, 'data': data},
+                    digest_window
+                )
+            else:
+                args = {
+                    'target_user': target_user,
+                    'contact_id': contact_id,
+                    'source': source,
+                    'meta_message': meta_message,
+                    'data': data
+                }
+                self._notify_email.apply_async(kwargs=args, serializer="eve/json")
+
+    def _add_to_digest(self, channel, recipient, message, digest_window):
+        """
+        Add the message to the digest of the recipient, scheduling the send of a new digest
+
+        :param channel: The channel of the digest, 'slack_user', 'slack_desk', 'email_user' or 'email_contact'
+        :param recipient: The ID of the user, desk or contact
+        :param message: The message to add to the digest
+        :param digest_window: The number of seconds to wait before sending the digest
+        :return:
+        """
+        digest_id = add_to_digest(channel, recipient, message)
+        if digest_id:
+            self._notify_digest.apply_async(kwargs={'digest_id': digest_id}, countdown=digest_window,
+                                            serializer="eve/json")
 
     def user_update(self, updates, original):
         """
@@ -143,6 +175,89 @@ class PlanningNotifications():
     def _notify_email(self, target_user, contact_id, source, meta_message, data):
         _send_user_email(target_user, contact_id, source, meta_message, data)
 
+    def send_orphaned_digests(self):
+        """
+        Schedule the send of the digests that were not sent in time, i.e. their celery task was lost or the send failed
+
+        :return:
+        """
+        for digest_id in claim_orphaned_digests(get_notification_digest_window()):
+            self._notify_digest.apply_async(kwargs={'digest_id': digest_id}, serializer="eve/json")
+
+    @celery.task(bind=True)
+    def _notify_digest(self, digest_id):
+        digest = get_digest(digest_id)
+        if not digest:
+            return
+
+        messages = get_digest_messages(digest)
+        if messages:
+            _send_digest(digest.get('channel'), digest.get('recipient'), messages)
+
+        # The messages are only removed once sent, if the send fails the digest is left to be sent again
+        if remove_sent_messages(digest):
+            self.apply_async(kwargs={'digest_id': digest_id}, countdown=get_notification_digest_window(),
+                             serializer="eve/json")
+
+
+def _send_digest(channel, recipient, messages):
+    """
+    Send the messages of the digest, combined in a single Slack message or email
+
+    :param channel: The channel of the digest, 'slack_user', 'slack_desk', 'email_user' or 'email_contact'
+    :param recipient: The ID of the user, desk or contact
+    :param messages: The messages of the digest
+    :return:
+    """
+    if channel in ['slack_user', 'slack_desk']:
+        if not (slack_client_installed and app.config.get('SLACK_BOT_TOKEN')):
+            return
+
+        sc = _get_slack_client(app.config['SLACK_BOT_TOKEN'])
+        message = '\n'.join(m.get('message') for m in messages)
+        if channel == 'slack_user':
+            _send_to_slack_user(sc, recipient, message)
+        else:
+            _send_to_slack_desk_channel(sc, recipient, message)
+    elif channel == 'email_user':
+        _send_user_emails(recipient, None, messages)
+    elif channel == 'email_contact':
+        _send_user_emails(None, recipient, messages)
+
+
+def _get_desk_recipients(target_desk, target_desk2=None):
+    """
+    Get the IDs of the members of the desk(s), excluding the current user
+
+    The desks are read from the reference data cache, which is invalidated when a desk is updated
+
+    :param target_desk: The ID of the desk
+    :param target_desk2: The ID of the optional second desk
+    :return: The list of user IDs, or None if the target_desk was not found
+    """
+    desks = get_reference_items('desks', [target_desk, target_desk2])
+    if not desks.get(str(target_desk)):
+        return None
+
+    current_user = get_user()
+    current_user_id = str(current_user.get(config.ID_FIELD)) if current_user else None
+    recipients = []
+    seen = set()
+
+    for desk_id in [target_desk, target_desk2]:
+        if desk_id is None:
+            continue
+
+        for member in (desks.get(str(desk_id)) or {}).get('members') or []:
+            user_id = member.get('user')
+            if not user_id or str(user_id) in seen or str(user_id) == current_user_id:
+                continue
+
+            seen.add(str(user_id))
+            recipients.append(user_id)
+
+    return recipients
+
 
 def _get_slack_client(token):
     return SlackClient(token=token)
@@ -158,7 +273,7 @@ def _send_to_slack_desk_channel(sc, desk_id, message):
     :param data:
     :return:
     """
-    desk = superdesk.get_resource_service('desks').find_one(req=None, _id=desk_id)
+    desk = get_reference_item('desks', desk_id)
     channel_id = desk.get('slack_channel_name')
     if channel_id:
         response = sc.api_call('chat.postMessage', as_user=True, channel=channel_id,
@@ -236,15 +351,27 @@ def _send_user_email(user_id, contact_id, source, meta_message, data):
     :param html_message:
     :return:
     """
+    _send_user_emails(user_id, contact_id, [{'source': source, 'meta_message': meta_message, 'data': data}])
+
+
+def _send_user_emails(user_id, contact_id, messages):
+    """
+    Send the notifications to the user email, combined in a single email
+
+    :param user_id:
+    :param contact_id:
+    :param messages: List of the source, meta_message and data of each notification
+    :return:
+    """
     email_address = None
 
     if contact_id:
         contact = superdesk.get_resource_service('contacts').find_one(req=None, _id=contact_id)
         email_address = next(iter(contact.get('contact_email') or []), None)
-        data['recepient'] = contact
+        recepient = contact
     elif user_id:
-        user = superdesk.get_resource_service('users').find_one(req=None, _id=user_id)
-        data['recepient'] = user
+        user = get_reference_item('users', user_id)
+        recepient = user
         if not user:
             return
 
@@ -261,12 +388,39 @@ def _send_user_email(user_id, contact_id, source, meta_message, data):
         return
 
     admins = app.config['ADMINS']
+    html_messages = []
+    text_messages = []
+    attachments = []
+
+    for message in messages:
+        data = message['data']
+        data['recepient'] = recepient
+        data['subject'] = 'Superdesk assignment' + ': {}'.format(data.get('slugline') if data.get('slugline') else '')
+        data['system_reciepient'] = get_assignment_acceptance_email_address()
+        html_messages.append(_get_email_message_html(message['source'], message['meta_message'], data))
+        text_messages.append(_get_email_message_string(message['source'], message['meta_message'], data))
+        attachments.extend(_get_email_attachments(data))
+
+    if len(messages) == 1:
+        subject = messages[0]['data']['subject']
+    else:
+        subject = 'Superdesk assignments: {} updates'.format(len(messages))
+
+    send_email(subject=subject,
+               sender=admins[0],
+               recipients=[email_address],
+               text_body='\n\n----------\n\n'.join(text_messages),
+               html_body='<hr>'.join(html_messages),
+               attachments=attachments)
 
-    data['subject'] = 'Superdesk assignment' + ': {}'.format(data.get('slugline') if data.get('slugline') else '')
-    data['system_reciepient'] = get_assignment_acceptance_email_address()
-    html_message = _get_email_message_html(source, meta_message, data)
-    text_message = _get_email_message_string(source, meta_message, data)
 
+def _get_email_attachments(data):
+    """
+    Get the files attached to the event and assignment of the notification
+
+    :param data:
+    :return: The list of attachments
+    """
     # Determine if there are any files attached to the event and send them as attachments
     attachments = []
     if data.get('event') and data.get('event', {}).get('files'):
@@ -299,12 +453,7 @@ def _send_user_email(user_id, contact_id, source, meta_message, data):
                                                                                   data['assignment'][
                                                                                       'assignment_id']))
 
-    send_email(subject=data['subject'],
-               sender=admins[0],
-               recipients=[email_address],
-               text_body=text_message,
-               html_body=html_message,
-               attachments=attachments)
+    return attachments
 
 
 def _send_to_slack_user(sc, user_id, message):
@@ -316,7 +465,7 @@ def _send_to_slack_user(sc, user_id, message):
     :param message:
     :return:
     """
-    user = superdesk.get_resource_service('users').find_one(req=None, _id=user_id)
+    user = get_reference_item('users', user_id)
     if not user:
         return
     # Check if the user has enabled Slack notifications
@@ -60,3 +60,56 @@ class NotificationTests(TestCase):
                                                   target_desk2=None, message='hello user from world by Unknown')
         except Exception:
             self.assertTrue(False)
+
+    @mock.patch('planning.planning_notifications.get_user', return_value={'_id': 'current_user'})
+    @mock.patch('planning.planning_notifications.add_activity')
+    def test_desk_activity_is_written_once(self, add_activity, get_user):
+        with self.app.app_context():
+            user_ids = self.app.data.insert('users', [{'username': 'user{}'.format(i)} for i in range(3)])
+            desk_ids = self.app.data.insert('desks', [
+                {'name': 'politics', 'members': [{'user': user_ids[0]}, {'user': user_ids[1]}]},
+                {'name': 'finance', 'members': [
+                    {'user': user_ids[1]}, {'user': user_ids[2]}, {'user': 'current_user'}
+                ]},
+            ])
+
+            PlanningNotifications().notify_assignment(target_desk=desk_ids[0], target_desk2=desk_ids[1],
+                                                      message='assignment_to_desk_msg', no_email=True)
+
+            # A single activity is added with the members of both desks, excluding the current user
+            self.assertEqual(add_activity.call_count, 1)
+            self.assertEqual(add_activity.call_args[1]['notify'], user_ids)
+
+    @mock.patch('planning.planning_notifications._send_to_slack_user')
+    @mock.patch('planning.planning_notifications._get_slack_client', return_value=MockSlack())
+    @mock.patch('planning.planning_notifications.slack_client_installed', True)
+    def test_slack_notifications_digest(self, sc, send_to_slack_user):
+        self.app.config['SLACK_BOT_TOKEN'] = 'hdskjgdsjg'
+        self.app.config['PLANNING_NOTIFICATION_DIGEST_WINDOW'] = 60
+        notifications = PlanningNotifications()
+
+        with self.app.app_context():
+            with mock.patch.object(PlanningNotifications._notify_digest, 'apply_async') as notify_digest:
+                for slugline in ['Vote', 'Count']:
+                    notifications.notify_assignment(target_user=self.user_ids[0],
+                                                    message='assignment_internal_note_msg', coverage_type='Text',
+                                                    slugline=slugline, internal_note='note', omit_user=True,
+                                                    no_email=True)
+
+                # The digest is only scheduled once, when the first notification is added
+                self.assertEqual(notify_digest.call_count, 1)
+                self.assertEqual(notify_digest.call_args[1]['countdown'], 60)
+
+            digest_id = notify_digest.call_args[1]['kwargs']['digest_id']
+            notifications._notify_digest(digest_id)
+
+            # A single message is sent with both notifications
+            send_to_slack_user.assert_called_once_with(
+                sc.return_value,
+                self.user_ids[0],
+                'Text coverage "Vote" internal note: "note"\nText coverage "Count" internal note: "note"'
+            )
+
+            # The digest is only sent once
+            notifications._notify_digest(digest_id)
+            self.assertEqual(send_to_slack_user.call_count, 1)
@@ -0,0 +1,177 @@
+# -*- coding: utf-8; -*-
+#
+# This file is part of Superdesk.
+#
+#  Copyright 2021 Sourcefabric z.u. and contributors.
+#
+# For the full copyright and license information, please see the
+# AUTHORS and LICENSE files distributed with this source code, or
+# at https://www.sourcefabric.org/superdesk/license
+
+"""Process level cache of the reference data used by the Planning services
+
+Vocabularies, agendas, desks and users are small documents that are read on most requests.
+Cached documents are invalidated when they are updated or deleted in this process (using the Eve hooks
+and the ``agenda:*`` push notifications), and expire after ``PLANNING_REFERENCE_DATA_CACHE_TTL`` seconds
+for changes made by other processes.
+"""
+
+from typing import Dict, Any, List, Optional
+import time
+from copy import deepcopy
+from threading import Lock
+
+from bson import ObjectId
+from flask import current_app as app
+from eve.utils import config
+
+from superdesk import get_resource_service
+
+from planning.signals import notification_pushed
+
+#: The resources that can be retrieved using the cache
+REFERENCE_RESOURCES = ('vocabularies', 'agenda', 'desks', 'users')
+
+
+def get_reference_data_cache_ttl(current_app=None):
+    return int((current_app or app).config.get('PLANNING_REFERENCE_DATA_CACHE_TTL', 300))
+
+
+def _find_items(resource: str, ids: List[Any]):
+    # ``vocabularies`` use string ids, the other resources use ObjectIds
+    if resource != 'vocabularies':
+        ids = [ObjectId(_id) if isinstance(_id, str) and ObjectId.is_valid(_id) else _id for _id in ids]
+
+    return get_resource_service(resource).find(where={config.ID_FIELD: {'$in': ids}})
+
+
+class ReferenceDataCache:
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self.items = {}
+        self.lock = Lock()
+        self.hits = {resource: 0 for resource in REFERENCE_RESOURCES}
+        self.misses = {resource: 0 for resource in REFERENCE_RESOURCES}
+
+    def get_items(self, resource: str, ids: List[Any]) -> Dict[str, Dict[str, Any]]:
+        """Returns copies of the documents by their ``_id`` (as a string), missing documents are not included"""
+        now = time.monotonic()
+        items = {}
+        missing = []
+
+        with self.lock:
+            for _id in set(ids):
+                key = (resource, str(_id))
+                entry = self.items.get(key)
+                if entry is not None and entry[0] > now:
+                    items[key[1]] = entry[1]
+                else:
+                    missing.append(_id)
+
+            self.hits[resource] += len(items)
+            self.misses[resource] += len(missing)
+
+        if missing:
+            expiry = time.monotonic() + self.ttl
+            docs = _find_items(resource, missing)
+
+            with self.lock:
+                for doc in docs:
+                    key = (resource, str(doc[config.ID_FIELD]))
+                    self.items[key] = (expiry, doc)
+                    items[key[1]] = doc
+
+        return {_id: deepcopy(doc) for _id, doc in items.items()}
+
+    def invalidate(self, resource: str, _id=None):
+        with self.lock:
+            if _id is not None:
+                self.items.pop((resource, str(_id)), None)
+            else:
+                for key in [key for key in self.items.keys() if key[0] == resource]:
+                    self.items.pop(key, None)
+
+    def get_metrics(self) -> Dict[str, Dict[str, Any]]:
+        metrics = {}
+        for resource in REFERENCE_RESOURCES:
+            requests = self.hits[resource] + self.misses[resource]
+            metrics[resource] = {
+                'hits': self.hits[resource],
+                'misses': self.misses[resource],
+                'hit_rate': self.hits[resource] / requests if requests else 0.0,
+            }
+
+        return metrics
+
+
+def get_reference_data_cache() -> Optional[ReferenceDataCache]:
+    """Returns the cache for the current app, or None if it is disabled"""
+    ttl = get_reference_data_cache_ttl()
+    if ttl <= 0:
+        return None
+
+    if 'planning_reference_data_cache' not in app.extensions:
+        app.extensions['planning_reference_data_cache'] = ReferenceDataCache(ttl)
+
+    return app.extensions['planning_reference_data_cache']
+
+
+def get_reference_items(resource: str, ids: List[Any]) -> Dict[str, Dict[str, Any]]:
+    """Get the ``vocabularies``, ``agenda``, ``desks`` or ``users`` documents by their ``_id``
+
+    :param str resource: The name of the resource
+    :param list ids: List of document ids
+    :return dict: Dictionary of the ``_id`` (as a string) to a copy of the document
+    """
+    ids = [_id for _id in ids if _id]
+    if not ids:
+        return {}
+
+    reference_cache = get_reference_data_cache()
+    if reference_cache is not None:
+        return reference_cache.get_items(resource, ids)
+
+    return {str(doc[config.ID_FIELD]): doc for doc in _find_items(resource, ids)}
+
+
+def get_reference_item(resource: str, _id) -> Optional[Dict[str, Any]]:
+    """Get a ``vocabularies``, ``agenda``, ``desks`` or ``users`` document by its ``_id``"""
+    if not _id:
+        return None
+
+    reference_cache = get_reference_data_cache()
+    if reference_cache is None:
+        return get_resource_service(resource).find_one(req=None, _id=_id)
+
+    return reference_cache.get_items(resource, [_id]).get(str(_id))
+
+
+def invalidate_reference_item(resource: str, _id=None):
+    reference_cache = app.extensions.get('planning_reference_data_cache')
+    if reference_cache is not None:
+        reference_cache.invalidate(resource, _id)
+
+
+def on_notification_pushed(name, extra=None, **kwargs):
+    if name.startswith('agenda:'):
+        invalidate_reference_item('agenda', (extra or {}).get('item'))
+
+
+def init_app(app):
+    for resource in REFERENCE_RESOURCES:
+        def on_updated(updates, original, resource=resource):
+            invalidate_reference_item(resource, original.get(config.ID_FIELD))
+
+        def on_deleted(doc, resource=resource):
+            invalidate_reference_item(resource, doc.get(config.ID_FIELD))
+
+        on_updated_event = getattr(app, 'on_updated_{}'.format(resource))
+        on_updated_event += on_updated
+
+        on_replaced_event = getattr(app, 'on_replaced_{}'.format(resource))
+        on_replaced_event += on_updated
+
+        on_deleted_event = getattr(app, 'on_deleted_item_{}'.format(resource))
+        on_deleted_event += on_deleted
+
+    notification_pushed.connect(on_notification_pushed)
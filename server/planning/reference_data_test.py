@@ -0,0 +1,64 @@
+from bson import ObjectId
+
+from planning.tests import TestCase
+from planning.signals import push_notification
+from planning.reference_data import get_reference_data_cache, get_reference_item, get_reference_items
+
+
+class ReferenceDataCacheTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.app.extensions.pop('planning_reference_data_cache', None)
+        self.desk_id = ObjectId()
+        self.agenda_id = ObjectId()
+
+        with self.app.app_context():
+            self.app.data.insert('vocabularies', [{
+                '_id': 'g2_content_type',
+                'items': [{'qcode': 'text', 'name': 'Text'}],
+            }])
+            self.app.data.insert('desks', [{'_id': self.desk_id, 'name': 'Sports'}])
+            self.app.data.insert('agenda', [{'_id': self.agenda_id, 'name': 'Sports', 'is_enabled': True}])
+
+    def test_get_reference_items(self):
+        with self.app.app_context():
+            cache = get_reference_data_cache()
+
+            self.assertEqual(get_reference_item('vocabularies', 'g2_content_type')['items'][0]['name'], 'Text')
+            self.assertEqual(get_reference_item('vocabularies', 'g2_content_type')['items'][0]['name'], 'Text')
+            self.assertEqual(cache.get_metrics()['vocabularies'], {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+            # String ids are converted to ObjectIds
+            self.assertEqual(get_reference_item('desks', str(self.desk_id))['name'], 'Sports')
+            self.assertEqual(get_reference_item('desks', self.desk_id)['name'], 'Sports')
+            self.assertEqual(cache.get_metrics()['desks'], {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+            items = get_reference_items('desks', [self.desk_id, ObjectId(), None])
+            self.assertEqual(list(items.keys()), [str(self.desk_id)])
+            self.assertIsNone(get_reference_item('desks', None))
+
+            # Callers get copies of the cached documents
+            get_reference_item('desks', self.desk_id)['name'] = 'Finance'
+            self.assertEqual(get_reference_item('desks', self.desk_id)['name'], 'Sports')
+
+    def test_invalidate_reference_items(self):
+        with self.app.app_context():
+            desk = get_reference_item('desks', self.desk_id)
+            self.app.data.update('desks', self.desk_id, {'name': 'Finance'}, desk)
+            self.assertEqual(get_reference_item('desks', self.desk_id)['name'], 'Sports')
+
+            self.app.on_updated_desks({'name': 'Finance'}, desk)
+            self.assertEqual(get_reference_item('desks', self.desk_id)['name'], 'Finance')
+
+            agenda = get_reference_item('agenda', self.agenda_id)
+            self.app.data.update('agenda', self.agenda_id, {'is_enabled': False}, agenda)
+            push_notification('agenda:updated', item=str(self.agenda_id), user='user1')
+            self.assertFalse(get_reference_item('agenda', self.agenda_id)['is_enabled'])
+
+    def test_disabled(self):
+        self.app.config['PLANNING_REFERENCE_DATA_CACHE_TTL'] = 0
+
+        with self.app.app_context():
+            self.assertIsNone(get_reference_data_cache())
+            self.assertEqual(get_reference_item('desks', self.desk_id)['name'], 'Sports')
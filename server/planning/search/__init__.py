@@ -13,6 +13,8 @@ from flask_babel import lazy_gettext
 from .planning_search import PlanningSearchResource, PlanningSearchService
 from .eventsplanning_search import EventsPlanningResource, EventsPlanningService
 from .eventsplanning_filters import EventPlanningFiltersResource, EventPlanningFiltersService
+from .result_cache import on_notification_pushed
+from planning.signals import notification_pushed
 
 
 def init_app(app):
@@ -31,6 +33,8 @@ def init_app(app):
                                 EventPlanningFiltersService,
                                 _app=app)
 
+    notification_pushed.connect(on_notification_pushed)
+
     superdesk.privilege(
         name='planning_eventsplanning_filters_management',
         label=lazy_gettext('Planning - Events & Planning View Filters Management'),
@@ -19,12 +19,13 @@ import logging
 from eve.utils import config
 
 from superdesk import Resource, Service
-from superdesk.notification import push_notification
+from planning.signals import push_notification
 
 from apps.auth import get_user_id
 
 from planning.common import set_original_creator, SPIKED_STATE
 from planning.search.queries.elastic import DATE_RANGE
+from planning.search.query_cache import get_search_query_cache
 
 
 logger = logging.getLogger(__name__)
@@ -311,17 +312,24 @@ class EventPlanningFiltersService(Service):
             updates['version_creator'] = user_id
 
     def on_updated(self, updates, original):
+        self._invalidate_search_query_cache(original.get(config.ID_FIELD))
         self._push_notification(
             original.get(config.ID_FIELD),
             'event_planning_filters:updated'
         )
 
     def on_deleted(self, doc):
+        self._invalidate_search_query_cache(doc.get(config.ID_FIELD))
         self._push_notification(
             doc.get(config.ID_FIELD),
             'event_planning_filters:deleted'
         )
 
+    def _invalidate_search_query_cache(self, filter_id):
+        query_cache = get_search_query_cache()
+        if query_cache is not None:
+            query_cache.invalidate_filter(filter_id)
+
     def set_schedule(self, updates):
         if not len(updates.get('schedules') or []):
             return
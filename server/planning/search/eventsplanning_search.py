@@ -18,19 +18,22 @@ from copy import deepcopy
 
 from werkzeug.datastructures import MultiDict, ImmutableMultiDict
 from eve.utils import ParsedRequest
-from flask import current_app as app
+from flask import current_app as app, request
 
 from superdesk import Resource, Service, get_resource_service
 from superdesk.resource import build_custom_hateoas
 from superdesk.errors import SuperdeskApiError
 
+from planning.common import COMBINED_ID_FIELD, planning_combined_search_collapse
 from planning.planning.planning import planning_schema
 from planning.events.events_schema import events_schema
 
 from .queries.planning import PLANNING_PARAMS, PLANNING_SEARCH_FILTERS
 from .queries.events import EVENT_PARAMS, EVENT_SEARCH_FILTERS
 from .queries.combined import COMBINED_PARAMS, COMBINED_SEARCH_FILTERS, construct_combined_view_data_query
-from .queries.common import construct_search_query
+from .queries.common import construct_search_query, strtobool
+from .query_cache import get_search_query_cache
+from .planning_search import SUMMARY_LIST_MODE, get_summary_fields
 
 
 logger = logging.getLogger(__name__)
@@ -64,6 +67,9 @@ class EventsPlanningService(Service):
             return self._search_events(req, params, query, search_filter)
         elif repo == 'planning':
             return self._search_planning(req, params, query, search_filter)
+        elif planning_combined_search_collapse() and \
+                not strtobool(params.get('include_associated_planning', False)):
+            return self._search_combined(req, params, query, search_filter)
         else:
             items = self._get_events_and_planning(req, query, search_filter)
             return self._get_combined_view_data(items, req, params, search_filter)
@@ -76,6 +82,10 @@ class EventsPlanningService(Service):
         :type doc: dict
         """
 
+        # The compact list rows don't include the links
+        if request.args.get('list_mode') == SUMMARY_LIST_MODE:
+            return
+
         docs = doc[app.config['ITEMS']]
         for item in docs:
             build_custom_hateoas(
@@ -93,7 +103,12 @@ class EventsPlanningService(Service):
         if not filter_id or filter_id == 'ALL_EVENTS_PLANNING':
             return {'params': {}}
 
-        search_filter = get_resource_service('events_planning_filters').find_one(req=None, _id=filter_id)
+        query_cache = get_search_query_cache()
+        if query_cache is not None:
+            search_filter = query_cache.get_filter(filter_id)
+        else:
+            search_filter = get_resource_service('events_planning_filters').find_one(req=None, _id=filter_id)
+
         if not search_filter:
             logger.warning(f'Event filter {filter_id} not found')
             return {'params': {}}
@@ -122,11 +137,26 @@ class EventsPlanningService(Service):
         else:
             filters = COMBINED_SEARCH_FILTERS
 
-        return construct_search_query(
-            filters,
-            params,
-            search_filter
-        )
+        query_cache = get_search_query_cache()
+        if query_cache is None:
+            return construct_search_query(filters, params, search_filter)
+
+        key = query_cache.get_key(repo, params, search_filter)
+        query = query_cache.get_query(key, params)
+        if query is not None:
+            return query
+
+        # Keep track of the params changed while constructing the query (i.e. ``exclude_dates``)
+        # so they can be applied to the params on a cache hit
+        original_params = dict(params.items())
+        query = construct_search_query(filters, params, search_filter)
+        query_cache.set_query(key, query, {
+            param: value
+            for param, value in params.items()
+            if param not in original_params or original_params[param] != value
+        })
+
+        return query
 
     def _get_combined_view_data(self, items, request, params, search_filter):
         """Get list of event and planning for the combined view
@@ -149,6 +179,7 @@ class EventsPlanningService(Service):
         req.max_results = page_size
         if params.get('projections'):
             req.args['projections'] = params['projections']
+        self._set_list_mode(req, params)
         return get_resource_service('planning_search').get(req=req, lookup=None)
 
     def _get_events_and_planning(self, request, query, search_filter):
@@ -173,6 +204,100 @@ class EventsPlanningService(Service):
         req.exec_on_fetched_resource = False  # don't call on_fetched_resource
         return get_resource_service('planning_search').get(req=req, lookup=None)
 
+    def _search_combined(self, request, params, query, search_filter):
+        """Get list of event and planning for the combined view using a single search
+
+        Items are collapsed on their ``_combined_id``, so a Planning item linked to an Event
+        is grouped with that Event, and each page contains exactly one item per group.
+        If a group's top hit is a Planning item, it is replaced with its Event, unless the Event doesn't match
+        the date filters.
+
+        :param request: object representing the HTTP request
+        """
+        page = request.page or 1
+        page_size = self._get_page_size(request, search_filter)
+        req = ParsedRequest()
+        req.args = MultiDict()
+        req.args['source'] = json.dumps({
+            'query': query['query'],
+            'sort': query['sort'] if query.get('sort') else self._get_sort(),
+            'collapse': {'field': COMBINED_ID_FIELD},
+            'aggs': {
+                COMBINED_ID_FIELD: {
+                    'cardinality': {
+                        'field': COMBINED_ID_FIELD,
+                        'precision_threshold': 40000,
+                    }
+                }
+            },
+            'size': page_size,
+            'from': (page - 1) * page_size
+        })
+        req.page = page
+        req.max_results = page_size
+        req.exec_on_fetched_resource = False
+        if params.get('projections'):
+            # ``event_item`` is required to replace Planning items with their Event
+            req.args['projections'] = json.dumps(list(set(json.loads(params['projections']) + ['event_item'])))
+        self._set_list_mode(req, params)
+
+        planning_search_service = get_resource_service('planning_search')
+        docs = planning_search_service.get(req=req, lookup=None)
+
+        # Replace the Planning items with their Event, using a single query for the page
+        planning_items = [doc for doc in docs if doc['type'] == 'planning' and doc.get('event_item')]
+        if planning_items:
+            events = {
+                event['_id']: event
+                for event in self._get_combined_view_events(planning_items, req.args.get('projections'),
+                                                            params, search_filter)
+            }
+            # The Planning item is kept if its Event is not returned (i.e. the Event is outside the date filter),
+            # so the page is not short of an item
+            docs.docs = [
+                doc if doc['type'] != 'planning' or not doc.get('event_item') else events.get(doc['event_item'], doc)
+                for doc in docs
+            ]
+
+        # The total is the number of groups, not the number of matching items
+        # As the ``cardinality`` aggregation is approximate, the total is not reported as exact
+        total = docs.hits.get('aggregations', {}).pop(COMBINED_ID_FIELD, {}).get('value', 0)
+        if isinstance(docs.hits['hits'].get('total'), dict):
+            docs.hits['hits']['total'] = {'value': total, 'relation': 'gte'}
+        else:
+            docs.hits['hits']['total'] = total
+
+        if planning_search_service.is_summary(req):
+            planning_search_service.on_fetched_summary_docs(
+                docs,
+                ','.join(json.loads(req.args['projections'])) if req.args.get('projections')
+                else get_summary_fields(planning_search_service.repos)
+            )
+        else:
+            planning_search_service.on_fetched_docs(docs, planning_search_service.repos)
+        return docs
+
+    def _get_combined_view_events(self, planning_items, projections, params, search_filter):
+        """Get the Events linked to the Planning items, that match the date filters"""
+        query = construct_combined_view_data_query(params, search_filter, planning_items)
+        req = ParsedRequest()
+        req.args = MultiDict()
+        req.args['source'] = json.dumps({
+            'query': query['query'],
+            'size': len(planning_items)
+        })
+        req.args['repo'] = 'events'
+        req.max_results = len(planning_items)
+        req.exec_on_fetched_resource = False
+        if projections:
+            req.args['projections'] = projections
+        self._set_list_mode(req, params)
+        return get_resource_service('planning_search').get(req=req, lookup=None)
+
+    def _set_list_mode(self, req, params):
+        if params.get('list_mode'):
+            req.args['list_mode'] = params['list_mode']
+
     def _search_events(self, request, params, query, search_filter):
         page = request.page or 1
         page_size = self._get_page_size(request, search_filter)
@@ -189,6 +314,7 @@ class EventsPlanningService(Service):
         req.max_results = page_size
         if params.get('projections'):
             req.args['projections'] = params['projections']
+        self._set_list_mode(req, params)
         return get_resource_service('planning_search').get(req=req, lookup=None)
 
     def _search_planning(self, request, params, query, search_filter):
@@ -209,6 +335,7 @@ class EventsPlanningService(Service):
         req.max_results = page_size
         if params.get('projections'):
             req.args['projections'] = params['projections']
+        self._set_list_mode(req, params)
         return get_resource_service('planning_search').get(req=req, lookup=None)
 
     def _get_whitelist(self, repo):
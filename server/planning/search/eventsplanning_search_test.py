@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta
+
+from superdesk import get_resource_service
+from superdesk.utc import utcnow
+
+from planning.tests import TestCase
+from planning.common import COMBINED_ID_FIELD
+
+
+class EventsPlanningSearchTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+
+        start = utcnow() + timedelta(days=1)
+        with self.app.app_context():
+            self.app.data.insert('events', [{
+                '_id': 'event{}'.format(i),
+                'guid': 'event{}'.format(i),
+                'type': 'event',
+                'name': 'Event {}'.format(i),
+                'state': 'draft',
+                'dates': {'start': start + timedelta(hours=i), 'end': start + timedelta(hours=i + 1)},
+                '_planning_schedule': [{'scheduled': start + timedelta(hours=i)}],
+                COMBINED_ID_FIELD: 'event{}'.format(i),
+            } for i in range(3)])
+
+            self.app.data.insert('planning', [{
+                '_id': 'plan{}'.format(i),
+                'guid': 'plan{}'.format(i),
+                'type': 'planning',
+                'slugline': 'Plan {}'.format(i),
+                'state': 'draft',
+                'event_item': 'event0' if i < 2 else None,
+                'planning_date': start,
+                '_planning_schedule': [{'scheduled': start + timedelta(minutes=30)}],
+                COMBINED_ID_FIELD: 'event0' if i < 2 else 'plan{}'.format(i),
+            } for i in range(3)])
+
+    def test_combined_search_collapses_planning_onto_event(self):
+        self.app.config['PLANNING_COMBINED_SEARCH_COLLAPSE'] = True
+
+        with self.app.test_request_context():
+            service = get_resource_service('events_planning_search')
+            docs = service.search_repos('combined', {}, page=1, page_size=2)
+            self.assertEqual(docs.count(), 4)
+            self.assertEqual([doc['_id'] for doc in docs], ['event0', 'plan2'])
+
+            docs = service.search_repos('combined', {}, page=2, page_size=2)
+            self.assertEqual([doc['_id'] for doc in docs], ['event1', 'event2'])
+
+            # Planning items matching the search are replaced with their Event
+            docs = service.search_repos('combined', {'slugline': 'Plan'}, page=1, page_size=10)
+            self.assertEqual(sorted(doc['_id'] for doc in docs), ['event0', 'plan2'])
+
+    def test_summary_list_mode(self):
+        with self.app.test_request_context():
+            location = [{'name': 'Opera House', 'address': {'line': ['Bennelong Point'], 'locality': 'Sydney'}}]
+            self.app.data.update('events', 'event0', {'location': location}, {'_id': 'event0'})
+            service = get_resource_service('events_planning_search')
+
+            docs = list(service.search_repos('events', {'list_mode': 'summary'}))
+            self.assertEqual([doc['_id'] for doc in docs], ['event0', 'event1', 'event2'])
+            self.assertEqual(sorted(docs[0]['planning_ids']), ['plan0', 'plan1'])
+            self.assertNotIn('planning_ids', docs[1])
+            self.assertNotIn('_planning_schedule', docs[0])
+            self.assertNotIn(COMBINED_ID_FIELD, docs[0])
+            self.assertIsInstance(docs[0]['dates']['start'], datetime)
+            self.assertEqual(docs[0]['location'][0]['formatted_address'], 'Bennelong Point Sydney')
+
+            docs = list(service.search_repos('planning', {'list_mode': 'summary'}))
+            self.assertEqual(len(docs), 3)
+            for doc in docs:
+                self.assertNotIn('coverages', doc)
+                self.assertNotIn('_planning_schedule', doc)
+                self.assertEqual(doc['slugline'], 'Plan {}'.format(doc['_id'][-1]))
+
+    def test_combined_search_includes_ingested_events(self):
+        self.app.config['PLANNING_COMBINED_SEARCH_COLLAPSE'] = True
+        start = utcnow() + timedelta(days=2)
+
+        with self.app.test_request_context():
+            events_service = get_resource_service('events')
+            ids = events_service.post_in_mongo([{
+                'guid': 'ingested1',
+                'type': 'event',
+                'name': 'Ingested Event',
+                'state': 'ingested',
+                'dates': {'start': start, 'end': start + timedelta(hours=1)},
+            }])
+            self.assertEqual(ids, ['ingested1'])
+
+            event = events_service.find_one(req=None, _id='ingested1')
+            self.assertEqual(event[COMBINED_ID_FIELD], 'ingested1')
+
+            # Index the ingested Event, as done once the ingest has completed
+            self.app.data._search_backend('events').insert('events', [event])
+
+            service = get_resource_service('events_planning_search')
+            docs = service.search_repos('combined', {}, page=1, page_size=10)
+            self.assertEqual(docs.count(), 5)
+            self.assertIn('ingested1', [doc['_id'] for doc in docs])
+
+    def test_combined_search_keeps_planning_without_event(self):
+        self.app.config['PLANNING_COMBINED_SEARCH_COLLAPSE'] = True
+        start = utcnow() + timedelta(days=1)
+
+        with self.app.test_request_context():
+            # The Event of the Planning item is not returned by the search
+            self.app.data.insert('planning', [{
+                '_id': 'plan3',
+                'guid': 'plan3',
+                'type': 'planning',
+                'slugline': 'Plan 3',
+                'state': 'draft',
+                'event_item': 'event9',
+                'planning_date': start,
+                '_planning_schedule': [{'scheduled': start + timedelta(hours=5)}],
+                COMBINED_ID_FIELD: 'event9',
+            }])
+
+            service = get_resource_service('events_planning_search')
+            docs = service.search_repos('combined', {}, page=1, page_size=5)
+            self.assertEqual(docs.count(), 5)
+            self.assertEqual(sorted(doc['_id'] for doc in docs), ['event0', 'event1', 'event2', 'plan2', 'plan3'])
@@ -10,23 +10,108 @@
 
 """Superdesk Planning Search."""
 import logging
-from flask import json, current_app as app
-from eve_elastic.elastic import parse_date, get_dates
+from typing import Optional, List
+from datetime import datetime
+from flask import json, current_app as app, request, has_request_context
+from eve.utils import config
+from eve_elastic.elastic import parse_date, get_dates, ElasticCursor
 from copy import deepcopy
 
 import superdesk
+from superdesk import get_resource_service
 from superdesk.metadata.utils import item_url
+from superdesk.utc import utc
 
 from planning.planning.planning import planning_schema
 from planning.events.events_schema import events_schema
+from .result_cache import get_search_results_cache
 
 logger = logging.getLogger(__name__)
 
+# Nested date fields that are not included in the Eve schema date fields
+NESTED_DATE_FIELDS = {
+    'events': [
+        ('dates', 'start'),
+        ('dates', 'end'),
+        ('dates', 'recurring_rule', 'until'),
+    ],
+}
+
+
+#: ``list_mode`` used to return compact rows for the list views
+SUMMARY_LIST_MODE = 'summary'
+
+# Default projections used for each repo when ``list_mode=summary``
+SUMMARY_FIELDS = {
+    'events': [
+        '_id', '_etag', 'type', 'guid', 'name', 'slugline', 'dates', 'state', 'pubstatus', 'occur_status',
+        'recurrence_id', 'calendars', 'location', 'planning_ids',
+        'lock_user', 'lock_session', 'lock_action', 'lock_time',
+    ],
+    'planning': [
+        '_id', '_etag', 'type', 'guid', 'slugline', 'headline', 'planning_date', 'state', 'pubstatus',
+        'agendas', 'event_item', 'recurrence_id', 'featured',
+        'lock_user', 'lock_session', 'lock_action', 'lock_time',
+        'coverages.coverage_id', 'coverages.workflow_status', 'coverages.news_coverage_status',
+        'coverages.assigned_to', 'coverages.planning.g2_content_type', 'coverages.planning.scheduled',
+    ],
+}
+
+
+def get_summary_fields(types: List[str]) -> str:
+    """Get the default projections for ``list_mode=summary`` of the provided repos"""
+    fields = []
+    for repo in types:
+        fields.extend(field for field in SUMMARY_FIELDS.get(repo) or [] if field not in fields)
+
+    return ','.join(fields)
+
+
+def compact_doc(value):
+    """Remove empty values from the doc, used for the ``list_mode=summary`` rows"""
+    if isinstance(value, dict):
+        return {
+            key: compact_doc(item)
+            for key, item in value.items()
+            if item is not None and item != '' and item != [] and item != {}
+        }
+    elif isinstance(value, list):
+        return [compact_doc(item) for item in value]
+
+    return value
+
+
+def parse_iso_date(value: str) -> Optional[datetime]:
+    """Parse an Elastic date string
+
+    Uses a fast path for the format dates are indexed with (i.e. ``2021-04-01T10:00:00+0000``),
+    falling back to ``parse_date`` for all other formats.
+    """
+    if len(value) == 24 and value[10] == 'T' and value[19:] == '+0000':
+        try:
+            return datetime(
+                int(value[0:4]),
+                int(value[5:7]),
+                int(value[8:10]),
+                int(value[11:13]),
+                int(value[14:16]),
+                int(value[17:19]),
+                tzinfo=utc
+            )
+        except ValueError:
+            pass
+
+    return parse_date(value)
+
 
 class PlanningSearchService(superdesk.Service):
 
     repos = ['events', 'planning']
 
+    def __init__(self, datasource=None, backend=None):
+        super().__init__(datasource=datasource, backend=backend)
+        self._date_fields = {}
+
     @property
     def elastic(self):
         return app.data.elastic
@@ -48,11 +133,19 @@ class PlanningSearchService(superdesk.Service):
             repos = repos.split(',')
             return [repo for repo in repos if repo in self.repos]
 
+    def is_summary(self, req) -> bool:
+        """Returns True if the request is for the compact list rows (``list_mode=summary``)"""
+        return (getattr(req, 'args', None) or {}).get('list_mode') == SUMMARY_LIST_MODE
+
     def get(self, req, lookup):
         """Run the query against events and planning indexes"""
         query = self._get_query(req)
         types = self._get_types(req)
         fields = self._get_projected_fields(req)
+        summary = self.is_summary(req)
+
+        if summary and not fields:
+            fields = get_summary_fields(types)
 
         params = {}
         if fields:
@@ -62,8 +155,8 @@ class PlanningSearchService(superdesk.Service):
 
             params['_source'] = fields
 
-        docs = self.elastic.search(query, types, params)
-        self._format_docs(docs)
+        docs = self._search(query, types, params)
+        self._format_docs(docs, fields)
 
         # to avoid call on_fetched_resource callback from some internal resource
         on_fetched_resource = True
@@ -73,48 +166,128 @@ class PlanningSearchService(superdesk.Service):
             pass
 
         if on_fetched_resource:
-            for resource in types:
-                response = {
-                    app.config['ITEMS']: [
-                        doc
-                        for doc in docs
-                        if doc['type'] == resource or (resource == 'events' and doc['type'] == 'event')
-                    ]
-                }
-                getattr(app, 'on_fetched_resource')(resource, response)
-                getattr(app, 'on_fetched_resource_%s' % resource)(response)
+            if summary:
+                self.on_fetched_summary_docs(docs, fields)
+            else:
+                self.on_fetched_docs(docs, types)
 
         return docs
 
+    def _search(self, query, types, params):
+        """Run the search, using the search results cache for API requests if it is enabled"""
+        results_cache = get_search_results_cache() if has_request_context() and request.method == 'GET' else None
+        if results_cache is None:
+            return self.elastic.search(query, types, params)
+
+        key = results_cache.get_key(query, types, params)
+        if key is None:
+            return self.elastic.search(query, types, params)
+
+        response = results_cache.get(key)
+        if response is not None:
+            hits, docs = deepcopy(response)
+            return ElasticCursor(hits, docs)
+
+        docs = self.elastic.search(query, types, params)
+        results_cache.set(key, deepcopy(docs.hits), deepcopy(docs.docs))
+        return docs
+
+    def on_fetched_docs(self, docs, types):
+        """Call the ``on_fetched_resource`` callbacks for the docs of each resource type"""
+        for resource in types:
+            response = {
+                app.config['ITEMS']: [
+                    doc
+                    for doc in docs
+                    if doc['type'] == resource or (resource == 'events' and doc['type'] == 'event')
+                ]
+            }
+            getattr(app, 'on_fetched_resource')(resource, response)
+            getattr(app, 'on_fetched_resource_%s' % resource)(response)
+
+    def on_fetched_summary_docs(self, docs, fields):
+        """Enhance the ``list_mode=summary`` docs, then compact them
+
+        Instead of the ``on_fetched_resource`` callbacks, only the enhancements for the projected fields are run
+        """
+        projected_fields = set(fields.split(','))
+        events = [doc for doc in docs if doc['type'] == 'event']
+        planning_items = [doc for doc in docs if doc['type'] == 'planning']
+
+        if events:
+            events_service = get_resource_service('events')
+            planning_ids = events_service.get_planning_ids_for_events(events) \
+                if 'planning_ids' in projected_fields else {}
+
+            for event in events:
+                if planning_ids.get(event[config.ID_FIELD]):
+                    event['planning_ids'] = planning_ids[event[config.ID_FIELD]]
+
+                # i.e. the ``location.formatted_address`` rendered in the list views
+                events_service.format_event_fields(event)
+
+        if planning_items and any(field.split('.')[0] == 'coverages' for field in projected_fields):
+            get_resource_service('planning').generate_related_assignments(planning_items)
+
+        docs.docs = [compact_doc(doc) for doc in docs]
+
     def _get_date_fields(self, resource: str):
-        datasource = self.elastic.get_datasource(resource)
-        schema = {}
-        schema.update(app.config['DOMAIN'][datasource[0]].get('schema', {}))
-        schema.update(app.config['DOMAIN'][resource].get('schema', {}))
-        return get_dates(schema)
+        """Get the root level date fields of the resource, from the merged Eve schema
+
+        The schema is only walked once per resource, as it doesn't change after the app is initialised
+        """
+        if resource not in self._date_fields:
+            datasource = self.elastic.get_datasource(resource)
+            schema = {}
+            schema.update(app.config['DOMAIN'][datasource[0]].get('schema', {}))
+            schema.update(app.config['DOMAIN'][resource].get('schema', {}))
+            self._date_fields[resource] = sorted(get_dates(schema))
+
+        return self._date_fields[resource]
 
-    def _format_docs(self, docs):
-        date_fields = {}
+    def _get_format_fields(self, resource: str, projected_fields=None):
+        """Get the root and nested date fields to parse
+
+        If the request uses projections, only the date fields included in the projections are returned
+        """
+        date_fields = self._get_date_fields(resource)
+        nested_date_fields = NESTED_DATE_FIELDS.get(resource) or []
+
+        if projected_fields is not None:
+            date_fields = [field for field in date_fields if field in projected_fields]
+            nested_date_fields = [path for path in nested_date_fields if path[0] in projected_fields]
+
+        return date_fields, nested_date_fields
+
+    def _format_docs(self, docs, fields=None):
+        projected_fields = {field.split('.')[0] for field in fields.split(',')} if fields else None
+        format_fields = {}
 
         for doc in docs:
             resource = 'events' if doc['type'] == 'event' else doc['type']
 
-            if not date_fields.get(resource):
-                date_fields[resource] = self._get_date_fields(resource)
+            if resource not in format_fields:
+                format_fields[resource] = self._get_format_fields(resource, projected_fields)
+
+            date_fields, nested_date_fields = format_fields[resource]
 
             # Format root level date types
-            for field in date_fields[resource]:
-                if isinstance(doc.get(field), str):
-                    doc[field] = parse_date(doc[field])
+            for field in date_fields:
+                value = doc.get(field)
+                if isinstance(value, str):
+                    doc[field] = parse_iso_date(value)
 
             # Format nested date types
-            if resource == 'events' and doc.get('dates'):
-                if doc['dates'].get('start'):
-                    doc['dates']['start'] = parse_date(doc['dates']['start'])
-                if doc['dates'].get('end'):
-                    doc['dates']['end'] = parse_date(doc['dates']['end'])
-                if (doc['dates'].get('recurring_rule') or {}).get('until'):
-                    doc['dates']['recurring_rule']['until'] = parse_date(doc['dates']['recurring_rule']['until'])
+            for path in nested_date_fields:
+                parent = doc
+                for key in path[:-1]:
+                    parent = parent.get(key)
+                    if not isinstance(parent, dict):
+                        break
+                else:
+                    value = parent.get(path[-1])
+                    if isinstance(value, str):
+                        parent[path[-1]] = parse_iso_date(value)
 
     def _get_projected_fields(self, req):
         """Get elastic projected fields."""
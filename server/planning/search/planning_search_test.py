@@ -0,0 +1,55 @@
+from datetime import datetime
+
+from eve_elastic.elastic import parse_date
+from superdesk import get_resource_service
+from superdesk.utc import utc
+
+from planning.tests import TestCase
+from planning.search.planning_search import parse_iso_date
+
+
+class PlanningSearchTestCase(TestCase):
+    def test_parse_iso_date(self):
+        for value in [
+            '2021-04-01T10:30:15+0000',
+            '2021-04-01T10:30:15+1000',
+            '2021-04-01T10:30:15Z',
+            '2021-04-01T10:30:15.123+0000',
+            '2021-04-01',
+        ]:
+            self.assertEqual(parse_iso_date(value), parse_date(value), value)
+
+        self.assertEqual(
+            parse_iso_date('2021-04-01T10:30:15+0000'),
+            datetime(2021, 4, 1, 10, 30, 15, tzinfo=utc)
+        )
+
+    def test_format_docs(self):
+        date = '2021-04-01T10:30:15+0000'
+        expected = datetime(2021, 4, 1, 10, 30, 15, tzinfo=utc)
+
+        with self.app.app_context():
+            service = get_resource_service('planning_search')
+            docs = [{
+                'type': 'event',
+                'firstcreated': date,
+                'dates': {'start': date, 'end': date, 'recurring_rule': {'until': date}},
+            }, {
+                'type': 'planning',
+                'firstcreated': date,
+                'planning_date': date,
+            }]
+
+            service._format_docs(docs)
+            self.assertEqual(docs[0]['firstcreated'], expected)
+            self.assertEqual(docs[0]['dates']['start'], expected)
+            self.assertEqual(docs[0]['dates']['end'], expected)
+            self.assertEqual(docs[0]['dates']['recurring_rule']['until'], expected)
+            self.assertEqual(docs[1]['firstcreated'], expected)
+            self.assertEqual(docs[1]['planning_date'], expected)
+
+            # Only the projected date fields are parsed
+            docs = [{'type': 'event', 'firstcreated': date, 'dates': {'start': date}}]
+            service._format_docs(docs, 'type,dates')
+            self.assertEqual(docs[0]['firstcreated'], date)
+            self.assertEqual(docs[0]['dates']['start'], expected)
@@ -384,4 +384,5 @@ COMMON_PARAMS = [
     'page',
     'filter_id',
     'projections',
+    'list_mode',
 ]
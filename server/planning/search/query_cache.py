@@ -0,0 +1,166 @@
+# -*- coding: utf-8; -*-
+#
+# This file is part of Superdesk.
+#
+#  Copyright 2021 Sourcefabric z.u. and contributors.
+#
+# For the full copyright and license information, please see the
+# AUTHORS and LICENSE files distributed with this source code, or
+# at https://www.sourcefabric.org/superdesk/license
+
+"""Cache of compiled Events and Planning search queries"""
+
+from typing import Dict, Any, Optional, Tuple
+import json
+import re
+import time
+from collections import OrderedDict
+from copy import deepcopy
+from datetime import timedelta
+from threading import Lock
+
+import pytz
+
+from flask import current_app as app
+from eve.utils import config
+
+from superdesk import get_resource_service
+from superdesk.utc import utcnow
+
+from planning.common import get_search_query_cache_size, get_search_query_cache_ttl
+from .queries.common import get_time_zone
+
+# Request params that do not change the constructed query
+IGNORED_PARAMS = ['page', 'max_results', 'projections', 'list_mode']
+
+# UTC offset used as the ``time_zone`` of the queries, i.e. ``+10:00`` or ``-0530``
+TIME_ZONE_OFFSET_RE = re.compile(r'^([+-])(\d{2}):?(\d{2})$')
+
+
+def get_local_date(time_zone: str) -> str:
+    """Returns the current date in the ``time_zone`` used by the query builder
+
+    The ``time_zone`` can be a UTC offset or the name of a timezone, as accepted by Elastic
+    """
+    now = utcnow()
+    match = TIME_ZONE_OFFSET_RE.match(str(time_zone or '').strip())
+
+    if match:
+        sign, hours, minutes = match.groups()
+        offset = timedelta(hours=int(hours), minutes=int(minutes))
+        now = now + offset if sign == '+' else now - offset
+    elif time_zone:
+        try:
+            now = now.astimezone(pytz.timezone(time_zone))
+        except pytz.UnknownTimeZoneError:
+            pass
+
+    return now.strftime('%Y-%m-%d')
+
+
+class SearchQueryCache:
+    """LRU cache of the compiled search queries, and the filters used to construct them
+
+    Queries are keyed on the repo, the request params, the filter ``_id`` and ``_etag``, the timezone
+    the current date in that timezone and the current UTC date (as some date filters are calculated using
+    the current date).
+    Filters are invalidated using the ``events_planning_filters`` update/delete hooks. Entries also expire
+    after ``PLANNING_SEARCH_QUERY_CACHE_TTL`` seconds, for filters updated by another process.
+    """
+
+    def __init__(self, max_size: int, ttl: int):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.queries = OrderedDict()
+        self.filters = {}
+        self.lock = Lock()
+
+    def _get(self, cache: Dict, key):
+        entry = cache.get(key)
+        if entry is None:
+            return None
+        elif time.monotonic() - entry[0] > self.ttl:
+            cache.pop(key, None)
+            return None
+
+        return entry[1]
+
+    def get_filter(self, filter_id: str) -> Optional[Dict[str, Any]]:
+        """Returns a copy of the ``events_planning_filters`` item"""
+        filter_id = str(filter_id)
+        with self.lock:
+            search_filter = self._get(self.filters, filter_id)
+
+        if search_filter is None:
+            search_filter = get_resource_service('events_planning_filters').find_one(req=None, _id=filter_id)
+            if not search_filter:
+                return None
+
+            with self.lock:
+                self.filters[filter_id] = (time.monotonic(), search_filter)
+
+        return deepcopy(search_filter)
+
+    @staticmethod
+    def get_key(repo: str, params: Dict[str, Any], search_filter: Dict[str, Any]) -> Tuple:
+        time_zone = get_time_zone(params)
+        return (
+            repo,
+            json.dumps(
+                sorted((key, value) for key, value in params.items() if key not in IGNORED_PARAMS),
+                default=str
+            ),
+            str(search_filter.get(config.ID_FIELD)),
+            search_filter.get(config.ETAG),
+            time_zone,
+            get_local_date(time_zone),
+            # The week boundaries of the ``this_week`` and ``next_week`` filters are calculated from the UTC date
+            utcnow().strftime('%Y-%m-%d'),
+        )
+
+    def get_query(self, key: Tuple, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Returns a copy of the cached query, and applies the changes made to the params when it was built"""
+        with self.lock:
+            entry = self._get(self.queries, key)
+            if entry is None:
+                return None
+            self.queries.move_to_end(key)
+
+        query, param_updates = entry
+        for param, value in param_updates.items():
+            params[param] = value
+
+        return deepcopy(query)
+
+    def set_query(self, key: Tuple, query: Dict[str, Any], param_updates: Dict[str, Any]):
+        with self.lock:
+            self.queries[key] = (time.monotonic(), (deepcopy(query), param_updates))
+            self.queries.move_to_end(key)
+
+            while len(self.queries) > self.max_size:
+                self.queries.popitem(last=False)
+
+    def invalidate_filter(self, filter_id: str):
+        """Removes the filter, and all queries constructed from it"""
+        filter_id = str(filter_id)
+        with self.lock:
+            self.filters.pop(filter_id, None)
+            for key in [key for key in self.queries.keys() if key[2] == filter_id]:
+                self.queries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.queries.clear()
+            self.filters.clear()
+
+
+def get_search_query_cache() -> Optional[SearchQueryCache]:
+    """Returns the cache for the current app, or None if it is disabled"""
+    max_size = get_search_query_cache_size()
+    if max_size <= 0:
+        return None
+
+    if 'planning_search_query_cache' not in app.extensions:
+        app.extensions['planning_search_query_cache'] = SearchQueryCache(max_size, get_search_query_cache_ttl())
+
+    return app.extensions['planning_search_query_cache']
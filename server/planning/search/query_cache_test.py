@@ -0,0 +1,111 @@
+from unittest import mock
+from datetime import datetime
+
+import pytz
+from superdesk import get_resource_service
+
+from planning.tests import TestCase
+from planning.search import eventsplanning_search
+from planning.search.queries import elastic
+from planning.search.query_cache import get_search_query_cache, get_local_date, SearchQueryCache
+
+
+class SearchQueryCacheTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+
+        with self.app.test_request_context():
+            get_search_query_cache().clear()
+            self.filter_id = get_resource_service('events_planning_filters').post([{
+                'name': 'Sports',
+                'item_type': 'combined',
+                'params': {
+                    'slugline': 'sport',
+                    'date_filter': 'today',
+                },
+            }])[0]
+
+    def search(self, args=None):
+        return get_resource_service('events_planning_search').search_by_filter_id(self.filter_id, args)
+
+    def test_reuses_compiled_query(self):
+        with self.app.test_request_context():
+            with mock.patch.object(
+                eventsplanning_search,
+                'construct_search_query',
+                wraps=eventsplanning_search.construct_search_query
+            ) as construct_search_query:
+                self.search()
+                self.search()
+                self.assertEqual(construct_search_query.call_count, 1)
+
+                # Different params generate a different query
+                self.search({'name': 'Olympics'})
+                self.assertEqual(construct_search_query.call_count, 2)
+
+            self.assertEqual(len(get_search_query_cache().queries), 2)
+
+    def test_applies_param_updates_on_cache_hit(self):
+        with self.app.test_request_context():
+            service = get_resource_service('events_planning_search')
+            search_filter = service._get_search_filter('combined', {'filter_id': self.filter_id})
+
+            params = {'repo': 'combined', 'filter_id': self.filter_id, 'date_filter': 'today'}
+            query = service._construct_search_query('combined', params, search_filter)
+            self.assertTrue(params.get('exclude_dates'))
+
+            params = {'repo': 'combined', 'filter_id': self.filter_id, 'date_filter': 'today'}
+            self.assertEqual(service._construct_search_query('combined', params, search_filter), query)
+            self.assertTrue(params.get('exclude_dates'))
+
+    def test_invalidates_on_filter_update(self):
+        with self.app.test_request_context():
+            self.search()
+            query_cache = get_search_query_cache()
+            self.assertEqual(len(query_cache.queries), 1)
+            self.assertIn(str(self.filter_id), query_cache.filters)
+
+            filters_service = get_resource_service('events_planning_filters')
+            original = filters_service.find_one(req=None, _id=self.filter_id)
+            filters_service.patch(self.filter_id, {'params': {'slugline': 'politics'}})
+            self.assertEqual(len(query_cache.queries), 0)
+            self.assertNotIn(str(self.filter_id), query_cache.filters)
+
+            self.search()
+            self.assertNotEqual(query_cache.filters[str(self.filter_id)][1]['_etag'], original['_etag'])
+
+            filters_service.delete_action({'_id': self.filter_id})
+            self.assertEqual(len(query_cache.queries), 0)
+
+    @mock.patch('planning.search.query_cache.utcnow', return_value=datetime(2021, 1, 1, 20, 0, tzinfo=pytz.UTC))
+    def test_key_uses_date_in_time_zone(self, utcnow):
+        self.assertEqual(get_local_date('+10:00'), '2021-01-02')
+        self.assertEqual(get_local_date('+1100'), '2021-01-02')
+        self.assertEqual(get_local_date('-05:00'), '2021-01-01')
+        self.assertEqual(get_local_date('Australia/Sydney'), '2021-01-02')
+        self.assertEqual(get_local_date('America/New_York'), '2021-01-01')
+
+        with self.app.test_request_context():
+            search_filter = {'_id': 'filter1', '_etag': 'etag1'}
+            key = SearchQueryCache.get_key('combined', {'tz_offset': '+10:00'}, search_filter)
+            self.assertEqual(key[-3:], ('+10:00', '2021-01-02', '2021-01-01'))
+
+    def test_key_changes_on_utc_week_boundary(self):
+        search_filter = {'_id': 'filter1', '_etag': 'etag1'}
+        params = {'tz_offset': '+10:00', 'date_filter': 'this_week'}
+
+        with self.app.test_request_context():
+            keys = []
+            starts = []
+
+            # The local date is Sunday the 3rd, while the UTC date crosses from Saturday into Sunday
+            for now in [datetime(2021, 1, 2, 23, 0, tzinfo=pytz.UTC), datetime(2021, 1, 3, 1, 0, tzinfo=pytz.UTC)]:
+                with mock.patch('planning.search.query_cache.utcnow', return_value=now), \
+                        mock.patch('planning.common.utcnow', return_value=now):
+                    self.assertEqual(get_local_date('+10:00'), '2021-01-03')
+                    keys.append(SearchQueryCache.get_key('combined', params, search_filter))
+                    starts.append(elastic.start_of_next_week())
+
+            # The week boundaries used by the query builder changed, so the cached query is not reused
+            self.assertEqual(starts, ['2021-01-03||/d', '2021-01-10||/d'])
+            self.assertNotEqual(keys[0], keys[1])
@@ -0,0 +1,212 @@
+# -*- coding: utf-8; -*-
+#
+# This file is part of Superdesk.
+#
+#  Copyright 2021 Sourcefabric z.u. and contributors.
+#
+# For the full copyright and license information, please see the
+# AUTHORS and LICENSE files distributed with this source code, or
+# at https://www.sourcefabric.org/superdesk/license
+
+"""Cache of the Elastic responses for ``planning_search``
+
+Responses are keyed on the final query body, the item types and the projected fields, along with
+a generation number for each of the item types. Invalidation increments the generation number, so
+all cached responses for that item type become unreachable and are left to expire.
+
+The generation numbers are incremented by the ``events:*`` and ``planning:*`` push notifications
+sent by the Planning services (see :mod:`planning.signals`).
+"""
+
+from typing import Dict, Any, List, Optional, Tuple
+import hashlib
+import json
+import logging
+import pickle
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from flask import current_app as app
+import redis
+
+from planning.common import get_search_results_cache_backend, get_search_results_cache_size, \
+    get_search_results_cache_ttl, get_search_results_cache_url
+
+logger = logging.getLogger(__name__)
+
+# Item types (as used in the ``planning_search`` repos) that each notification prefix invalidates
+# Planning items include their Coverage Assignment details, so these invalidate the Planning results too
+NOTIFICATION_TYPES = {
+    'events': ['events'],
+    'planning': ['planning'],
+    'coverage': ['planning'],
+    'assignments': ['planning'],
+}
+
+
+class MemoryBackend:
+    """In-process LRU backend, only invalidated by notifications sent from the same process"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.items = OrderedDict()
+        self.generations = {}
+        self.lock = Lock()
+
+    def get(self, key: str):
+        with self.lock:
+            entry = self.items.get(key)
+            if entry is None:
+                return None
+            elif entry[0] < time.monotonic():
+                self.items.pop(key, None)
+                return None
+
+            self.items.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value, ttl: int):
+        with self.lock:
+            self.items[key] = (time.monotonic() + ttl, value)
+            self.items.move_to_end(key)
+
+            while len(self.items) > self.max_size:
+                self.items.popitem(last=False)
+
+    def get_generations(self, item_types: List[str]) -> List[int]:
+        return [self.generations.get(item_type, 0) for item_type in item_types]
+
+    def incr_generation(self, item_type: str):
+        with self.lock:
+            self.generations[item_type] = self.generations.get(item_type, 0) + 1
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.generations.clear()
+
+
+class RedisBackend:
+    """Shared backend, using any Redis compatible client (``get``, ``mget``, ``setex`` and ``incr``)"""
+
+    prefix = 'planning:search_results:'
+
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, key: str):
+        value = self.client.get(self.prefix + key)
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key: str, value, ttl: int):
+        self.client.setex(self.prefix + key, ttl, pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+    def get_generations(self, item_types: List[str]) -> List[int]:
+        generations = self.client.mget([self.prefix + 'generation:' + item_type for item_type in item_types])
+        return [int(generation or 0) for generation in generations]
+
+    def incr_generation(self, item_type: str):
+        self.client.incr(self.prefix + 'generation:' + item_type)
+
+    def clear(self):
+        for item_type in ['events', 'planning']:
+            self.incr_generation(item_type)
+
+
+class SearchResultsCache:
+    def __init__(self, backend, ttl: int):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get_key(self, query: Dict[str, Any], types: List[str], params: Dict[str, Any]) -> Optional[str]:
+        """Returns the key of the search, or None if the generations could not be read from the backend"""
+        types = sorted(types)
+        try:
+            generations = self.backend.get_generations(types)
+        except redis.RedisError:
+            logger.exception('Failed to get the search results generations from the cache')
+            return None
+
+        return hashlib.sha1(json.dumps(
+            {
+                'query': query,
+                'types': types,
+                'params': params,
+                'generations': generations,
+            },
+            sort_keys=True,
+            default=str
+        ).encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+        """Returns the cached Elastic ``hits`` and ``docs``"""
+        try:
+            response = self.backend.get(key)
+        except redis.RedisError:
+            logger.exception('Failed to get search results from the cache')
+            response = None
+
+        if response is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return response
+
+    def set(self, key: str, hits: Dict[str, Any], docs: List[Dict[str, Any]]):
+        try:
+            self.backend.set(key, (hits, docs), self.ttl)
+        except redis.RedisError:
+            logger.exception('Failed to add search results to the cache')
+
+    def invalidate(self, item_types: List[str]):
+        for item_type in item_types:
+            try:
+                self.backend.incr_generation(item_type)
+            except redis.RedisError:
+                logger.exception('Failed to invalidate {} search results in the cache'.format(item_type))
+            self.invalidations += 1
+
+    def get_metrics(self) -> Dict[str, Any]:
+        requests = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'hit_rate': self.hits / requests if requests else 0.0,
+        }
+
+
+def get_search_results_cache() -> Optional[SearchResultsCache]:
+    """Returns the cache for the current app, or None if it is disabled"""
+    backend_name = get_search_results_cache_backend()
+    if not backend_name:
+        return None
+
+    if 'planning_search_results_cache' not in app.extensions:
+        if backend_name == 'redis':
+            backend = RedisBackend(redis.StrictRedis.from_url(get_search_results_cache_url()))
+        elif backend_name == 'memory':
+            backend = MemoryBackend(get_search_results_cache_size())
+        else:
+            logger.error('Unknown search results cache backend {}'.format(backend_name))
+            return None
+
+        app.extensions['planning_search_results_cache'] = SearchResultsCache(backend, get_search_results_cache_ttl())
+
+    return app.extensions['planning_search_results_cache']
+
+
+def on_notification_pushed(name, **kwargs):
+    """Invalidates the search results for the item type of the push notification"""
+    item_types = NOTIFICATION_TYPES.get(name.split(':')[0])
+    if not item_types:
+        return
+
+    results_cache = get_search_results_cache()
+    if results_cache is not None:
+        results_cache.invalidate(item_types)
@@ -0,0 +1,107 @@
+from datetime import timedelta
+
+import redis
+from superdesk import get_resource_service
+from superdesk.utc import utcnow
+
+from planning.tests import TestCase
+from planning.signals import push_notification
+from planning.search.result_cache import get_search_results_cache, RedisBackend, SearchResultsCache
+
+
+class LocalRedis:
+    """Stand-in for the Redis client, implementing the commands used by the ``RedisBackend``"""
+
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def mget(self, keys):
+        return [self.values.get(key) for key in keys]
+
+    def setex(self, key, ttl, value):
+        self.values[key] = value
+
+    def incr(self, key):
+        self.values[key] = str(int(self.values.get(key) or 0) + 1).encode()
+
+
+class UnreachableRedis(LocalRedis):
+    def get(self, key):
+        raise redis.ConnectionError('Connection refused')
+
+    def mget(self, keys):
+        raise redis.ConnectionError('Connection refused')
+
+
+class SearchResultsCacheTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.app.config['PLANNING_SEARCH_RESULTS_CACHE'] = 'memory'
+        self.app.extensions.pop('planning_search_results_cache', None)
+
+        start = utcnow() + timedelta(days=1)
+        with self.app.app_context():
+            self.app.data.insert('events', [{
+                '_id': 'event1',
+                'guid': 'event1',
+                'type': 'event',
+                'name': 'Event 1',
+                'state': 'draft',
+                'dates': {'start': start, 'end': start + timedelta(hours=1)},
+            }])
+
+    def search(self):
+        return list(get_resource_service('events_planning_search').search_repos('events', {}))
+
+    def test_caches_search_results(self):
+        with self.app.test_request_context():
+            results_cache = get_search_results_cache()
+
+            self.assertEqual(self.search()[0]['name'], 'Event 1')
+            self.assertEqual(results_cache.get_metrics()['misses'], 1)
+
+            # Changes to the returned docs are not stored in the cache
+            docs = self.search()
+            docs[0]['name'] = 'Changed'
+            self.assertEqual(self.search()[0]['name'], 'Event 1')
+            self.assertEqual(results_cache.get_metrics()['hits'], 2)
+
+            # Planning notifications don't invalidate Event search results
+            push_notification('planning:updated', item='plan1')
+            self.search()
+            self.assertEqual(results_cache.get_metrics()['hits'], 3)
+
+            self.app.data.update('events', 'event1', {'name': 'Event One'}, {})
+            push_notification('events:updated', item='event1')
+            self.assertEqual(self.search()[0]['name'], 'Event One')
+
+            metrics = results_cache.get_metrics()
+            self.assertEqual(metrics['misses'], 2)
+            self.assertEqual(metrics['invalidations'], 1)
+            self.assertEqual(metrics['hit_rate'], 0.6)
+
+    def test_redis_backend(self):
+        results_cache = SearchResultsCache(RedisBackend(LocalRedis()), 30)
+        query = {'query': {'bool': {'must': [{'term': {'state': 'draft'}}]}}}
+
+        key = results_cache.get_key(query, ['events'], {})
+        self.assertIsNone(results_cache.get(key))
+        results_cache.set(key, {'hits': {'total': 1}}, [{'_id': 'event1'}])
+        self.assertEqual(results_cache.get(key), ({'hits': {'total': 1}}, [{'_id': 'event1'}]))
+
+        self.assertEqual(results_cache.get_key(query, ['events'], {}), key)
+        self.assertNotEqual(results_cache.get_key(query, ['events'], {'_source': 'name,type'}), key)
+
+        results_cache.invalidate(['events'])
+        self.assertNotEqual(results_cache.get_key(query, ['events'], {}), key)
+
+    def test_falls_back_to_elastic_when_redis_is_unreachable(self):
+        self.app.extensions['planning_search_results_cache'] = SearchResultsCache(RedisBackend(UnreachableRedis()), 30)
+
+        with self.app.test_request_context():
+            self.assertIsNone(get_search_results_cache().get_key({}, ['events'], {}))
+            self.assertEqual(self.search()[0]['name'], 'Event 1')
@@ -0,0 +1,24 @@
+# -*- coding: utf-8; -*-
+#
+# This file is part of Superdesk.
+#
+#  Copyright 2021 Sourcefabric z.u. and contributors.
+#
+# For the full copyright and license information, please see the
+# AUTHORS and LICENSE files distributed with this source code, or
+# at https://www.sourcefabric.org/superdesk/license
+
+"""Signals sent by the Planning services"""
+
+import blinker
+
+from superdesk.notification import push_notification as _push_notification
+
+#: Sent with the name of each websocket notification pushed by the Planning services
+notification_pushed = blinker.signal('planning:notification_pushed')
+
+
+def push_notification(name, **kwargs):
+    """Push a websocket notification, sending the ``notification_pushed`` signal first"""
+    notification_pushed.send(name, extra=kwargs)
+    _push_notification(name, **kwargs)
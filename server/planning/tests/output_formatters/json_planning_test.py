@@ -4,6 +4,7 @@ from planning.output_formatters.json_planning import JsonPlanningFormatter
 import json
 from copy import deepcopy
 from bson.objectid import ObjectId
+from superdesk import get_resource_service
 
 
 @mock.patch('superdesk.publish.subscribers.SubscribersService.generate_sequence_number', lambda self, subscriber: 1)
@@ -247,3 +248,39 @@ class JsonPlanningTestCase(TestCase):
             self.assertEqual(output_item.get('coverages')[0].get('planning').get('slugline'), 'Raiders')
             self.assertEqual(output_item.get('coverages')[0].get('deliveries'), [])
             self.assertEqual(output_item.get('coverages')[0].get('workflow_status'), 'cancelled')
+
+    def test_format_items_batches_lookups(self):
+        with self.app.app_context():
+            agenda = {
+                '_id': 1,
+                'is_enabled': True,
+                'name': 'Culture',
+            }
+            self.app.data.insert('agenda', [agenda])
+            self.app.data.insert('assignments', self.assignment)
+            self.app.data.insert('delivery', self.delivery)
+
+            item = deepcopy(self.item)
+            second_item = deepcopy(self.item)
+            second_item['_id'] = second_item['guid'] = 'urn:newsml:localhost:plan2'
+            formatter = JsonPlanningFormatter()
+
+            with mock.patch.object(
+                get_resource_service('assignments'),
+                'find',
+                wraps=get_resource_service('assignments').find
+            ) as find:
+                output_items = formatter.format_items([item, second_item])
+                self.assertEqual(find.call_count, 1)
+
+            self.assertEqual(len(output_items), 2)
+            self.assertEqual(output_items[1]['_id'], 'urn:newsml:localhost:plan2')
+            for output_item in output_items:
+                self.assertEqual(output_item['agendas'], [{'_id': 1, 'name': 'Culture'}])
+                self.assertEqual(output_item['coverages'][0]['workflow_status'], 'completed')
+                self.assertEqual(len(output_item['coverages'][0]['deliveries']), 1)
+                self.assertNotIn('assigned_to', output_item['coverages'][0])
+                self.assertNotIn('_etag', output_item)
+
+            # The original item is not modified
+            self.assertEqual(item, self.item)
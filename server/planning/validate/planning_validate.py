@@ -8,6 +8,10 @@
 # AUTHORS and LICENSE files distributed with this source code, or
 # at https://www.sourcefabric.org/superdesk/license
 
+from typing import Dict, Any, List, Optional, Tuple
+from threading import Lock
+
+from flask import current_app as app
 from superdesk import Resource, Service, get_resource_service
 from superdesk.metadata.item import ITEM_TYPE
 from superdesk.logging import logger
@@ -16,6 +20,8 @@ from apps.validate.validate import SchemaValidator as Validator
 
 from copy import deepcopy
 
+from planning.common import get_mongo_collection
+
 REQUIRED_ERROR = '{} is a required field'
 
 
@@ -45,6 +51,133 @@ class SchemaValidator(Validator):
         pass
 
 
+class CompiledValidator:
+    """A ``SchemaValidator`` prepared with the validation schema of a planning type
+
+    Cerberus validators keep the state of the document being validated,
+    so calls to ``validate`` are serialised using a lock.
+    """
+
+    def __init__(self, schema: Dict[str, Dict[str, Any]]):
+        self.schema = schema
+        self.validator = SchemaValidator(schema)
+        self.validator.allow_unknown = True
+        self.lock = Lock()
+
+    def validate(self, doc: Dict[str, Any]) -> List[str]:
+        with self.lock:
+            try:
+                self.validator.validate(doc)
+            except TypeError as e:
+                logger.exception('Invalid validator schema value "%s" for ' % str(e))
+
+            error_list = self.validator.errors
+
+        response = []
+        for field in error_list:
+            error = error_list[field]
+
+            # If error is a list, only return the first error
+            if isinstance(error, list):
+                error = error[0]
+
+            if error == 'empty values not allowed' or error == 'required field':
+                response.append(REQUIRED_ERROR.format(field.upper()))
+            else:
+                response.append('{} {}'.format(field.upper(), error))
+
+        return response
+
+
+class ValidatorCache:
+    """Cache of the resolved planning types and their compiled validators
+
+    Entries are keyed by the version (``_etag`` and ``_updated``) of the planning type stored in Mongo,
+    so a change to the planning type is picked up by the next validation.
+    """
+
+    def __init__(self):
+        self.planning_types = {}
+        self.validators = {}
+        self.lock = Lock()
+
+    def get_planning_type(self, name: str, version: Tuple) -> Optional[Dict[str, Any]]:
+        key = (name, version)
+        with self.lock:
+            if key in self.planning_types:
+                return self.planning_types[key]
+
+        planning_type = get_resource_service('planning_types').find_one(req=None, name=name)
+        with self.lock:
+            # Remove previous versions of this planning type
+            for old_key in [k for k in self.planning_types.keys() if k[0] == name]:
+                self.planning_types.pop(old_key, None)
+            self.planning_types[key] = planning_type
+
+        return planning_type
+
+    def get_validator(self, name: str, validate_on_post: bool, version: Tuple) -> Optional[CompiledValidator]:
+        key = (name, bool(validate_on_post), version)
+        with self.lock:
+            if key in self.validators:
+                return self.validators[key]
+
+        planning_type = self.get_planning_type(name, version)
+        if planning_type is None:
+            return None
+
+        validator = CompiledValidator(get_planning_type_validator_schema(planning_type, validate_on_post))
+        with self.lock:
+            for old_key in [k for k in self.validators.keys() if k[0] == name and k[2] != version]:
+                self.validators.pop(old_key, None)
+            self.validators[key] = validator
+
+        return validator
+
+
+def get_planning_type_validator_schema(planning_type, validate_on_post):
+    """Get schema for given planning type.
+
+    And make sure there is no `None` value which would raise an exception.
+    """
+    return {field: get_validator_schema(schema) for field, schema in planning_type['schema'].items()
+            if schema and schema.get('validate_on_post', False) == validate_on_post}
+
+
+def get_planning_type_version(name: str) -> Optional[Tuple]:
+    """Returns the version of the planning type stored in Mongo
+
+    Returns ``('default',)`` if the planning type is not stored, and None if the stored
+    planning type has no ``_etag`` or ``_updated`` field (and therefore cannot be cached)
+    """
+    planning_type = get_mongo_collection('planning_types').find_one({'name': name}, {'_etag': 1, '_updated': 1})
+    if planning_type is None:
+        return ('default',)
+    elif not planning_type.get('_etag') and not planning_type.get('_updated'):
+        return None
+
+    return (str(planning_type['_id']), planning_type.get('_etag'), planning_type.get('_updated'))
+
+
+def get_validator_cache() -> ValidatorCache:
+    if 'planning_validator_cache' not in app.extensions:
+        app.extensions['planning_validator_cache'] = ValidatorCache()
+
+    return app.extensions['planning_validator_cache']
+
+
+def get_compiled_validator(item_type: str, validate_on_post: bool) -> Optional[CompiledValidator]:
+    """Returns the compiled validator for the planning type, or None if the planning type is not found"""
+    version = get_planning_type_version(item_type)
+    if version is None:
+        planning_type = get_resource_service('planning_types').find_one(req=None, name=item_type)
+        if planning_type is None:
+            return None
+        return CompiledValidator(get_planning_type_validator_schema(planning_type, validate_on_post))
+
+    return get_validator_cache().get_validator(item_type, validate_on_post, version)
+
+
 class PlanningValidateResource(Resource):
     endpoint_name = 'planning_validator'
     schema = {
@@ -60,52 +193,27 @@ class PlanningValidateResource(Resource):
 class PlanningValidateService(Service):
     def create(self, docs, **kwargs):
         for doc in docs:
-            test_doc = deepcopy(doc)
-            doc['errors'] = self._validate(test_doc)
+            doc['errors'] = self._validate(doc)
 
         return [doc['errors'] for doc in docs]
 
-    def _get_validator(self, doc):
-        """Get validators."""
-        return get_resource_service('planning_types').find_one(req=None, name=doc[ITEM_TYPE])
-
-    def _get_validator_schema(self, validator, validate_on_post):
-        """Get schema for given validator.
-
-        And make sure there is no `None` value which would raise an exception.
-        """
-        return {field: get_validator_schema(schema) for field, schema in validator['schema'].items()
-                if schema and schema.get('validate_on_post', False) == validate_on_post}
-
     def _validate(self, doc):
-        validator = self._get_validator(doc)
-
-        if validator is None:
-            logger.warn('Validator was not found for type:{}'.format(doc[ITEM_TYPE]))
-            return []
+        return self.validate_items(doc[ITEM_TYPE], [doc['validate']], doc.get('validate_on_post'))[0]
 
-        validation_schema = self._get_validator_schema(validator, doc.get('validate_on_post'))
+    def validate_items(self, item_type: str, items: List[Dict[str, Any]], validate_on_post: bool = False):
+        """Validate a list of items against the same planning type
 
-        v = SchemaValidator()
-        v.allow_unknown = True
+        The planning type is resolved and its validation schema compiled once for all items.
 
-        try:
-            v.validate(doc['validate'], validation_schema)
-        except TypeError as e:
-            logger.exception('Invalid validator schema value "%s" for ' % str(e))
-
-        error_list = v.errors
-        response = []
-        for field in error_list:
-            error = error_list[field]
-
-            # If error is a list, only return the first error
-            if isinstance(error, list):
-                error = error[0]
+        :param str item_type: The name of the planning type, i.e. ``event`` or ``planning``
+        :param list items: The items to validate
+        :param bool validate_on_post: If True, validate using the fields required when posting
+        :return list: A list of errors for each item
+        """
+        validator = get_compiled_validator(item_type, validate_on_post)
 
-            if error == 'empty values not allowed' or error == 'required field':
-                response.append(REQUIRED_ERROR.format(field.upper()))
-            else:
-                response.append('{} {}'.format(field.upper(), error))
+        if validator is None:
+            logger.warn('Validator was not found for type:{}'.format(item_type))
+            return [[] for _ in items]
 
-        return response
+        return [validator.validate(deepcopy(item)) for item in items]
@@ -11,6 +11,9 @@
 from planning.tests import TestCase
 from superdesk import get_resource_service
 
+from planning.common import get_mongo_collection
+from planning.validate.planning_validate import get_compiled_validator
+
 
 class PlanningValidateServiceTest(TestCase):
     def test_validate_on_post(self):
@@ -87,3 +90,31 @@ class PlanningValidateServiceTest(TestCase):
             }])[0]
 
             self.assertEqual(errors, [])
+
+    def test_validate_items_uses_compiled_validator_cache(self):
+        with self.app.app_context():
+            self.app.data.insert('planning_types', [{
+                '_id': 'event', 'name': 'event', '_etag': 'etag1',
+                'schema': {
+                    'slugline': {'type': 'string', 'required': True, 'validate_on_post': True},
+                }
+            }])
+
+            service = get_resource_service('planning_validator')
+            items = [{'name': 'Event 1'}, {'name': 'Event 2', 'slugline': 'Event 2'}]
+            self.assertEqual(
+                service.validate_items('event', items, validate_on_post=True),
+                [['SLUGLINE is a required field'], []]
+            )
+
+            validator = get_compiled_validator('event', True)
+            self.assertIs(get_compiled_validator('event', True), validator)
+            self.assertIsNot(get_compiled_validator('event', False), validator)
+
+            # Changing the planning type compiles a new validator
+            get_mongo_collection('planning_types').update_one({'_id': 'event'}, {'$set': {
+                '_etag': 'etag2',
+                'schema.slugline.validate_on_post': False,
+            }})
+            self.assertIsNot(get_compiled_validator('event', True), validator)
+            self.assertEqual(service.validate_items('event', items, validate_on_post=True), [[], []])